@@ -0,0 +1,36 @@
+"""add lease and retry columns to processing_tasks
+
+Revision ID: a1c3e5f7b902
+Revises: 3580c0dcd005
+Create Date: 2026-10-16 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a1c3e5f7b902'
+down_revision: Union[str, None] = '3580c0dcd005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('processing_tasks', sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('processing_tasks', sa.Column('locked_by', sa.String(255), nullable=True))
+    op.add_column('processing_tasks', sa.Column('lease_expires_at', sa.DateTime(), nullable=True))
+    op.add_column('processing_tasks', sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+    op.add_column('processing_tasks', sa.Column('next_attempt_at', sa.DateTime(), nullable=True))
+    op.create_index('idx_processing_tasks_queue', 'processing_tasks', ['status', 'next_attempt_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_processing_tasks_queue', table_name='processing_tasks')
+    op.drop_column('processing_tasks', 'next_attempt_at')
+    op.drop_column('processing_tasks', 'heartbeat_at')
+    op.drop_column('processing_tasks', 'lease_expires_at')
+    op.drop_column('processing_tasks', 'locked_by')
+    op.drop_column('processing_tasks', 'attempts')
@@ -0,0 +1,30 @@
+"""add multipart upload state to document_uploads
+
+Revision ID: a7c9e1f3b568
+Revises: f6b8d0e2a457
+Create Date: 2026-10-16 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c9e1f3b568'
+down_revision: Union[str, None] = 'f6b8d0e2a457'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('document_uploads', sa.Column('multipart_upload_id', sa.String(length=255), nullable=True))
+    op.add_column('document_uploads', sa.Column('part_size', sa.BigInteger(), nullable=True))
+    op.add_column('document_uploads', sa.Column('total_parts', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('document_uploads', 'total_parts')
+    op.drop_column('document_uploads', 'part_size')
+    op.drop_column('document_uploads', 'multipart_upload_id')
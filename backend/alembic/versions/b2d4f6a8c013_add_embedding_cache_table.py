@@ -0,0 +1,37 @@
+"""add embedding_cache table
+
+Revision ID: b2d4f6a8c013
+Revises: a1c3e5f7b902
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2d4f6a8c013'
+down_revision: Union[str, None] = 'a1c3e5f7b902'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'embedding_cache',
+        sa.Column('key', sa.String(64), nullable=False),
+        sa.Column('provider', sa.String(50), nullable=False),
+        sa.Column('model', sa.String(255), nullable=False),
+        sa.Column('vector', sa.LargeBinary(length=2 ** 24 - 1), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('last_used_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index('idx_embedding_cache_last_used', 'embedding_cache', ['last_used_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_embedding_cache_last_used', table_name='embedding_cache')
+    op.drop_table('embedding_cache')
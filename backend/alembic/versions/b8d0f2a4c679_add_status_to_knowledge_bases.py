@@ -0,0 +1,28 @@
+"""add status to knowledge_bases
+
+Revision ID: b8d0f2a4c679
+Revises: a7c9e1f3b568
+Create Date: 2026-10-16 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8d0f2a4c679'
+down_revision: Union[str, None] = 'a7c9e1f3b568'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('knowledge_bases', sa.Column('status', sa.String(length=20), nullable=False, server_default='active'))
+    op.add_column('knowledge_bases', sa.Column('deletion_progress', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('knowledge_bases', 'deletion_progress')
+    op.drop_column('knowledge_bases', 'status')
@@ -0,0 +1,26 @@
+"""add chunk_index to document_chunks
+
+Revision ID: c3e5a7b9d124
+Revises: b2d4f6a8c013
+Create Date: 2026-10-16 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e5a7b9d124'
+down_revision: Union[str, None] = 'b2d4f6a8c013'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('document_chunks', sa.Column('chunk_index', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('document_chunks', 'chunk_index')
@@ -0,0 +1,26 @@
+"""add updated_at to document_uploads
+
+Revision ID: c9e1a3b5d780
+Revises: b8d0f2a4c679
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9e1a3b5d780'
+down_revision: Union[str, None] = 'b8d0f2a4c679'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('document_uploads', sa.Column('updated_at', sa.TIMESTAMP(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('document_uploads', 'updated_at')
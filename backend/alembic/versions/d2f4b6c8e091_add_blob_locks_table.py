@@ -0,0 +1,30 @@
+"""add blob_locks table
+
+Revision ID: d2f4b6c8e091
+Revises: c9e1a3b5d780
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2f4b6c8e091'
+down_revision: Union[str, None] = 'c9e1a3b5d780'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'blob_locks',
+        sa.Column('file_hash', sa.String(64), nullable=False),
+        sa.PrimaryKeyConstraint('file_hash')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('blob_locks')
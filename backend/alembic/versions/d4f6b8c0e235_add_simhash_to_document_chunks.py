@@ -0,0 +1,26 @@
+"""add simhash to document_chunks
+
+Revision ID: d4f6b8c0e235
+Revises: c3e5a7b9d124
+Create Date: 2026-10-16 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4f6b8c0e235'
+down_revision: Union[str, None] = 'c3e5a7b9d124'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('document_chunks', sa.Column('simhash', sa.String(length=16), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('document_chunks', 'simhash')
@@ -0,0 +1,30 @@
+"""add stage timings to processing_tasks
+
+Revision ID: e5a7c9d1f346
+Revises: d4f6b8c0e235
+Create Date: 2026-10-16 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a7c9d1f346'
+down_revision: Union[str, None] = 'd4f6b8c0e235'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('processing_tasks', sa.Column('stage_timings', sa.JSON(), nullable=True))
+    op.add_column('processing_tasks', sa.Column('chunk_count', sa.Integer(), nullable=True))
+    op.add_column('processing_tasks', sa.Column('byte_count', sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('processing_tasks', 'byte_count')
+    op.drop_column('processing_tasks', 'chunk_count')
+    op.drop_column('processing_tasks', 'stage_timings')
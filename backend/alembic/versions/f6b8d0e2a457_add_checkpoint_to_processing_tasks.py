@@ -0,0 +1,28 @@
+"""add checkpoint to processing_tasks
+
+Revision ID: f6b8d0e2a457
+Revises: e5a7c9d1f346
+Create Date: 2026-10-16 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6b8d0e2a457'
+down_revision: Union[str, None] = 'e5a7c9d1f346'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('processing_tasks', sa.Column('checkpoint_chunk_index', sa.Integer(), nullable=True))
+    op.add_column('processing_tasks', sa.Column('checkpoint_key', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('processing_tasks', 'checkpoint_key')
+    op.drop_column('processing_tasks', 'checkpoint_chunk_index')
@@ -30,7 +30,8 @@ def create_chat(
         db.query(KnowledgeBase)
         .filter(
             KnowledgeBase.id.in_(chat_in.knowledge_base_ids),
-            KnowledgeBase.user_id == current_user.id
+            KnowledgeBase.user_id == current_user.id,
+            KnowledgeBase.status == "active"
         )
         .all()
     )
@@ -1,9 +1,9 @@
-import hashlib
+import os
 from typing import List, Any, Dict
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, BackgroundTasks, Query
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, BackgroundTasks, Query, Request
 from sqlalchemy.orm import Session
 from langchain_chroma import Chroma
-from sqlalchemy import text
+from sqlalchemy import literal, select, text, union_all
 import logging
 from datetime import datetime, timedelta
 from pydantic import BaseModel
@@ -20,14 +20,22 @@ from app.schemas.knowledge import (
     KnowledgeBaseResponse,
     KnowledgeBaseUpdate,
     DocumentResponse,
-    PreviewRequest
+    PreviewRequest,
+    ResumableUploadCreate
 )
 from app.services.document_processor import process_document_background, upload_document, preview_document, PreviewResult
+from app.services.ingestion_scheduler import ingestion_scheduler
+from app.services.ingestion_metrics import aggregate_stage_timings
+from app.services.reaper import reap_expired_uploads
+from app.services.blob_store import blob_exists, blob_object_name, hash_stream, lock_blob
 from app.core.config import settings
-from app.core.minio import get_minio_client
+from app.core.minio import get_minio_client, put_object_streaming, upload_part
+from app.services import kb_deletion, resumable_upload
 from minio.error import MinioException
 from app.services.vector_store import VectorStoreFactory
 from app.services.embedding.embedding_factory import EmbeddingsFactory
+from app.services.embedding.cache import get_embedding_cache
+from app.services.embedding.query_cache import get_query_embedding_cache
 
 router = APIRouter()
 
@@ -71,7 +79,10 @@ def get_knowledge_bases(
     """
     knowledge_bases = (
         db.query(KnowledgeBase)
-        .filter(KnowledgeBase.user_id == current_user.id)
+        .filter(
+            KnowledgeBase.user_id == current_user.id,
+            KnowledgeBase.status == kb_deletion.ACTIVE
+        )
         .offset(skip)
         .limit(limit)
         .all()
@@ -141,13 +152,15 @@ async def delete_knowledge_base(
     *,
     db: Session = Depends(get_db),
     kb_id: int,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user)
 ) -> Any:
     """
     Delete knowledge base and all associated resources.
+
+    The knowledge base is hidden at once and its contents are removed in
+    the background; follow the progress at /{kb_id}/deletion.
     """
-    logger = logging.getLogger(__name__)
-    
     kb = (
         db.query(KnowledgeBase)
         .filter(
@@ -159,58 +172,36 @@ async def delete_knowledge_base(
     if not kb:
         raise HTTPException(status_code=404, detail="Knowledge base not found")
     
-    try:
-        # Get all document file paths before deletion
-        document_paths = [doc.file_path for doc in kb.documents]
-        
-        # Initialize services
-        minio_client = get_minio_client()
-        embeddings = EmbeddingsFactory.create()
+    # A deletion that is already running is left alone; a failed one is retried
+    if kb.status != kb_deletion.DELETING or kb_deletion.deletion_failed(kb):
+        kb_deletion.mark_deleting(db, kb)
+        background_tasks.add_task(asyncio.to_thread, kb_deletion.delete_knowledge_base_contents, kb_id)
+    
+    return {"message": "Knowledge base deletion started", "status": kb.status}
 
-        vector_store = VectorStoreFactory.create(
-            store_type=settings.VECTOR_STORE_TYPE,
-            collection_name=f"kb_{kb_id}",
-            embedding_function=embeddings,
+@router.get("/{kb_id}/deletion")
+def get_knowledge_base_deletion(
+    *,
+    db: Session = Depends(get_db),
+    kb_id: int,
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Get the progress of a knowledge base deletion. Returns 404 once the
+    knowledge base is gone.
+    """
+    kb = (
+        db.query(KnowledgeBase)
+        .filter(
+            KnowledgeBase.id == kb_id,
+            KnowledgeBase.user_id == current_user.id
         )
-        
-        # Clean up external resources first
-        cleanup_errors = []
-        
-        # 1. Clean up MinIO files
-        try:
-            # Delete all objects with prefix kb_{kb_id}/
-            objects = minio_client.list_objects(settings.MINIO_BUCKET_NAME, prefix=f"kb_{kb_id}/")
-            for obj in objects:
-                minio_client.remove_object(settings.MINIO_BUCKET_NAME, obj.object_name)
-            logger.info(f"Cleaned up MinIO files for knowledge base {kb_id}")
-        except MinioException as e:
-            cleanup_errors.append(f"Failed to clean up MinIO files: {str(e)}")
-            logger.error(f"MinIO cleanup error for kb {kb_id}: {str(e)}")
-        
-        # 2. Clean up vector store
-        try:
-            vector_store._store.delete_collection(f"kb_{kb_id}")
-            logger.info(f"Cleaned up vector store for knowledge base {kb_id}")
-        except Exception as e:
-            cleanup_errors.append(f"Failed to clean up vector store: {str(e)}")
-            logger.error(f"Vector store cleanup error for kb {kb_id}: {str(e)}")
-        
-        # Finally, delete database records in a single transaction
-        db.delete(kb)
-        db.commit()
-        
-        # Report any cleanup errors in the response
-        if cleanup_errors:
-            return {
-                "message": "Knowledge base deleted with cleanup warnings",
-                "warnings": cleanup_errors
-            }
-        
-        return {"message": "Knowledge base and all associated resources deleted successfully"}
-    except Exception as e:
-        db.rollback()
-        logger.error(f"Failed to delete knowledge base {kb_id}: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to delete knowledge base: {str(e)}")
+        .first()
+    )
+    if not kb:
+        raise HTTPException(status_code=404, detail="Knowledge base not found")
+    
+    return {"status": kb.status, **kb_deletion.public_progress(kb)}
 
 # Batch upload documents
 @router.post("/{kb_id}/documents/upload")
@@ -225,16 +216,17 @@ async def upload_kb_documents(
     """
     kb = db.query(KnowledgeBase).filter(
         KnowledgeBase.id == kb_id,
-        KnowledgeBase.user_id == current_user.id
+        KnowledgeBase.user_id == current_user.id,
+        KnowledgeBase.status == kb_deletion.ACTIVE
     ).first()
     if not kb:
         raise HTTPException(status_code=404, detail="Knowledge base not found")
     
     results = []
+    minio_client = get_minio_client()
     for file in files:
-        # 1. 计算文件 hash
-        file_content = await file.read()
-        file_hash = hashlib.sha256(file_content).hexdigest()
+        # 1. 计算文件 hash, streaming the spooled upload in constant memory
+        file_size, file_hash = await asyncio.to_thread(hash_stream, file.file)
         
         # 2. 检查是否存在完全相同的文件（名称和hash都相同）
         existing_document = db.query(Document).filter(
@@ -254,29 +246,16 @@ async def upload_kb_documents(
             })
             continue
         
-        # 3. 上传到临时目录
-        temp_path = f"kb_{kb_id}/temp/{file.filename}"
-        await file.seek(0)
-        try:
-            minio_client = get_minio_client()
-            file_size = len(file_content)  # 使用之前读取的文件内容长度
-            minio_client.put_object(
-                bucket_name=settings.MINIO_BUCKET_NAME,
-                object_name=temp_path,
-                data=file.file,
-                length=file_size,  # 指定文件大小
-                content_type=file.content_type
-            )
-        except MinioException as e:
-            logger.error(f"Failed to upload file to MinIO: {str(e)}")
-            raise HTTPException(status_code=500, detail="Failed to upload file")
-        
-        # 4. 创建上传记录
+        # 3. 创建上传记录. It references the blob before the blob is checked,
+        # committed under the blob lock, so a concurrent release either
+        # finishes first or sees the reference and keeps the blob
+        temp_path = blob_object_name(file_hash)
+        lock_blob(db, file_hash)
         upload = DocumentUpload(
             knowledge_base_id=kb_id,
             file_name=file.filename,
             file_hash=file_hash,
-            file_size=len(file_content),
+            file_size=file_size,
             content_type=file.content_type,
             temp_path=temp_path
         )
@@ -284,6 +263,18 @@ async def upload_kb_documents(
         db.commit()
         db.refresh(upload)
         
+        # 4. 上传到内容寻址的 blob; content stored before is not uploaded again
+        try:
+            if not await asyncio.to_thread(blob_exists, minio_client, file_hash):
+                await asyncio.to_thread(
+                    put_object_streaming, minio_client, temp_path, file.file, file.content_type
+                )
+        except MinioException as e:
+            logger.error(f"Failed to upload file to MinIO: {str(e)}")
+            db.delete(upload)
+            db.commit()
+            raise HTTPException(status_code=500, detail="Failed to upload file")
+        
         results.append({
             "upload_id": upload.id,
             "file_name": file.filename,
@@ -294,6 +285,146 @@ async def upload_kb_documents(
     
     return results
 
+def get_resumable_upload(db: Session, kb_id: int, upload_id: int, current_user: User) -> DocumentUpload:
+    upload = db.query(DocumentUpload).join(KnowledgeBase).filter(
+        DocumentUpload.id == upload_id,
+        DocumentUpload.knowledge_base_id == kb_id,
+        KnowledgeBase.user_id == current_user.id,
+        DocumentUpload.multipart_upload_id.isnot(None)
+    ).first()
+    if not upload:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return upload
+
+@router.post("/{kb_id}/documents/uploads")
+async def create_resumable_upload(
+    kb_id: int,
+    upload_in: ResumableUploadCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Start a resumable upload. The file is then sent as numbered parts of
+    part_size bytes, which can be retried or resumed in any order.
+    """
+    kb = db.query(KnowledgeBase).filter(
+        KnowledgeBase.id == kb_id,
+        KnowledgeBase.user_id == current_user.id,
+        KnowledgeBase.status == kb_deletion.ACTIVE
+    ).first()
+    if not kb:
+        raise HTTPException(status_code=404, detail="Knowledge base not found")
+    
+    try:
+        upload = await asyncio.to_thread(
+            resumable_upload.start_upload, db, get_minio_client(), kb_id,
+            upload_in.file_name, upload_in.file_size, upload_in.content_type
+        )
+    except MinioException as e:
+        logger.error(f"Failed to start multipart upload: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to start upload")
+    
+    return {
+        "upload_id": upload.id,
+        "file_name": upload.file_name,
+        "status": upload.status,
+        "part_size": upload.part_size,
+        "total_parts": upload.total_parts
+    }
+
+@router.put("/{kb_id}/documents/uploads/{upload_id}/parts/{part_number}")
+async def upload_resumable_part(
+    kb_id: int,
+    upload_id: int,
+    part_number: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Store one part of a resumable upload; the request body is the raw bytes.
+    Sending a part again replaces it.
+    """
+    upload = get_resumable_upload(db, kb_id, upload_id, current_user)
+    data = bytearray()
+    async for chunk in request.stream():
+        data.extend(chunk)
+        if len(data) > upload.part_size:
+            raise HTTPException(status_code=413, detail="Part is larger than part_size")
+    try:
+        resumable_upload.check_part(upload, part_number, len(data))
+    except resumable_upload.UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        etag = await asyncio.to_thread(
+            upload_part, get_minio_client(), upload.temp_path, upload.multipart_upload_id, part_number, bytes(data)
+        )
+    except MinioException as e:
+        logger.error(f"Failed to upload part {part_number} of upload {upload_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to upload part")
+    resumable_upload.touch_upload(db, upload)
+    
+    return {"part_number": part_number, "size": len(data), "etag": etag}
+
+@router.get("/{kb_id}/documents/uploads/{upload_id}")
+async def get_resumable_upload_status(
+    kb_id: int,
+    upload_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get the state of a resumable upload, including the parts still missing.
+    Once verified, the response can be passed to the process endpoint.
+    """
+    upload = get_resumable_upload(db, kb_id, upload_id, current_user)
+    return await asyncio.to_thread(resumable_upload.upload_status, get_minio_client(), upload)
+
+@router.post("/{kb_id}/documents/uploads/{upload_id}/complete")
+async def complete_resumable_upload(
+    kb_id: int,
+    upload_id: int,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Assemble a resumable upload once every part is stored. The file is then
+    hashed in the background; poll the upload until it leaves "verifying".
+    """
+    upload = get_resumable_upload(db, kb_id, upload_id, current_user)
+    try:
+        await asyncio.to_thread(resumable_upload.complete_upload, db, get_minio_client(), upload)
+    except resumable_upload.UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except MinioException as e:
+        logger.error(f"Failed to complete upload {upload_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to complete upload")
+    
+    background_tasks.add_task(asyncio.to_thread, resumable_upload.finalize_upload, upload.id)
+    return {"upload_id": upload.id, "status": upload.status}
+
+@router.delete("/{kb_id}/documents/uploads/{upload_id}")
+async def abort_resumable_upload(
+    kb_id: int,
+    upload_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Abort a resumable upload and discard its parts.
+    """
+    upload = get_resumable_upload(db, kb_id, upload_id, current_user)
+    if upload.status not in (resumable_upload.UPLOADING, "failed"):
+        raise HTTPException(status_code=400, detail=f"Upload is {upload.status}")
+    try:
+        await asyncio.to_thread(resumable_upload.abort_upload, db, get_minio_client(), upload)
+    except MinioException as e:
+        logger.error(f"Failed to abort upload {upload_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to abort upload")
+    return {"message": "Upload aborted"}
+
 @router.post("/{kb_id}/documents/preview")
 async def preview_kb_documents(
     kb_id: int,
@@ -304,36 +435,75 @@ async def preview_kb_documents(
     """
     Preview multiple documents' chunks.
     """
-    results = {}
-    for doc_id in preview_request.document_ids:
-        document = db.query(Document).join(KnowledgeBase).filter(
-            Document.id == doc_id,
+    document_ids = list(dict.fromkeys(preview_request.document_ids))
+    if not document_ids:
+        return {}
+    
+    # Resolve every ID in one round trip; an ID names a processed document
+    # or, failing that, a pending upload
+    documents = (
+        select(
+            Document.id.label("id"),
+            Document.file_path.label("object_name"),
+            Document.file_name.label("file_name"),
+            Document.file_hash.label("file_hash"),
+            literal(0).label("priority")
+        )
+        .join(KnowledgeBase)
+        .where(
+            Document.id.in_(document_ids),
             Document.knowledge_base_id == kb_id,
             KnowledgeBase.user_id == current_user.id
-        ).first()
-        
-        if document:
-            file_path = document.file_path
-        else:
-            upload = db.query(DocumentUpload).join(KnowledgeBase).filter(
-                DocumentUpload.id == doc_id,
-                DocumentUpload.knowledge_base_id == kb_id,
-                KnowledgeBase.user_id == current_user.id
-            ).first()
-            
-            if not upload:
-                raise HTTPException(status_code=404, detail=f"Document {doc_id} not found")
-            
-            file_path = upload.temp_path
-        
-        preview = await preview_document(
-            file_path,
-            chunk_size=preview_request.chunk_size,
-            chunk_overlap=preview_request.chunk_overlap
         )
-        results[doc_id] = preview
+    )
+    uploads = (
+        select(
+            DocumentUpload.id,
+            DocumentUpload.temp_path,
+            DocumentUpload.file_name,
+            DocumentUpload.file_hash,
+            literal(1)
+        )
+        .join(KnowledgeBase)
+        .where(
+            DocumentUpload.id.in_(document_ids),
+            DocumentUpload.knowledge_base_id == kb_id,
+            KnowledgeBase.user_id == current_user.id
+        )
+    )
+    sources = {}
+    for row in sorted(db.execute(union_all(documents, uploads)).all(), key=lambda row: row.priority):
+        sources.setdefault(row.id, row)
+    for doc_id in document_ids:
+        if doc_id not in sources:
+            raise HTTPException(status_code=404, detail=f"Document {doc_id} not found")
     
-    return results
+    # Preview concurrently; files with the same content and type share one preview
+    semaphore = asyncio.Semaphore(settings.PREVIEW_MAX_CONCURRENCY)
+    
+    async def preview(source) -> PreviewResult:
+        async with semaphore:
+            return await preview_document(
+                source.object_name,
+                chunk_size=preview_request.chunk_size,
+                chunk_overlap=preview_request.chunk_overlap,
+                file_name=source.file_name,
+                file_hash=source.file_hash,
+                mode=preview_request.mode,
+                max_pages=preview_request.max_pages,
+                offset=preview_request.offset,
+                limit=preview_request.limit
+            )
+    
+    keys, pending = {}, {}
+    for doc_id in document_ids:
+        source = sources[doc_id]
+        keys[doc_id] = key = (source.file_hash or source.object_name, os.path.splitext(source.file_name)[1].lower())
+        if key not in pending:
+            pending[key] = asyncio.ensure_future(preview(source))
+    await asyncio.gather(*pending.values())
+    
+    return {doc_id: pending[keys[doc_id]].result() for doc_id in document_ids}
 
 @router.post("/{kb_id}/documents/process")
 async def process_kb_documents(
@@ -350,7 +520,8 @@ async def process_kb_documents(
     
     kb = db.query(KnowledgeBase).filter(
         KnowledgeBase.id == kb_id,
-        KnowledgeBase.user_id == current_user.id
+        KnowledgeBase.user_id == current_user.id,
+        KnowledgeBase.status == kb_deletion.ACTIVE
     ).first()
     
     if not kb:
@@ -374,6 +545,8 @@ async def process_kb_documents(
     uploads_dict = {upload.id: upload for upload in uploads}
     if len(uploads_dict) != len(set(upload_ids)):
         raise HTTPException(status_code=400, detail="One or more upload IDs are invalid")
+    if any(upload.status in (resumable_upload.UPLOADING, resumable_upload.VERIFYING, "failed") for upload in uploads):
+        raise HTTPException(status_code=400, detail="One or more uploads are not complete")
     
     all_tasks = []
     for upload_id in upload_ids:
@@ -413,27 +586,90 @@ async def process_kb_documents(
                     "file_name": upload.file_name
                 })
     
-    background_tasks.add_task(
-        add_processing_tasks_to_queue,
-        task_data,
-        kb_id
-    )
+    # Tasks are durable rows; dedicated workers pick them up when the API
+    # does not process them itself
+    if settings.INGESTION_RUN_IN_API:
+        background_tasks.add_task(
+            add_processing_tasks_to_queue,
+            task_data,
+            kb_id
+        )
     
     return {"tasks": task_info}
 
 async def add_processing_tasks_to_queue(task_data, kb_id):
     """Helper function to add document processing tasks to the queue without blocking the main response."""
     for data in task_data:
-        asyncio.create_task(
-            process_document_background(
-                data["temp_path"],
-                data["file_name"],
-                kb_id,
-                data["task_id"],
-                None
-            )
+        await ingestion_scheduler.submit(
+            data["task_id"],
+            process_document_background,
+            data["temp_path"],
+            data["file_name"],
+            kb_id,
+            data["task_id"],
+            None
         )
-    logger.info(f"Added {len(task_data)} document processing tasks to queue")
+    logger.info(
+        f"Added {len(task_data)} document processing tasks to queue "
+        f"(queue depth: {ingestion_scheduler.queue_depth})"
+    )
+
+@router.get("/ingestion/queue")
+async def get_ingestion_queue(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get ingestion queue depth, concurrency and recent job timings.
+    """
+    return ingestion_scheduler.stats()
+
+@router.get("/ingestion/stages")
+async def get_ingestion_stage_stats(
+    hours: float = Query(24, gt=0, description="Only tasks updated within this many hours"),
+    limit: int = Query(1000, ge=1, le=10000, description="Most recent tasks to aggregate"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get per-stage timing histograms of recently processed tasks.
+    """
+    since = datetime.utcnow() - timedelta(hours=hours)
+    rows = (
+        db.query(ProcessingTask.stage_timings, ProcessingTask.chunk_count, ProcessingTask.byte_count)
+        .join(KnowledgeBase, ProcessingTask.knowledge_base_id == KnowledgeBase.id)
+        .filter(
+            KnowledgeBase.user_id == current_user.id,
+            ProcessingTask.stage_timings.isnot(None),
+            ProcessingTask.updated_at >= since
+        )
+        .order_by(ProcessingTask.updated_at.desc())
+        .limit(limit)
+        .all()
+    )
+    return {
+        "tasks": len(rows),
+        "chunks": sum(row.chunk_count or 0 for row in rows),
+        "bytes": sum(row.byte_count or 0 for row in rows),
+        "stages": aggregate_stage_timings(row.stage_timings for row in rows)
+    }
+
+@router.get("/ingestion/embedding-cache")
+async def get_embedding_cache_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get embedding cache hit rates and query batching stats for this process.
+    """
+    cache = get_embedding_cache()
+    query_cache = get_query_embedding_cache()
+    stats = {"backend": "none"} if cache is None else {
+        "backend": settings.EMBEDDING_CACHE_BACKEND.lower(),
+        "max_entries": cache.max_entries,
+        **cache.stats.to_dict()
+    }
+    stats["query_cache"] = query_cache.stats() if query_cache else None
+    stats["query_coalescer"] = EmbeddingsFactory.coalescer_stats()
+    return stats
 
 @router.post("/cleanup")
 async def cleanup_temp_files(
@@ -441,28 +677,15 @@ async def cleanup_temp_files(
     current_user: User = Depends(get_current_user)
 ):
     """
-    Clean up expired temporary files.
+    Clean up expired temporary files. The reaper does this periodically;
+    this runs the same pass immediately.
     """
-    expired_time = datetime.utcnow() - timedelta(hours=24)
-    expired_uploads = db.query(DocumentUpload).filter(
-        DocumentUpload.created_at < expired_time
-    ).all()
-    
-    minio_client = get_minio_client()
-    for upload in expired_uploads:
-        try:
-            minio_client.remove_object(
-                bucket_name=settings.MINIO_BUCKET_NAME,
-                object_name=upload.temp_path
-            )
-        except MinioException as e:
-            logger.error(f"Failed to delete temp file {upload.temp_path}: {str(e)}")
-        
-        db.delete(upload)
-    
-    db.commit()
+    expired_time = datetime.utcnow() - timedelta(hours=settings.UPLOAD_EXPIRE_HOURS)
+    deleted = await asyncio.to_thread(
+        reap_expired_uploads, db, get_minio_client(), expired_time, settings.REAPER_BATCH_SIZE
+    )
     
-    return {"message": f"Cleaned up {len(expired_uploads)} expired uploads"}
+    return {"message": f"Cleaned up {deleted} expired uploads"}
 
 @router.get("/{kb_id}/documents/tasks")
 async def get_processing_tasks(
@@ -496,16 +719,23 @@ async def get_processing_tasks(
         .all()
     )
     
-    return {
-        task.id: {
+    results = {}
+    for task in tasks:
+        timing = ingestion_scheduler.get_timing(task.id)
+        results[task.id] = {
             "document_id": task.document_id,
             "status": task.status,
             "error_message": task.error_message,
             "upload_id": task.document_upload_id,
-            "file_name": task.document_upload.file_name if task.document_upload else None
+            "file_name": task.document_upload.file_name if task.document_upload else None,
+            "attempts": task.attempts,
+            "queue_seconds": timing.queue_seconds if timing else None,
+            "run_seconds": timing.run_seconds if timing else None,
+            "stage_timings": task.stage_timings,
+            "chunk_count": task.chunk_count,
+            "byte_count": task.byte_count
         }
-        for task in tasks
-    }
+    return results
 
 @router.get("/{kb_id}/documents/{doc_id}", response_model=DocumentResponse)
 async def get_document(
@@ -556,7 +786,7 @@ async def test_retrieval(
                 detail=f"Knowledge base {request.kb_id} not found",
             )
         
-        embeddings = EmbeddingsFactory.create()
+        embeddings = EmbeddingsFactory.create_for_queries()
         
         vector_store = VectorStoreFactory.create(
             store_type=settings.VECTOR_STORE_TYPE,
@@ -564,7 +794,8 @@ async def test_retrieval(
             embedding_function=embeddings,
         )
         
-        results = vector_store.similarity_search_with_score(request.query, k=request.top_k)
+        # Off the event loop, so concurrent queries can be coalesced
+        results = await asyncio.to_thread(vector_store.similarity_search_with_score, request.query, k=request.top_k)
         
         response = []
         for doc, score in results:
@@ -0,0 +1,73 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class LRUCache:
+    """
+    Thread-safe in-memory cache that evicts the least recently used entry.
+    With a ttl, entries also expire that many seconds after being set.
+
+    maxsize bounds the number of entries, or with a weigher the total
+    weight of the entries (e.g. their size in bytes).
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None, weigher: Optional[Callable[[Any], int]] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.weigher = weigher
+        self.hits = 0
+        self.misses = 0
+        self.weight = 0
+        self._data: "OrderedDict[Hashable, Tuple[Any, Optional[float], int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+                self._pop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        weight = self.weigher(value) if self.weigher else 1
+        if weight > self.maxsize:
+            # Would evict everything else and still not fit
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            self._data[key] = (value, expires_at, weight)
+            self.weight += weight
+            while self.weight > self.maxsize:
+                self._pop(next(iter(self._data)))
+
+    def _pop(self, key: Hashable) -> None:
+        self.weight -= self._data.pop(key)[2]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.weight = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.maxsize,
+            **({"weight": self.weight} if self.weigher else {}),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else None,
+        }
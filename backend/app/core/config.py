@@ -37,11 +37,54 @@ class Settings(BaseSettings):
     # Embeddings settings
     EMBEDDINGS_PROVIDER: str = os.getenv("EMBEDDINGS_PROVIDER", "openai")
 
+    # Ingestion embedding settings: 0 uses the per-provider default
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "0"))
+    EMBEDDING_MAX_CONCURRENCY: int = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "0"))
+    EMBEDDING_TARGET_LATENCY_SECONDS: float = float(os.getenv("EMBEDDING_TARGET_LATENCY_SECONDS", "5"))
+    EMBEDDING_MAX_RETRIES: int = int(os.getenv("EMBEDDING_MAX_RETRIES", "6"))
+    EMBEDDING_RETRY_BACKOFF_SECONDS: float = float(os.getenv("EMBEDDING_RETRY_BACKOFF_SECONDS", "1"))
+    EMBEDDING_RETRY_BACKOFF_MAX_SECONDS: float = float(os.getenv("EMBEDDING_RETRY_BACKOFF_MAX_SECONDS", "60"))
+    # Connection pool of the shared HTTP client of remote embeddings providers
+    EMBEDDINGS_HTTP_MAX_CONNECTIONS: int = int(os.getenv("EMBEDDINGS_HTTP_MAX_CONNECTIONS", "20"))
+    EMBEDDINGS_HTTP_KEEPALIVE_SECONDS: float = float(os.getenv("EMBEDDINGS_HTTP_KEEPALIVE_SECONDS", "60"))
+
+    # Embedding cache for ingestion: none, sqlite (local file) or mysql (shared)
+    EMBEDDING_CACHE_BACKEND: str = os.getenv("EMBEDDING_CACHE_BACKEND", "none")
+    EMBEDDING_CACHE_PATH: str = os.getenv("EMBEDDING_CACHE_PATH", "cache/embeddings.sqlite3")
+    EMBEDDING_CACHE_MAX_ENTRIES: int = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "1000000"))
+
+    # Query embedding cache for retrieval: entries kept in memory (0 disables
+    # it) and their lifetime; with a path, a SQLite file shared by the
+    # processes on one host backs the in-memory cache
+    QUERY_EMBEDDING_CACHE_SIZE: int = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1000"))
+    QUERY_EMBEDDING_CACHE_TTL_SECONDS: float = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL_SECONDS", "3600"))
+    QUERY_EMBEDDING_CACHE_PATH: str = os.getenv("QUERY_EMBEDDING_CACHE_PATH", "")
+    QUERY_EMBEDDING_CACHE_DISK_ENTRIES: int = int(os.getenv("QUERY_EMBEDDING_CACHE_DISK_ENTRIES", "100000"))
+    # Queries to remote embeddings providers arriving within this window are
+    # sent as one batched request (0 disables), up to this many per request
+    QUERY_EMBEDDING_COALESCE_WAIT_MS: float = float(os.getenv("QUERY_EMBEDDING_COALESCE_WAIT_MS", "5"))
+    QUERY_EMBEDDING_COALESCE_MAX_BATCH: int = int(os.getenv("QUERY_EMBEDDING_COALESCE_MAX_BATCH", "32"))
+
     # MinIO settings
     MINIO_ENDPOINT: str = os.getenv("MINIO_ENDPOINT", "localhost:9000")
     MINIO_ACCESS_KEY: str = os.getenv("MINIO_ACCESS_KEY", "minioadmin")
     MINIO_SECRET_KEY: str = os.getenv("MINIO_SECRET_KEY", "minioadmin")
     MINIO_BUCKET_NAME: str = os.getenv("MINIO_BUCKET_NAME", "documents")
+    # Part size of streamed multipart uploads (MinIO requires at least 5 MiB)
+    MINIO_UPLOAD_PART_SIZE: int = int(os.getenv("MINIO_UPLOAD_PART_SIZE", str(10 * 1024 * 1024)))
+    # Uploads not processed within this many hours of their last activity
+    # (creation or, for resumable uploads, the latest part) are deleted by the reaper
+    UPLOAD_EXPIRE_HOURS: int = int(os.getenv("UPLOAD_EXPIRE_HOURS", "24"))
+    # How often the reaper runs (0 disables it), rows/objects per batch and
+    # the age after which local temp files count as left behind
+    REAPER_INTERVAL_SECONDS: float = float(os.getenv("REAPER_INTERVAL_SECONDS", "3600"))
+    REAPER_BATCH_SIZE: int = int(os.getenv("REAPER_BATCH_SIZE", "500"))
+    REAPER_TEMP_FILE_MAX_AGE_HOURS: float = float(os.getenv("REAPER_TEMP_FILE_MAX_AGE_HOURS", "6"))
+    # Objects and rows removed per batch when deleting a knowledge base
+    KB_DELETE_BATCH_SIZE: int = int(os.getenv("KB_DELETE_BATCH_SIZE", "1000"))
+    # Part size of resumable uploads; raised for files that would need more
+    # than 10000 parts
+    RESUMABLE_UPLOAD_PART_SIZE: int = int(os.getenv("RESUMABLE_UPLOAD_PART_SIZE", str(16 * 1024 * 1024)))
 
     # OpenAI settings
     OPENAI_API_BASE: str = os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1")
@@ -53,6 +96,51 @@ class Settings(BaseSettings):
     DASH_SCOPE_API_KEY: str = os.getenv("DASH_SCOPE_API_KEY", "")
     DASH_SCOPE_EMBEDDINGS_MODEL: str = os.getenv("DASH_SCOPE_EMBEDDINGS_MODEL", "")
 
+    # Ingestion settings
+    INGESTION_MAX_CONCURRENCY: int = int(os.getenv("INGESTION_MAX_CONCURRENCY", "4"))
+    # Chunks written to the database and vector store per flush
+    INGESTION_BATCH_SIZE: int = int(os.getenv("INGESTION_BATCH_SIZE", "512"))
+    # Batches buffered between the parse, embed and write stages of a
+    # document; 0 runs the stages one after another
+    INGESTION_PIPELINE_DEPTH: int = int(os.getenv("INGESTION_PIPELINE_DEPTH", "2"))
+    # Rows per multi-row INSERT when writing document chunks
+    CHUNK_INSERT_BATCH_SIZE: int = int(os.getenv("CHUNK_INSERT_BATCH_SIZE", "500"))
+    # tiktoken encoding (e.g. cl100k_base) to measure chunk size and overlap
+    # in tokens instead of characters
+    CHUNK_TOKEN_ENCODING: str = os.getenv("CHUNK_TOKEN_ENCODING", "")
+    # Near-duplicate chunks within a knowledge base: "off", "drop" (not
+    # stored) or "merge" (stored but not embedded). Either way their content
+    # is only retrieved while the chunk they matched is kept
+    NEAR_DUPLICATE_MODE: str = os.getenv("NEAR_DUPLICATE_MODE", "off")
+    # SimHash bits two chunks may differ in to count as near-duplicates
+    NEAR_DUPLICATE_MAX_DISTANCE: int = int(os.getenv("NEAR_DUPLICATE_MAX_DISTANCE", "3"))
+    # Process ingestion tasks inside the API process; disable when running
+    # dedicated workers with `python -m app.worker`
+    INGESTION_RUN_IN_API: bool = os.getenv("INGESTION_RUN_IN_API", "true").lower() == "true"
+    INGESTION_MAX_ATTEMPTS: int = int(os.getenv("INGESTION_MAX_ATTEMPTS", "3"))
+    INGESTION_LEASE_SECONDS: int = int(os.getenv("INGESTION_LEASE_SECONDS", "120"))
+    INGESTION_HEARTBEAT_SECONDS: int = int(os.getenv("INGESTION_HEARTBEAT_SECONDS", "30"))
+    INGESTION_POLL_SECONDS: float = float(os.getenv("INGESTION_POLL_SECONDS", "5"))
+    INGESTION_RETRY_BACKOFF_SECONDS: float = float(os.getenv("INGESTION_RETRY_BACKOFF_SECONDS", "10"))
+    INGESTION_RETRY_BACKOFF_MAX_SECONDS: float = float(os.getenv("INGESTION_RETRY_BACKOFF_MAX_SECONDS", "600"))
+
+    # Document parsing settings: loaders run in a process pool so parsing uses
+    # all cores; 0 parses in the calling thread
+    PARSER_MAX_WORKERS: int = int(os.getenv("PARSER_MAX_WORKERS", str(min(os.cpu_count() or 1, 4))))
+    PARSER_TIMEOUT_SECONDS: float = float(os.getenv("PARSER_TIMEOUT_SECONDS", "300"))
+    PARSER_MAX_TASKS_PER_CHILD: int = int(os.getenv("PARSER_MAX_TASKS_PER_CHILD", "50"))
+    # Files at least this large are streamed from the parser pool page by page
+    # through a temp file instead of being returned whole
+    PARSER_STREAMING_MIN_BYTES: int = int(os.getenv("PARSER_STREAMING_MIN_BYTES", str(20 * 1024 * 1024)))
+    # Keep the parsed text of each file in MinIO so previews and reprocessing
+    # only re-chunk it instead of parsing the file again
+    PARSED_TEXT_CACHE_ENABLED: bool = os.getenv("PARSED_TEXT_CACHE_ENABLED", "true").lower() == "true"
+    # Documents previewed in parallel per request
+    PREVIEW_MAX_CONCURRENCY: int = int(os.getenv("PREVIEW_MAX_CONCURRENCY", "4"))
+    # Memory for preview results, keyed by content and chunking parameters,
+    # in bytes of chunk text
+    PREVIEW_CACHE_MAX_BYTES: int = int(os.getenv("PREVIEW_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
     # Vector Store settings
     VECTOR_STORE_TYPE: str = os.getenv("VECTOR_STORE_TYPE", "chroma")
 
@@ -87,6 +175,17 @@ class Settings(BaseSettings):
         "HUGGINGFACE_EMBEDDINGS_MODEL", "sentence-transformers/all-MiniLM-L6-v2"
     )
 
+    # Local ONNX Runtime embeddings: a directory with the ONNX model and its
+    # tokenizer.json; the model file may be an int8 quantized variant.
+    # 0 threads lets ONNX Runtime use all cores
+    ONNX_EMBEDDINGS_MODEL_PATH: str = os.getenv("ONNX_EMBEDDINGS_MODEL_PATH", "")
+    ONNX_EMBEDDINGS_MODEL_FILE: str = os.getenv("ONNX_EMBEDDINGS_MODEL_FILE", "model.onnx")
+    ONNX_EMBEDDINGS_MAX_LENGTH: int = int(os.getenv("ONNX_EMBEDDINGS_MAX_LENGTH", "512"))
+    ONNX_EMBEDDINGS_THREADS: int = int(os.getenv("ONNX_EMBEDDINGS_THREADS", "0"))
+    # Texts packed into one forward pass, and how long a text waits for others
+    EMBEDDING_MICRO_BATCH_SIZE: int = int(os.getenv("EMBEDDING_MICRO_BATCH_SIZE", "32"))
+    EMBEDDING_MICRO_BATCH_WAIT_MS: float = float(os.getenv("EMBEDDING_MICRO_BATCH_WAIT_MS", "5"))
+
     class Config:
         env_file = ".env"
 
@@ -1,5 +1,10 @@
+import hashlib
 import logging
+from itertools import islice
+from typing import BinaryIO, Iterable, Iterator, List, Tuple
 from minio import Minio
+from minio.datatypes import Part
+from minio.deleteobjects import DeleteObject
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
@@ -27,3 +32,99 @@ def init_minio():
         client.make_bucket(settings.MINIO_BUCKET_NAME)
     else:
         logger.info(f"Bucket {settings.MINIO_BUCKET_NAME} already exists.")
+
+
+class HashingReader:
+    """File-like wrapper that computes the SHA-256 and size of what is read through it"""
+
+    def __init__(self, stream: BinaryIO):
+        self._stream = stream
+        self._sha256 = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._stream.read(size)
+        self._sha256.update(data)
+        self.size += len(data)
+        return data
+
+    def hexdigest(self) -> str:
+        return self._sha256.hexdigest()
+
+
+def put_object_streaming(
+    client: Minio, object_name: str, stream: BinaryIO, content_type: str = "application/octet-stream"
+) -> Tuple[int, str]:
+    """
+    Upload a stream of unknown length as a multipart upload.
+
+    The stream is read one part at a time, so memory use is bounded by
+    MINIO_UPLOAD_PART_SIZE whatever the file size. Returns the size and
+    SHA-256 hex digest of the uploaded content.
+    """
+    reader = HashingReader(stream)
+    client.put_object(
+        bucket_name=settings.MINIO_BUCKET_NAME,
+        object_name=object_name,
+        data=reader,
+        length=-1,
+        part_size=settings.MINIO_UPLOAD_PART_SIZE,
+        content_type=content_type or "application/octet-stream",
+    )
+    return reader.size, reader.hexdigest()
+
+
+# Multipart uploads driven by the client one part at a time. minio-py only
+# exposes these S3 calls as internal methods of the client
+
+def create_multipart_upload(client: Minio, object_name: str, content_type: str = "application/octet-stream") -> str:
+    """Start a multipart upload and return its upload ID"""
+    return client._create_multipart_upload(
+        settings.MINIO_BUCKET_NAME, object_name, {"Content-Type": content_type or "application/octet-stream"}
+    )
+
+
+def upload_part(client: Minio, object_name: str, upload_id: str, part_number: int, data: bytes) -> str:
+    """Upload (or re-upload) one part and return its ETag"""
+    return client._upload_part(settings.MINIO_BUCKET_NAME, object_name, data, None, upload_id, part_number)
+
+
+def list_uploaded_parts(client: Minio, object_name: str, upload_id: str) -> List[Part]:
+    """Every part stored so far for a multipart upload, in part number order"""
+    parts: List[Part] = []
+    marker = None
+    while True:
+        result = client._list_parts(
+            settings.MINIO_BUCKET_NAME, object_name, upload_id, part_number_marker=marker
+        )
+        parts.extend(result.parts)
+        if not result.is_truncated:
+            return parts
+        marker = result.next_part_number_marker
+
+
+def complete_multipart_upload(client: Minio, object_name: str, upload_id: str, parts: List[Part]) -> None:
+    client._complete_multipart_upload(settings.MINIO_BUCKET_NAME, object_name, upload_id, parts)
+
+
+def abort_multipart_upload(client: Minio, object_name: str, upload_id: str) -> None:
+    client._abort_multipart_upload(settings.MINIO_BUCKET_NAME, object_name, upload_id)
+
+
+# S3 DeleteObjects accepts at most 1000 keys per request
+MAX_REMOVE_OBJECTS = 1000
+
+
+def remove_objects_batched(client: Minio, object_names: Iterable[str], batch_size: int = MAX_REMOVE_OBJECTS) -> Iterator[int]:
+    """Remove objects with one DeleteObjects request per batch, yielding each batch size"""
+    names = iter(object_names)
+    batch_size = max(1, min(batch_size, MAX_REMOVE_OBJECTS))
+    while True:
+        batch = list(islice(names, batch_size))
+        if not batch:
+            return
+        errors = client.remove_objects(settings.MINIO_BUCKET_NAME, [DeleteObject(name) for name in batch])
+        # The result is lazy: iterating it sends the request
+        for error in errors:
+            logger.error(f"Failed to remove {error.name}: {error.message}")
+        yield len(batch)
@@ -0,0 +1,56 @@
+import logging
+import os
+import tempfile
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Local temp files of this application carry this prefix, so files left
+# behind by a crashed process can be found and swept
+TEMP_FILE_PREFIX = "ragwebui_"
+
+
+def named_temp_file(suffix: str = ""):
+    """A NamedTemporaryFile that is kept on close; the caller removes it"""
+    return tempfile.NamedTemporaryFile(delete=False, prefix=TEMP_FILE_PREFIX, suffix=suffix)
+
+
+def make_temp_file(suffix: str = "") -> str:
+    """Create an empty temp file and return its path; the caller removes it"""
+    fd, path = tempfile.mkstemp(prefix=TEMP_FILE_PREFIX, suffix=suffix)
+    os.close(fd)
+    return path
+
+
+def sweep_temp_files(max_age_seconds: float, directory: Optional[str] = None) -> int:
+    """
+    Remove temp files of this application not modified for max_age_seconds.
+
+    Files in use are written to or read shortly after being created, so a
+    file that old was left behind by a process that died before cleaning up.
+    Returns the number of files removed.
+    """
+    directory = directory or tempfile.gettempdir()
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    try:
+        entries = os.scandir(directory)
+    except OSError as e:
+        logger.warning(f"Failed to list temp directory {directory}: {str(e)}")
+        return 0
+    with entries:
+        for entry in entries:
+            if not entry.name.startswith(TEMP_FILE_PREFIX):
+                continue
+            try:
+                if entry.is_file(follow_symlinks=False) and entry.stat(follow_symlinks=False).st_mtime < cutoff:
+                    os.unlink(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                logger.warning(f"Failed to remove temp file {entry.path}: {str(e)}")
+    if removed:
+        logger.info(f"Removed {removed} stale temp files from {directory}")
+    return removed
@@ -1,9 +1,15 @@
+import asyncio
 import logging
 
 from app.api.api_v1.api import api_router
 from app.api.openapi.api import router as openapi_router
 from app.core.config import settings
 from app.core.minio import init_minio
+from app.services.document_parser import shutdown_parser_pool
+from app.services.ingestion_scheduler import ingestion_scheduler
+from app.services.kb_deletion import resume_deletions
+from app.services.reaper import run_reaper_loop
+from app.worker import run_dispatch_loop
 from app.startup.migarate import DatabaseMigrator
 from fastapi import FastAPI
 
@@ -18,6 +24,9 @@ app = FastAPI(
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
 )
 
+# Stops the in-process ingestion dispatch loop on shutdown
+ingestion_stop = asyncio.Event()
+
 # Include routers
 app.include_router(api_router, prefix=settings.API_V1_STR)
 app.include_router(openapi_router, prefix="/openapi")
@@ -30,6 +39,21 @@ async def startup_event():
     # Run database migrations
     migrator = DatabaseMigrator(settings.get_database_url)
     migrator.run_migrations()
+    # Pick up pending tasks, including ones orphaned by a previous crash
+    if settings.INGESTION_RUN_IN_API:
+        asyncio.create_task(run_dispatch_loop(ingestion_scheduler, ingestion_stop))
+    # Finish knowledge base deletions interrupted by a restart
+    asyncio.create_task(asyncio.to_thread(resume_deletions))
+    # Periodically remove expired uploads and abandoned temp files
+    asyncio.create_task(run_reaper_loop(ingestion_stop))
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Let in-flight ingestion jobs finish before the process exits
+    ingestion_stop.set()
+    await ingestion_scheduler.shutdown()
+    shutdown_parser_pool()
 
 
 @app.get("/")
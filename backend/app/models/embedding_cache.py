@@ -0,0 +1,20 @@
+from sqlalchemy import Column, String, DateTime, LargeBinary
+from datetime import datetime
+import sqlalchemy as sa
+
+from app.models.base import Base
+
+class EmbeddingCacheEntry(Base):
+    __tablename__ = "embedding_cache"
+
+    # SHA-256 of provider, model and content hash
+    key = Column(String(64), primary_key=True)
+    provider = Column(String(50), nullable=False)
+    model = Column(String(255), nullable=False)
+    vector = Column(LargeBinary(length=2 ** 24 - 1), nullable=False)  # float32 array, MEDIUMBLOB on MySQL
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_used_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        sa.Index('idx_embedding_cache_last_used', 'last_used_at'),
+    )
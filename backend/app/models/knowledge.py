@@ -12,6 +12,10 @@ class KnowledgeBase(Base, TimestampMixin):
     name = Column(String(255), nullable=False)
     description = Column(LONGTEXT)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # "active", or "deleting" while a background job removes its contents;
+    # deletion_progress reports the stage and rows/objects deleted so far
+    status = Column(String(20), nullable=False, default="active", server_default="active")
+    deletion_progress = Column(JSON, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -58,10 +62,24 @@ class DocumentUpload(Base):
     created_at = Column(TIMESTAMP, nullable=False, server_default=text("now()"))
     status = Column(String, nullable=False, server_default="pending")
     error_message = Column(Text)
+    # Resumable uploads: the MinIO multipart upload the client sends parts to,
+    # and how the file is split into parts
+    multipart_upload_id = Column(String(255), nullable=True)
+    part_size = Column(BigInteger, nullable=True)
+    total_parts = Column(Integer, nullable=True)
+    # Last time a part arrived or the upload changed state; uploads expire
+    # by this, falling back to created_at
+    updated_at = Column(TIMESTAMP, nullable=True)
     
     # Relationships
     knowledge_base = relationship("KnowledgeBase", back_populates="document_uploads")
 
+class BlobLock(Base):
+    __tablename__ = "blob_locks"
+
+    # One row per blob, locked while the blob gains a reference or is released
+    file_hash = Column(String(64), primary_key=True)
+
 class ProcessingTask(Base):
     __tablename__ = "processing_tasks"
 
@@ -71,6 +89,22 @@ class ProcessingTask(Base):
     document_upload_id = Column(Integer, ForeignKey("document_uploads.id"), nullable=True)
     status = Column(String(50), default="pending")  # pending, processing, completed, failed
     error_message = Column(Text, nullable=True)
+    # Work queue state: a worker holds a lease on a task while processing it
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    locked_by = Column(String(255), nullable=True)  # Worker ID holding the lease
+    lease_expires_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    next_attempt_at = Column(DateTime, nullable=True)  # Retry backoff
+    # Instrumentation of the latest attempt: seconds per stage, chunks stored
+    # and bytes of the source file
+    stage_timings = Column(JSON, nullable=True)
+    chunk_count = Column(Integer, nullable=True)
+    byte_count = Column(BigInteger, nullable=True)
+    # Resume point for retries: chunks [0, checkpoint_chunk_index) are stored
+    # and acknowledged by the vector store; the key identifies the content
+    # and chunking settings the checkpoint was taken with
+    checkpoint_chunk_index = Column(Integer, nullable=True)
+    checkpoint_key = Column(String(64), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -78,6 +112,10 @@ class ProcessingTask(Base):
     document = relationship("Document", back_populates="processing_tasks")
     document_upload = relationship("DocumentUpload", backref="processing_tasks")
 
+    __table_args__ = (
+        sa.Index('idx_processing_tasks_queue', 'status', 'next_attempt_at'),
+    )
+
 class DocumentChunk(Base, TimestampMixin):
     __tablename__ = "document_chunks"
 
@@ -85,8 +123,10 @@ class DocumentChunk(Base, TimestampMixin):
     kb_id = Column(Integer, ForeignKey("knowledge_bases.id"), nullable=False)
     document_id = Column(Integer, ForeignKey("documents.id"), nullable=False)
     file_name = Column(String(255), nullable=False)
+    chunk_index = Column(Integer, nullable=True)  # Position within the document
     chunk_metadata = Column(JSON, nullable=True)
     hash = Column(String(64), nullable=False, index=True)  # Content hash for change detection
+    simhash = Column(String(16), nullable=True)  # Hex SimHash for near-duplicate detection
     
     # Relationships
     knowledge_base = relationship("KnowledgeBase", back_populates="chunks")
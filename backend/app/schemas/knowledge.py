@@ -1,6 +1,6 @@
-from typing import Optional, List
+from typing import Literal, Optional, List
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 class KnowledgeBaseBase(BaseModel):
     name: str
@@ -34,6 +34,11 @@ class DocumentUploadBase(BaseModel):
 class DocumentUploadCreate(DocumentUploadBase):
     knowledge_base_id: int
 
+class ResumableUploadCreate(BaseModel):
+    file_name: str
+    file_size: int = Field(..., gt=0)
+    content_type: str = "application/octet-stream"
+
 class DocumentUploadResponse(DocumentUploadBase):
     id: int
     created_at: datetime
@@ -72,6 +77,7 @@ class DocumentResponse(DocumentBase):
 class KnowledgeBaseResponse(KnowledgeBaseBase):
     id: int
     user_id: int
+    status: str = "active"
     created_at: datetime
     updated_at: datetime
     documents: List[DocumentResponse] = []
@@ -82,4 +88,10 @@ class KnowledgeBaseResponse(KnowledgeBaseBase):
 class PreviewRequest(BaseModel):
     document_ids: List[int]
     chunk_size: int = 1000
-    chunk_overlap: int = 200 
\ No newline at end of file
+    chunk_overlap: int = 200
+    # "head" and "sample" preview only the first or max_pages random pages
+    mode: Literal["full", "head", "sample"] = "full"
+    max_pages: int = Field(10, ge=1, le=200)
+    # Page through the chunks of each preview
+    offset: int = Field(0, ge=0)
+    limit: Optional[int] = Field(None, ge=1) 
\ No newline at end of file
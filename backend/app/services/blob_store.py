@@ -0,0 +1,98 @@
+import logging
+from typing import BinaryIO, Tuple
+
+from minio import Minio
+from minio.error import S3Error
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.minio import HashingReader
+from app.models.knowledge import BlobLock, Document, DocumentUpload
+from app.services.parsed_text_cache import remove_artifacts
+
+logger = logging.getLogger(__name__)
+
+BLOB_PREFIX = "blobs/"
+
+
+def blob_object_name(file_hash: str) -> str:
+    """Content-addressed object name shared by every document with this content"""
+    return f"{BLOB_PREFIX}{file_hash[:2]}/{file_hash}"
+
+
+def is_blob_path(object_name: str) -> bool:
+    return object_name.startswith(BLOB_PREFIX)
+
+
+def hash_stream(stream: BinaryIO, chunk_size: int = 1024 * 1024) -> Tuple[int, str]:
+    """Size and SHA-256 of a stream, read in fixed-size chunks; rewinds it afterwards"""
+    reader = HashingReader(stream)
+    while reader.read(chunk_size):
+        pass
+    stream.seek(0)
+    return reader.size, reader.hexdigest()
+
+
+def blob_exists(client: Minio, file_hash: str) -> bool:
+    try:
+        client.stat_object(settings.MINIO_BUCKET_NAME, blob_object_name(file_hash))
+        return True
+    except S3Error as e:
+        if e.code in ("NoSuchKey", "NoSuchObject"):
+            return False
+        raise
+
+
+def lock_blob(db: Session, file_hash: str) -> None:
+    """
+    Lock a blob until the transaction ends.
+
+    Whoever checks that a blob exists and then references it holds this
+    lock until the reference is committed, and release_blob holds it while
+    counting references and deleting, so a blob is never deleted between
+    the existence check and the new reference.
+    """
+    query = db.query(BlobLock).filter(BlobLock.file_hash == file_hash).with_for_update()
+    if query.first() is not None:
+        return
+    try:
+        with db.begin_nested():
+            db.add(BlobLock(file_hash=file_hash))
+    except IntegrityError:
+        # Created by a concurrent transaction; wait for it to finish
+        query.one()
+
+
+def blob_refcount(db: Session, file_hash: str) -> int:
+    """
+    Number of rows referencing a blob.
+
+    Documents hold the lasting references; uploads reference the blob from
+    the moment it is stored until they are cleaned up, so content that is
+    still waiting to be processed is never released.
+    """
+    documents = db.query(Document).filter(Document.file_hash == file_hash).count()
+    uploads = db.query(DocumentUpload).filter(
+        DocumentUpload.temp_path == blob_object_name(file_hash)
+    ).count()
+    return documents + uploads
+
+
+def release_blob(db: Session, client: Minio, file_hash: str) -> bool:
+    """Delete a blob and its parsed text once nothing references it; returns whether it was deleted"""
+    if not file_hash:
+        return False
+    lock_blob(db, file_hash)
+    try:
+        if blob_refcount(db, file_hash) > 0:
+            return False
+        client.remove_object(settings.MINIO_BUCKET_NAME, blob_object_name(file_hash))
+        remove_artifacts(client, file_hash)
+    except Exception as e:
+        logger.warning(f"Failed to remove blob {file_hash}: {str(e)}")
+        return False
+    finally:
+        db.commit()
+    logger.info(f"Removed unreferenced blob {file_hash}")
+    return True
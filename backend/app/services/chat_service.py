@@ -52,7 +52,7 @@ async def generate_response(
         )
         
         # Initialize embeddings
-        embeddings = EmbeddingsFactory.create()
+        embeddings = EmbeddingsFactory.create_for_queries()
         
         # Create a vector store for each knowledge base
         vector_stores = []
@@ -1,10 +1,136 @@
+import hashlib
+from datetime import datetime
 from typing import Optional, List, Dict, Set
+from langchain_core.documents import Document as LangchainDocument
 from sqlalchemy import create_engine, text
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 from app.core.config import settings
-from app.models.knowledge import DocumentChunk
+from app.models.knowledge import DocumentChunk, Document, ProcessingTask
+from app.services.near_duplicate import NEAR_DUPLICATE_KEY, SIGNATURE_KEY
 import json
 
+# Columns overwritten when a chunk with the same ID is written again
+UPSERT_COLUMNS = (
+    "kb_id", "document_id", "file_name", "chunk_index", "chunk_metadata", "hash", "simhash", "updated_at"
+)
+
+
+def chunk_content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def make_chunk_id(kb_id: int, file_name: str, index: int, content_hash: str, salt: int = 0) -> str:
+    """Deterministic chunk ID; the position keeps repeated content in one file apart"""
+    key = f"{kb_id}:{file_name}:{index}:{content_hash}"
+    if salt:
+        key = f"{key}:{salt}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def annotate_chunk(
+    chunk: LangchainDocument, chunk_id: str, index: int, kb_id: int, file_name: str, document_id: int
+) -> Dict:
+    """Set the chunk's source metadata and return its DocumentChunk row"""
+    signature = chunk.metadata.pop(SIGNATURE_KEY, None)
+    chunk.metadata["source"] = file_name
+    chunk.metadata["kb_id"] = kb_id
+    chunk.metadata["document_id"] = document_id
+    chunk.metadata["chunk_id"] = chunk_id
+    return {
+        "id": chunk_id,
+        "document_id": document_id,
+        "kb_id": kb_id,
+        "file_name": file_name,
+        "chunk_index": index,
+        "chunk_metadata": {
+            "page_content": chunk.page_content,
+            **chunk.metadata
+        },
+        "hash": chunk_content_hash(chunk.page_content),
+        "simhash": signature,
+    }
+
+
+def _upsert_statement(dialect: str):
+    table = DocumentChunk.__table__
+    if dialect == "mysql":
+        stmt = mysql_insert(table)
+        return stmt.on_duplicate_key_update({column: stmt.inserted[column] for column in UPSERT_COLUMNS})
+    if dialect == "sqlite":
+        stmt = sqlite_insert(table)
+        return stmt.on_conflict_do_update(
+            index_elements=["id"],
+            set_={column: stmt.excluded[column] for column in UPSERT_COLUMNS},
+        )
+    raise ValueError(f"Bulk chunk upsert is not supported on {dialect}")
+
+
+# Metadata keys set by annotate_chunk rather than by the document loader
+SOURCE_METADATA_KEYS = ("source", "kb_id", "document_id", "chunk_id")
+
+
+def find_chunked_document(db: Session, file_hash: str, exclude_document_id: Optional[int] = None) -> Optional[int]:
+    """
+    ID of a document with this content whose chunks can be reused.
+
+    Only documents with positioned chunks and no ingestion in flight
+    qualify, so a half-written chunk set is never copied.
+    """
+    in_flight = db.query(ProcessingTask.id).filter(
+        ProcessingTask.document_id == Document.id,
+        ProcessingTask.status.in_(("pending", "processing"))
+    ).exists()
+    chunked = db.query(DocumentChunk.id).filter(DocumentChunk.document_id == Document.id).exists()
+    legacy = db.query(DocumentChunk.id).filter(
+        DocumentChunk.document_id == Document.id,
+        DocumentChunk.chunk_index.is_(None)
+    ).exists()
+    query = db.query(Document.id).filter(Document.file_hash == file_hash, chunked, ~legacy, ~in_flight)
+    if exclude_document_id is not None:
+        query = query.filter(Document.id != exclude_document_id)
+    row = query.first()
+    return row[0] if row else None
+
+
+def load_chunks(db: Session, document_id: int) -> List[LangchainDocument]:
+    """A document's chunks in order, with only their loader metadata"""
+    rows = db.query(DocumentChunk.chunk_metadata).filter(
+        DocumentChunk.document_id == document_id
+    ).order_by(DocumentChunk.chunk_index).all()
+    chunks = []
+    for (metadata,) in rows:
+        metadata = dict(metadata)
+        content = metadata.pop("page_content")
+        for key in SOURCE_METADATA_KEYS + (NEAR_DUPLICATE_KEY,):
+            metadata.pop(key, None)
+        chunks.append(LangchainDocument(page_content=content, metadata=metadata))
+    return chunks
+
+
+def upsert_chunk_rows(db: Session, rows: List[Dict], batch_size: Optional[int] = None) -> None:
+    """
+    Insert or update DocumentChunk rows in batched executemany calls.
+
+    Each row is a dict of DocumentChunk column values. The statement is
+    compiled once and the driver sends each batch of batch_size rows as a
+    multi-row INSERT ... ON DUPLICATE KEY UPDATE, so re-writing an existing
+    chunk updates it instead of failing. The caller commits.
+    """
+    if not rows:
+        return
+    batch_size = batch_size or settings.CHUNK_INSERT_BATCH_SIZE
+    stmt = _upsert_statement(db.get_bind().dialect.name)
+    now = datetime.utcnow()
+    for start in range(0, len(rows), batch_size):
+        batch = [
+            {"created_at": now, "updated_at": now, **row}
+            for row in rows[start:start + batch_size]
+        ]
+        db.execute(stmt, batch)
+
+
 class ChunkRecord:
     """Manages chunk-level record keeping for incremental updates"""
     def __init__(self, kb_id: int):
@@ -29,16 +155,17 @@ class ChunkRecord:
             return
             
         with Session(self.engine) as session:
-            for chunk_data in chunks:
-                chunk = DocumentChunk(
-                    id=chunk_data['id'],
-                    kb_id=chunk_data['kb_id'],
-                    document_id=chunk_data['document_id'],
-                    file_name=chunk_data['file_name'],
-                    chunk_metadata=chunk_data['metadata'],
-                    hash=chunk_data['hash']
-                )
-                session.merge(chunk)  # Use merge instead of add to handle updates
+            upsert_chunk_rows(session, [
+                {
+                    "id": chunk_data['id'],
+                    "kb_id": chunk_data['kb_id'],
+                    "document_id": chunk_data['document_id'],
+                    "file_name": chunk_data['file_name'],
+                    "chunk_metadata": chunk_data['metadata'],
+                    "hash": chunk_data['hash'],
+                }
+                for chunk_data in chunks
+            ])
             session.commit()
     
     def delete_chunks(self, chunk_ids: List[str]):
@@ -0,0 +1,262 @@
+# 同步算法的实现
+# 算法说明：
+# 1. 使用哈希表(defaultdict)建立content_hash到chunks的映射，时间复杂度O(n)
+# 2. 使用集合操作找到相同位置的chunks，时间复杂度O(n)
+# 3. 使用双指针法进行剩余chunks的匹配，时间复杂度O(n)
+# 总体时间复杂度: O(n)，其中n为chunks的总数
+# 空间复杂度: O(n)，主要用于存储哈希表
+import logging
+from collections import defaultdict
+from typing import Dict, List, TypedDict
+
+from langchain_core.documents import Document as LangchainDocument
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.models.knowledge import DocumentChunk
+from app.services.chunk_record import annotate_chunk, chunk_content_hash, make_chunk_id, upsert_chunk_rows
+from app.services.near_duplicate import is_near_duplicate
+from app.services.vector_store.base import BaseVectorStore
+
+logger = logging.getLogger(__name__)
+
+
+class SyncResult(TypedDict):
+    to_create: List[Dict]
+    to_update: List[Dict]
+    to_delete: List[str]
+
+
+def synchronize_chunks(old_chunks: List[Dict], new_chunks: List[Dict], threshold: int = 10) -> SyncResult:
+    """
+    基于 content_hash + index 的双指针匹配算法，查找需要新增、更新和删除的 chunks。
+    主要改进：
+    1. 对同一 content_hash 的旧、新 chunks，分别按 index 排序，再逐个匹配，避免原先直接根据
+       “两两相同位置”导致重复 content_hash 时的混淆。
+    2. 保留了原先的距离阈值(distance <= threshold)判断，但逻辑更直观，减少漏匹或误判。
+    3. 只出现一次的内容不受距离阈值限制，这样在文档前部插入大段内容时，后面的 chunks 仍能匹配。
+    """
+
+    # ========== 1. 输入验证 ==========
+    if not isinstance(old_chunks, list) or not isinstance(new_chunks, list):
+        raise TypeError("输入参数必须是列表类型")
+
+    required_fields = {'index', 'content_hash', 'chunk_content'}
+    for chunk in old_chunks:
+        if not required_fields.union({'uuid'}).issubset(chunk.keys()):
+            raise ValueError("旧chunks缺少必要字段")
+    for chunk in new_chunks:
+        if not required_fields.issubset(chunk.keys()):
+            raise ValueError("新chunks缺少必要字段")
+
+    # ========== 2. 构建 content_hash => chunks 的映射表，减少跨 content_hash 的错误匹配 ==========
+    old_chunks_by_hash = defaultdict(list)
+    for oc in old_chunks:
+        old_chunks_by_hash[oc['content_hash']].append(oc)
+
+    new_chunks_by_hash = defaultdict(list)
+    for nc in new_chunks:
+        new_chunks_by_hash[nc['content_hash']].append(nc)
+
+    # ========== 3. 遍历所有的 content_hash，逐个匹配 ==========
+
+    to_create = []
+    to_update = []
+    to_delete = []
+
+    # “并”集获取所有出现过的 content_hash
+    all_hashes = set(old_chunks_by_hash.keys()) | set(new_chunks_by_hash.keys())
+
+    for content_hash in all_hashes:
+        old_list = sorted(old_chunks_by_hash[content_hash], key=lambda x: x['index'])
+        new_list = sorted(new_chunks_by_hash[content_hash], key=lambda x: x['index'])
+
+        i, j = 0, 0
+        len_old, len_new = len(old_list), len(new_list)
+        unique = len_old == 1 and len_new == 1
+
+        while i < len_old and j < len_new:
+            old_entry = old_list[i]
+            new_entry = new_list[j]
+            distance = abs(old_entry['index'] - new_entry['index'])
+
+            # 如果索引相近，则判定为同一块内容，执行更新操作
+            if distance <= threshold or unique:
+                to_update.append({
+                    'uuid': old_entry['uuid'],
+                    'index': new_entry['index'],
+                    'content_hash': content_hash,
+                    'chunk_content': new_entry['chunk_content']
+                })
+                i += 1
+                j += 1
+
+            # 如果旧 chunk.index 更小，说明它在新列表里没有合适的配对，需要删除
+            elif old_entry['index'] < new_entry['index']:
+                to_delete.append(old_entry['uuid'])
+                i += 1
+
+            # 否则，新 chunk.index 更小，说明这是新增加的块
+            else:
+                to_create.append({
+                    'index': new_entry['index'],
+                    'content_hash': content_hash,
+                    'chunk_content': new_entry['chunk_content']
+                })
+                j += 1
+
+        # 把剩余的旧 chunks 视为需要删除
+        while i < len_old:
+            to_delete.append(old_list[i]['uuid'])
+            i += 1
+
+        # 把剩余的新 chunks 视为需要新增
+        while j < len_new:
+            to_create.append({
+                'index': new_list[j]['index'],
+                'content_hash': content_hash,
+                'chunk_content': new_list[j]['chunk_content']
+            })
+            j += 1
+
+    return {
+        'to_create': to_create,
+        'to_update': to_update,
+        'to_delete': to_delete
+    }
+
+
+def _batches(items: List, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def sync_document_chunks(
+    db: Session,
+    vector_store: BaseVectorStore,
+    chunks: List[LangchainDocument],
+    kb_id: int,
+    file_name: str,
+    document_id: int,
+    batch_size: int,
+) -> Dict[str, int]:
+    """
+    Bring a document's stored chunks in line with a new version of its chunks.
+
+    Stored chunks are matched to the new ones by content hash and position
+    with synchronize_chunks. Matched chunks keep their ID and embedding and
+    only have their position updated; chunks whose loader metadata changed
+    are re-added to refresh their vector store payload. Only new chunks are
+    embedded and only chunks that disappeared are deleted.
+    """
+    existing = db.query(
+        DocumentChunk.id, DocumentChunk.chunk_index, DocumentChunk.hash, DocumentChunk.chunk_metadata
+    ).filter(DocumentChunk.document_id == document_id).all()
+    legacy = any(row.chunk_index is None for row in existing)
+    if legacy:
+        # Chunks stored before positions were recorded were added to the
+        # vector store under random IDs and cannot be matched; start over
+        logger.info(f"Document {document_id} has chunks without positions, replacing all of them")
+        vector_store.delete_document(document_id)
+        db.query(DocumentChunk).filter(DocumentChunk.document_id == document_id).delete(synchronize_session=False)
+        db.commit()
+        existing = []
+    existing_by_id = {row.id: row for row in existing}
+
+    result = synchronize_chunks(
+        [
+            {"uuid": row.id, "index": row.chunk_index, "content_hash": row.hash, "chunk_content": ""}
+            for row in existing
+        ],
+        [
+            {"index": index, "content_hash": chunk_content_hash(chunk.page_content), "chunk_content": chunk.page_content}
+            for index, chunk in enumerate(chunks)
+        ],
+    )
+
+    # Deletions go first so the vector store never returns removed content
+    # alongside its replacement
+    to_delete = result["to_delete"]
+    for batch in _batches(to_delete, batch_size):
+        vector_store.delete(batch)
+        db.query(DocumentChunk).filter(DocumentChunk.id.in_(batch)).delete(synchronize_session=False)
+        db.commit()
+
+    moved_rows, refreshed = [], []
+    for entry in result["to_update"]:
+        chunk = chunks[entry["index"]]
+        row = annotate_chunk(chunk, entry["uuid"], entry["index"], kb_id, file_name, document_id)
+        old = existing_by_id[entry["uuid"]]
+        if old.chunk_metadata != row["chunk_metadata"]:
+            refreshed.append(row)
+        elif old.chunk_index != entry["index"]:
+            moved_rows.append(row)
+    for batch in _batches(moved_rows, batch_size):
+        upsert_chunk_rows(db, batch)
+        db.commit()
+
+    # IDs are positional, so a new chunk may land on an ID that is still in
+    # use (or was just deleted); salt it until it is free
+    taken = set(existing_by_id)
+    created = []
+    for entry in sorted(result["to_create"], key=lambda e: e["index"]):
+        chunk = chunks[entry["index"]]
+        salt = 0
+        chunk_id = make_chunk_id(kb_id, file_name, entry["index"], entry["content_hash"])
+        while chunk_id in taken:
+            salt += 1
+            chunk_id = make_chunk_id(kb_id, file_name, entry["index"], entry["content_hash"], salt)
+        taken.add(chunk_id)
+        created.append(annotate_chunk(chunk, chunk_id, entry["index"], kb_id, file_name, document_id))
+
+    # Vectors are written before their rows: if a batch fails in between,
+    # its chunks have no rows yet, so a retry sees them as new and re-adds
+    # them under the same IDs instead of trusting rows without vectors
+    refreshed_ids = {row["id"] for row in refreshed}
+    for batch in _batches(refreshed + created, batch_size):
+        # Merged near-duplicates are stored without a vector; a chunk that
+        # just became one loses the vector it had
+        superseded = [
+            row["id"] for row in batch
+            if is_near_duplicate(row["chunk_metadata"]) and row["id"] in refreshed_ids
+        ]
+        if superseded:
+            vector_store.delete(superseded)
+        embedded = [row for row in batch if not is_near_duplicate(row["chunk_metadata"])]
+        if embedded:
+            vector_store.add_documents(
+                [chunks[row["chunk_index"]] for row in embedded],
+                ids=[row["id"] for row in embedded],
+            )
+        upsert_chunk_rows(db, batch)
+        db.commit()
+
+    stats = {
+        "created": len(created),
+        "deleted": len(to_delete),
+        "moved": len(moved_rows),
+        "refreshed": len(refreshed),
+        "unchanged": len(result["to_update"]) - len(moved_rows) - len(refreshed),
+    }
+    logger.info(f"Synchronized chunks of document {document_id}: {stats}")
+    return stats
+
+
+def truncate_document_chunks(
+    db: Session, vector_store: BaseVectorStore, document_id: int, keep: int, batch_size: int
+) -> int:
+    """
+    Remove a document's chunks from position keep onwards, from the vector
+    store first and then the database. Returns the number removed.
+    """
+    ids = [
+        chunk_id for (chunk_id,) in db.query(DocumentChunk.id).filter(
+            DocumentChunk.document_id == document_id,
+            or_(DocumentChunk.chunk_index >= keep, DocumentChunk.chunk_index.is_(None))
+        )
+    ]
+    for batch in _batches(ids, batch_size):
+        vector_store.delete(batch)
+        db.query(DocumentChunk).filter(DocumentChunk.id.in_(batch)).delete(synchronize_session=False)
+        db.commit()
+    return len(ids)
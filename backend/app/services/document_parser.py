@@ -0,0 +1,356 @@
+import asyncio
+import hashlib
+import heapq
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+from typing import Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+from langchain_community.document_loaders import (
+    PyPDFLoader,
+    Docx2txtLoader,
+    UnstructuredMarkdownLoader,
+    TextLoader
+)
+from langchain_core.documents import Document as LangchainDocument
+
+from app.core.config import settings
+from app.core.tempfiles import make_temp_file
+
+logger = logging.getLogger(__name__)
+
+# (page_content, metadata) pairs: what crosses the process boundary instead
+# of pickled langchain Document objects
+ParsedPage = Tuple[str, Dict]
+
+# Bump whenever loaders or their settings change what a file parses into;
+# cached parsed-text artifacts of older versions are then ignored
+LOADER_VERSION = 1
+
+
+class DocumentParseTimeout(Exception):
+    """Raised when parsing a single file exceeds PARSER_TIMEOUT_SECONDS"""
+
+
+class ParserPoolReset(Exception):
+    """Raised when a parse was lost because another parse timed out and the pool was reset"""
+
+
+def get_loader(file_path: str, ext: str):
+    """Select the langchain loader for a file extension"""
+    if ext == ".pdf":
+        return PyPDFLoader(file_path)
+    elif ext == ".docx":
+        return Docx2txtLoader(file_path)
+    elif ext == ".md":
+        return UnstructuredMarkdownLoader(file_path)
+    else:  # Default to text loader
+        return TextLoader(file_path)
+
+
+def parse_file(file_path: str, ext: str) -> List[ParsedPage]:
+    """Parse a file into compact page payloads (runs inside a pool process)"""
+    loader = get_loader(file_path, ext)
+    return [(doc.page_content, doc.metadata) for doc in loader.load()]
+
+
+def parse_file_to_jsonl(file_path: str, ext: str, out_path: str) -> int:
+    """
+    Parse a file page by page into a JSON lines file (runs inside a pool
+    process). Each page is flushed as soon as it is parsed, so the caller
+    can read pages while later ones are still being parsed. Returns the
+    number of pages.
+    """
+    count = 0
+    with open(out_path, "w", encoding="utf-8") as out:
+        for doc in get_loader(file_path, ext).lazy_load():
+            out.write(json.dumps([doc.page_content, doc.metadata], default=str) + "\n")
+            out.flush()
+            count += 1
+    return count
+
+
+def _to_documents(pages: List[ParsedPage]) -> List[LangchainDocument]:
+    return [
+        LangchainDocument(page_content=content, metadata=metadata)
+        for content, metadata in pages
+    ]
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+# Pools terminated by _reset_pool, to tell their broken parses from parses
+# that crashed a pool process themselves
+_reset_pools: "weakref.WeakSet[ProcessPoolExecutor]" = weakref.WeakSet()
+
+
+def get_parser_pool() -> Optional[ProcessPoolExecutor]:
+    """Process pool shared by all parsing callers, None when disabled"""
+    global _pool
+    if settings.PARSER_MAX_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            logger.info(f"Starting document parser pool with {settings.PARSER_MAX_WORKERS} processes")
+            # spawn: forking a process that runs threads and an event loop is unsafe
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.PARSER_MAX_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                max_tasks_per_child=settings.PARSER_MAX_TASKS_PER_CHILD,
+            )
+        return _pool
+
+
+def _reset_pool(pool: ProcessPoolExecutor) -> None:
+    """
+    Kill the pool after a timeout.
+
+    A running pool task cannot be cancelled, so the only way to reclaim the
+    core is to terminate the processes. Other in-flight parses fail with
+    BrokenProcessPool: whole-file parses are retried once on a new pool,
+    streamed ones raise ParserPoolReset, which does not cost their task an
+    attempt.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+        _reset_pools.add(pool)
+    for process in list(getattr(pool, "_processes", {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _timeout_error(file_path: str) -> DocumentParseTimeout:
+    return DocumentParseTimeout(f"Parsing {file_path} exceeded {settings.PARSER_TIMEOUT_SECONDS}s")
+
+
+def _was_reset(pool: ProcessPoolExecutor, error: Exception) -> bool:
+    """
+    Whether a parse failed only because its pool was reset: it broke, or
+    was shut down before the parse could be submitted
+    """
+    return isinstance(error, (BrokenProcessPool, RuntimeError)) and pool in _reset_pools
+
+
+def _reset_error(file_path: str) -> ParserPoolReset:
+    return ParserPoolReset(f"Parsing {file_path} was interrupted by a parser pool reset")
+
+
+async def _arun_parser(fn: Callable[..., List[ParsedPage]], file_path: str, *args) -> List[ParsedPage]:
+    """Run a parse function on the process pool without blocking the event loop"""
+    pool = get_parser_pool()
+    loop = asyncio.get_running_loop()
+    if pool is None:
+        return await loop.run_in_executor(None, fn, file_path, *args)
+
+    for retry in (True, False):
+        try:
+            future = loop.run_in_executor(pool, fn, file_path, *args)
+            return await asyncio.wait_for(future, timeout=settings.PARSER_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            _reset_pool(pool)
+            raise _timeout_error(file_path)
+        except Exception as e:
+            if not _was_reset(pool, e):
+                raise
+            if not retry:
+                raise _reset_error(file_path) from e
+            logger.info(f"Parsing {file_path} again after a parser pool reset")
+            pool = get_parser_pool()
+
+
+def load_document(file_path: str, ext: str) -> List[LangchainDocument]:
+    """Parse a file on the process pool, blocking the calling thread"""
+    pool = get_parser_pool()
+    if pool is None:
+        return _to_documents(parse_file(file_path, ext))
+
+    for retry in (True, False):
+        try:
+            future = pool.submit(parse_file, file_path, ext)
+            return _to_documents(future.result(timeout=settings.PARSER_TIMEOUT_SECONDS))
+        except FutureTimeoutError:
+            _reset_pool(pool)
+            raise _timeout_error(file_path)
+        except Exception as e:
+            if not _was_reset(pool, e):
+                raise
+            if not retry:
+                raise _reset_error(file_path) from e
+            logger.info(f"Parsing {file_path} again after a parser pool reset")
+            pool = get_parser_pool()
+
+
+async def aload_document(file_path: str, ext: str) -> List[LangchainDocument]:
+    """Parse a file on the process pool without blocking the event loop"""
+    return _to_documents(await _arun_parser(parse_file, file_path, ext))
+
+
+def _stream_from_pool(pool: ProcessPoolExecutor, file_path: str, ext: str) -> Iterator[LangchainDocument]:
+    """
+    Parse a file on the process pool and yield its pages as the pool
+    process writes them to a temp file, so neither process holds the whole
+    document. The parse is subject to the same timeout as load_document.
+    """
+    out_path = make_temp_file(suffix=".jsonl")
+    try:
+        future = pool.submit(parse_file_to_jsonl, file_path, ext, out_path)
+    except Exception as e:
+        os.remove(out_path)
+        if _was_reset(pool, e):
+            raise _reset_error(file_path) from e
+        raise
+    deadline = time.monotonic() + settings.PARSER_TIMEOUT_SECONDS
+    try:
+        with open(out_path, "r", encoding="utf-8") as pages:
+            partial = ""
+            while True:
+                line = pages.readline()
+                if line.endswith("\n"):
+                    content, metadata = json.loads(partial + line)
+                    partial = ""
+                    yield LangchainDocument(page_content=content, metadata=metadata)
+                    continue
+                # Nothing new, or a line the pool process is still writing
+                partial += line
+                if future.done():
+                    try:
+                        future.result()
+                    except Exception as e:
+                        # Pages already yielded cannot be taken back, so
+                        # the parse is not retried here
+                        if _was_reset(pool, e):
+                            raise _reset_error(file_path) from e
+                        raise
+                    for rest in (partial + pages.read()).splitlines():
+                        content, metadata = json.loads(rest)
+                        yield LangchainDocument(page_content=content, metadata=metadata)
+                    return
+                if time.monotonic() > deadline:
+                    _reset_pool(pool)
+                    raise _timeout_error(file_path)
+                wait([future], timeout=0.05)
+    finally:
+        future.cancel()
+        os.remove(out_path)
+
+
+def iter_document_pages(file_path: str, ext: str) -> Iterator[LangchainDocument]:
+    """
+    Yield the pages of a file for streaming ingestion.
+
+    Files are parsed on the process pool. Small ones come back whole, which
+    is fastest; large ones are streamed page by page through a temp file so
+    that memory stays bounded. Without a pool, pages are read lazily in the
+    calling thread.
+    """
+    pool = get_parser_pool()
+    if pool is None:
+        yield from get_loader(file_path, ext).lazy_load()
+    elif os.path.getsize(file_path) >= settings.PARSER_STREAMING_MIN_BYTES:
+        yield from _stream_from_pool(pool, file_path, ext)
+    else:
+        yield from load_document(file_path, ext)
+
+
+def head_pages(pages: Iterable[LangchainDocument], max_pages: int) -> List[LangchainDocument]:
+    """The first max_pages pages; the rest of a lazy iterator is never read"""
+    pages = iter(pages)
+    try:
+        return list(islice(pages, max_pages))
+    finally:
+        if hasattr(pages, "close"):
+            pages.close()
+
+
+def _sample_rank(seed: Hashable, index: int) -> int:
+    """Reproducible random rank of a page; a sample is the pages of lowest rank"""
+    digest = hashlib.blake2b(f"{seed}:{index}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def sample_indices(total: int, max_pages: int, seed: Hashable) -> List[int]:
+    """The page indices sample_pages picks from a document of total pages"""
+    return sorted(heapq.nsmallest(max_pages, range(total), key=lambda index: _sample_rank(seed, index)))
+
+
+def sample_pages(pages: Iterable[LangchainDocument], max_pages: int, seed: Hashable) -> List[LangchainDocument]:
+    """
+    A uniform random sample of max_pages pages, in document order.
+
+    Every page gets a rank from the seed and its index, and the max_pages
+    lowest ranked pages are kept, so at most max_pages pages are held in
+    memory and a file sampled here, through its cached pages or page by
+    page (sample_indices) shows the same pages for the same seed.
+    """
+    # (-rank, index, page): the highest ranked kept page is on top
+    kept: List[Tuple[int, int, LangchainDocument]] = []
+    for index, page in enumerate(pages):
+        item = (-_sample_rank(seed, index), index, page)
+        if len(kept) < max_pages:
+            heapq.heappush(kept, item)
+        elif kept and item > kept[0]:
+            heapq.heapreplace(kept, item)
+    return [page for _, _, page in sorted(kept, key=lambda item: item[1])]
+
+
+def _sample_pdf_pages(file_path: str, max_pages: int, seed: Hashable) -> List[LangchainDocument]:
+    # PDFs allow random page access, so only the sampled pages are parsed
+    import pypdf
+
+    reader = pypdf.PdfReader(file_path)
+    total = len(reader.pages)
+    return [
+        LangchainDocument(
+            page_content=reader.pages[index].extract_text().strip(),
+            metadata={"source": file_path, "page": index, "total_pages": total},
+        )
+        for index in sample_indices(total, max_pages, seed)
+    ]
+
+
+def load_document_sample(
+    file_path: str, ext: str, mode: str, max_pages: int, seed: Hashable
+) -> List[LangchainDocument]:
+    """
+    Parse only part of a file for a quick preview.
+
+    "head" reads the first max_pages pages; "sample" picks max_pages pages
+    at random. Single-page formats (text, Markdown, Word) come back whole.
+    """
+    if mode == "head":
+        return head_pages(get_loader(file_path, ext).lazy_load(), max_pages)
+    if ext == ".pdf":
+        return _sample_pdf_pages(file_path, max_pages, seed)
+    return sample_pages(get_loader(file_path, ext).lazy_load(), max_pages, seed)
+
+
+def parse_sample(file_path: str, ext: str, mode: str, max_pages: int, seed: Hashable) -> List[ParsedPage]:
+    """load_document_sample as compact page payloads (runs inside a pool process)"""
+    return [
+        (doc.page_content, doc.metadata)
+        for doc in load_document_sample(file_path, ext, mode, max_pages, seed)
+    ]
+
+
+async def aload_document_sample(
+    file_path: str, ext: str, mode: str, max_pages: int, seed: Hashable
+) -> List[LangchainDocument]:
+    """Parse part of a file for a preview on the process pool, with the parse timeout"""
+    return _to_documents(await _arun_parser(parse_sample, file_path, ext, mode, max_pages, seed))
+
+
+def shutdown_parser_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
@@ -1,30 +1,40 @@
+import asyncio
 import logging
 import os
 import hashlib
-import tempfile
+import time
 import traceback
+from contextlib import closing
 from datetime import datetime
 from app.db.session import SessionLocal
-from io import BytesIO
-from typing import Optional, List, Dict, Set
+from itertools import islice
+from typing import Optional, List, Dict, Set, Iterable, Iterator
 from fastapi import UploadFile
-from langchain_community.document_loaders import (
-    PyPDFLoader,
-    Docx2txtLoader,
-    UnstructuredMarkdownLoader,
-    TextLoader
-)
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document as LangchainDocument
 from pydantic import BaseModel
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import Session
+from app.core.cache import LRUCache
 from app.core.config import settings
-from app.core.minio import get_minio_client
+from app.core.pipeline import prefetch
+from app.core.minio import get_minio_client, put_object_streaming
+from app.core.tempfiles import make_temp_file, named_temp_file
 from app.models.knowledge import ProcessingTask, Document, DocumentChunk
-from app.services.chunk_record import ChunkRecord
+from app.services.blob_store import blob_exists, blob_object_name, is_blob_path, lock_blob, release_blob
+from app.services.chunk_record import (
+    annotate_chunk, chunk_content_hash, find_chunked_document, load_chunks, make_chunk_id, upsert_chunk_rows
+)
+from app.services.chunk_sync import sync_document_chunks, truncate_document_chunks
+from app.services.document_parser import (
+    LOADER_VERSION, ParserPoolReset, aload_document, aload_document_sample, head_pages, iter_document_pages, sample_pages
+)
+from app.services.kb_deletion import KnowledgeBaseDeleted, ensure_active
+from app.services.ingestion_metrics import StageTimer, TimedEmbeddings, TimedVectorStore, record_task_metrics
+from app.services.near_duplicate import create_near_duplicate_filter, is_near_duplicate
+from app.services.parsed_text_cache import cache_pages, iter_cached_pages, store_pages
+from app.services.text_splitter import TextSplitter, create_text_splitter
+from app.services.task_queue import WORKER_ID, LeaseHeartbeat, LeaseLost, cancel_task, claim_task, complete_task, fail_task
 import uuid
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import UnstructuredFileLoader
 from minio.error import MinioException
 from minio import Minio
@@ -46,104 +56,13 @@ class TextChunk(BaseModel):
 class PreviewResult(BaseModel):
     chunks: List[TextChunk]
     total_chunks: int
-
-async def process_document(file_path: str, file_name: str, kb_id: int, document_id: int, chunk_size: int = 1000, chunk_overlap: int = 200) -> None:
-    """Process document and store in vector database with incremental updates"""
-    logger = logging.getLogger(__name__)
-    
-    try:
-        preview_result = await preview_document(file_path, chunk_size, chunk_overlap)
-        
-        # Initialize embeddings
-        logger.info("Initializing OpenAI embeddings...")
-        embeddings = EmbeddingsFactory.create()
-        
-        logger.info(f"Initializing vector store with collection: kb_{kb_id}")
-        vector_store = VectorStoreFactory.create(
-            store_type=settings.VECTOR_STORE_TYPE,
-            collection_name=f"kb_{kb_id}",
-            embedding_function=embeddings,
-        )
-        
-        # Initialize chunk record manager
-        chunk_manager = ChunkRecord(kb_id)
-        
-        # Get existing chunk hashes for this file
-        existing_hashes = chunk_manager.list_chunks(file_name)
-        
-        # Prepare new chunks
-        new_chunks = []
-        current_hashes = set()
-        documents_to_update = []
-        
-        for chunk in preview_result.chunks:
-            # Calculate chunk hash
-            chunk_hash = hashlib.sha256(
-                (chunk.content + str(chunk.metadata)).encode()
-            ).hexdigest()
-            current_hashes.add(chunk_hash)
-            
-            # Skip if chunk hasn't changed
-            if chunk_hash in existing_hashes:
-                continue
-            
-            # Create unique ID for the chunk
-            chunk_id = hashlib.sha256(
-                f"{kb_id}:{file_name}:{chunk_hash}".encode()
-            ).hexdigest()
-            
-            # Prepare chunk record
-            # Prepare metadata
-            metadata = {
-                **chunk.metadata,
-                "chunk_id": chunk_id,
-                "file_name": file_name,
-                "kb_id": kb_id,
-                "document_id": document_id
-            }
-            
-            new_chunks.append({
-                "id": chunk_id,
-                "kb_id": kb_id,
-                "document_id": document_id,
-                "file_name": file_name,
-                "metadata": metadata,
-                "hash": chunk_hash
-            })
-            
-            # Prepare document for vector store
-            doc = LangchainDocument(
-                page_content=chunk.content,
-                metadata=metadata
-            )
-            documents_to_update.append(doc)
-        
-        # Add new chunks to database and vector store
-        if new_chunks:
-            logger.info(f"Adding {len(new_chunks)} new/updated chunks")
-            chunk_manager.add_chunks(new_chunks)
-            vector_store.add_documents(documents_to_update)
-        
-        # Delete removed chunks
-        chunks_to_delete = chunk_manager.get_deleted_chunks(current_hashes, file_name)
-        if chunks_to_delete:
-            logger.info(f"Removing {len(chunks_to_delete)} deleted chunks")
-            chunk_manager.delete_chunks(chunks_to_delete)
-            vector_store.delete(chunks_to_delete)
-        
-        logger.info("Document processing completed successfully")
-        
-    except Exception as e:
-        logger.error(f"Error processing document: {str(e)}")
-        raise
+    mode: str = "full"
+    pages: Optional[int] = None  # Pages the chunks were taken from
+    offset: int = 0
+    limit: Optional[int] = None
 
 async def upload_document(file: UploadFile, kb_id: int) -> UploadResult:
     """Step 1: Upload document to MinIO"""
-    content = await file.read()
-    file_size = len(content)
-    
-    file_hash = hashlib.sha256(content).hexdigest()
-    
     # Clean and normalize filename
     file_name = "".join(c for c in file.filename if c.isalnum() or c in ('-', '_', '.')).strip()
     object_path = f"kb_{kb_id}/{file_name}"
@@ -158,15 +77,11 @@ async def upload_document(file: UploadFile, kb_id: int) -> UploadResult:
     _, ext = os.path.splitext(file_name)
     content_type = content_types.get(ext.lower(), "application/octet-stream")
     
-    # Upload to MinIO
+    # Stream to MinIO, hashing the content on the way
     minio_client = get_minio_client()
     try:
-        minio_client.put_object(
-            bucket_name=settings.MINIO_BUCKET_NAME,
-            object_name=object_path,
-            data=BytesIO(content),
-            length=file_size,
-            content_type=content_type
+        file_size, file_hash = await asyncio.to_thread(
+            put_object_streaming, minio_client, object_path, file.file, content_type
         )
     except Exception as e:
         logging.error(f"Failed to upload file to MinIO: {str(e)}")
@@ -180,58 +95,171 @@ async def upload_document(file: UploadFile, kb_id: int) -> UploadResult:
         file_hash=file_hash
     )
 
-async def preview_document(file_path: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> PreviewResult:
-    """Step 2: Generate preview chunks"""
-    # Get file from MinIO
-    minio_client = get_minio_client()
-    _, ext = os.path.splitext(file_path)
+def _preview_size(result: PreviewResult) -> int:
+    """Approximate memory held by a cached preview: the bytes of its chunk texts"""
+    return sum(len(chunk.content.encode("utf-8")) for chunk in result.chunks)
+
+# Previews are pure functions of content and chunking parameters. Bounded
+# by size rather than entries: one full preview can hold a book's chunks
+_preview_cache = LRUCache(settings.PREVIEW_CACHE_MAX_BYTES, weigher=_preview_size)
+
+async def preview_document(
+    file_path: str,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+    file_name: Optional[str] = None,
+    file_hash: Optional[str] = None,
+    mode: str = "full",
+    max_pages: int = 10,
+    offset: int = 0,
+    limit: Optional[int] = None
+) -> PreviewResult:
+    """
+    Step 2: Generate preview chunks
+
+    mode "full" chunks the whole document; "head" and "sample" only read
+    the first or max_pages random pages, so previews of very long documents
+    stay fast. offset/limit page through the resulting chunks.
+    """
+    # Get file from MinIO. Blob object names carry no extension, so the
+    # loader is picked from the original file name when given
+    _, ext = os.path.splitext(file_name or file_path)
     ext = ext.lower()
+    if mode == "full":
+        max_pages = None
     
-    # Download to temp file
-    with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as temp_file:
-        minio_client.fget_object(
-            bucket_name=settings.MINIO_BUCKET_NAME,
-            object_name=file_path,
-            file_path=temp_file.name
+    cache_key = (file_hash, ext, chunk_size, chunk_overlap, mode, max_pages) if file_hash else None
+    result = _preview_cache.get(cache_key) if cache_key else None
+    if result is None:
+        minio_client = get_minio_client()
+        seed = file_hash or file_path
+        # Previously parsed content only needs to be re-chunked
+        documents = await asyncio.to_thread(
+            _load_cached_preview_pages, minio_client, file_hash, ext, mode, max_pages, seed
         )
+        if documents is None:
+            documents = await _download_and_parse(minio_client, file_path, ext, file_hash, mode, max_pages, seed)
+        
+        # Splitting a whole book takes a while; keep it off the event loop
+        result = await asyncio.to_thread(_chunk_preview, documents, chunk_size, chunk_overlap, mode)
+        if cache_key:
+            _preview_cache.set(cache_key, result)
+    
+    if offset == 0 and limit is None:
+        return result
+    end = offset + limit if limit is not None else None
+    return result.model_copy(update={"chunks": result.chunks[offset:end], "offset": offset, "limit": limit})
+
+def _chunk_preview(
+    documents: List[LangchainDocument], chunk_size: int, chunk_overlap: int, mode: str
+) -> PreviewResult:
+    text_splitter = create_text_splitter(chunk_size, chunk_overlap)
+    chunks = text_splitter.split_documents(documents)
+    
+    # Convert to preview format
+    preview_chunks = [
+        TextChunk(
+            content=chunk.page_content,
+            metadata=chunk.metadata
+        )
+        for chunk in chunks
+    ]
+    
+    return PreviewResult(
+        chunks=preview_chunks,
+        total_chunks=len(chunks),
+        mode=mode,
+        pages=len(documents)
+    )
+
+def _load_cached_preview_pages(
+    minio_client: Minio, file_hash: Optional[str], ext: str, mode: str, max_pages: Optional[int], seed: str
+) -> Optional[List[LangchainDocument]]:
+    pages = iter_cached_pages(minio_client, file_hash, ext)
+    if pages is None:
+        return None
+    if mode == "head":
+        return head_pages(pages, max_pages)
+    if mode == "sample":
+        return sample_pages(pages, max_pages, seed)
+    return list(pages)
+
+async def _download_and_parse(
+    minio_client: Minio,
+    file_path: str,
+    ext: str,
+    file_hash: Optional[str],
+    mode: str,
+    max_pages: Optional[int],
+    seed: str
+) -> List[LangchainDocument]:
+    # Download to temp file
+    with named_temp_file(suffix=ext) as temp_file:
         temp_path = temp_file.name
     
     try:
-        # Select appropriate loader
-        if ext == ".pdf":
-            loader = PyPDFLoader(temp_path)
-        elif ext == ".docx":
-            loader = Docx2txtLoader(temp_path)
-        elif ext == ".md":
-            loader = UnstructuredMarkdownLoader(temp_path)
-        else:  # Default to text loader
-            loader = TextLoader(temp_path)
-        
-        # Load and split the document
-        documents = loader.load()
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap
-        )
-        chunks = text_splitter.split_documents(documents)
-        
-        # Convert to preview format
-        preview_chunks = [
-            TextChunk(
-                content=chunk.page_content,
-                metadata=chunk.metadata
-            )
-            for chunk in chunks
-        ]
-        
-        return PreviewResult(
-            chunks=preview_chunks,
-            total_chunks=len(chunks)
+        await asyncio.to_thread(
+            minio_client.fget_object,
+            bucket_name=settings.MINIO_BUCKET_NAME,
+            object_name=file_path,
+            file_path=temp_path
         )
+
+        if mode != "full":
+            # Partial parses are not cached as parsed text
+            return await aload_document_sample(temp_path, ext, mode, max_pages, seed)
+
+        # Load (on the parser process pool) and store the parsed text for
+        # the next preview or processing run
+        documents = await aload_document(temp_path, ext)
+        await asyncio.to_thread(store_pages, minio_client, file_hash, ext, documents)
+        return documents
     finally:
         os.unlink(temp_path)
 
-async def process_document_background(
+def iter_chunks(pages: Iterable[LangchainDocument], text_splitter: TextSplitter) -> Iterator[LangchainDocument]:
+    """Split pages one at a time, yielding chunks as they are produced"""
+    for page in pages:
+        yield from text_splitter.split_documents([page])
+
+def embed_batches(embeddings, batches: Iterator[List[LangchainDocument]]) -> Iterator[tuple]:
+    """Pair each batch with the vectors of its chunks that get embedded"""
+    with closing(batches):
+        for batch in batches:
+            texts = [chunk.page_content for chunk in batch if not is_near_duplicate(chunk.metadata)]
+            yield batch, embeddings.embed_documents(texts) if texts else []
+
+def ingestion_checkpoint_key(file_hash: str, chunk_size: int, chunk_overlap: int, source: str) -> str:
+    """Identifies everything that determines the chunk sequence of an ingestion run"""
+    key = ":".join(str(part) for part in (
+        file_hash, chunk_size, chunk_overlap, source, LOADER_VERSION,
+        settings.CHUNK_TOKEN_ENCODING, settings.NEAR_DUPLICATE_MODE.lower(), settings.NEAR_DUPLICATE_MAX_DISTANCE
+    ))
+    return hashlib.sha256(key.encode()).hexdigest()
+
+def iter_batches(items: Iterable, batch_size: int) -> Iterator[List]:
+    """Group an iterable into lists of at most batch_size items"""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def store_chunk_batch(
+    db: Session, chunks: List[LangchainDocument], kb_id: int, file_name: str, document_id: int, start_index: int = 0
+) -> List[str]:
+    """Annotate a batch of chunks, persist them as DocumentChunk rows and return their IDs"""
+    rows = []
+    for index, chunk in enumerate(chunks, start_index):
+        # 为每个 chunk 生成唯一的 ID
+        chunk_id = make_chunk_id(kb_id, file_name, index, chunk_content_hash(chunk.page_content))
+        rows.append(annotate_chunk(chunk, chunk_id, index, kb_id, file_name, document_id))
+    upsert_chunk_rows(db, rows)
+    db.commit()
+    return [row["id"] for row in rows]
+
+def process_document_background(
     temp_path: str,
     file_name: str,
     kb_id: int,
@@ -240,7 +268,12 @@ async def process_document_background(
     chunk_size: int = 1000,
     chunk_overlap: int = 200
 ) -> None:
-    """Process document in background"""
+    """
+    Process document in background.
+
+    This is a blocking job: it is meant to be submitted to the ingestion
+    scheduler, which runs it on a worker thread instead of the event loop.
+    """
     logger = logging.getLogger(__name__)
     logger.info(f"Starting background processing for task {task_id}, file: {file_name}")
 
@@ -254,186 +287,328 @@ async def process_document_background(
     task = db.query(ProcessingTask).get(task_id)
     if not task:
         logger.error(f"Task {task_id} not found")
+        if should_close_db:
+            db.close()
         return
-    
+
+    # Take the lease; another worker may already own the task or it may be
+    # waiting for its retry backoff to elapse
+    ready_at = max(filter(None, (task.created_at, task.next_attempt_at)), default=None)
+    if not claim_task(db, task_id):
+        logger.info(f"Task {task_id}: Not claimable by {WORKER_ID}, skipping")
+        if should_close_db:
+            db.close()
+        return
+    db.refresh(task)
+    logger.info(f"Task {task_id}: Claimed by {WORKER_ID} (attempt {task.attempts})")
+
+    timer = StageTimer()
+    if ready_at:
+        timer.add("queue_wait", max(0.0, (datetime.utcnow() - ready_at).total_seconds()))
+    started_at = time.perf_counter()
+    heartbeat = LeaseHeartbeat(task_id).start()
+    minio_client = get_minio_client()
+    vector_store = None
     try:
-        logger.info(f"Task {task_id}: Setting status to processing")
-        task.status = "processing"
-        db.commit()
-        
-        # 1. 从临时目录下载文件
-        minio_client = get_minio_client()
+        upload = task.document_upload  # 直接通过关系获取
+        file_hash = upload.file_hash
+        blob_path = blob_object_name(file_hash)
+        # 使用系统临时目录; created with the app's temp file prefix so a
+        # download left behind by a crashed worker is swept by the reaper
+        local_temp_path = None
         try:
-            local_temp_path = f"/tmp/temp_{task_id}_{file_name}"  # 使用系统临时目录
-            logger.info(f"Task {task_id}: Downloading file from MinIO: {temp_path} to {local_temp_path}")
-            minio_client.fget_object(
-                bucket_name=settings.MINIO_BUCKET_NAME,
-                object_name=temp_path,
-                file_path=local_temp_path
-            )
-            logger.info(f"Task {task_id}: File downloaded successfully")
-        except MinioException as e:
-            error_msg = f"Failed to download temp file: {str(e)}"
-            logger.error(f"Task {task_id}: {error_msg}")
-            raise Exception(error_msg)
-        
-        try:
-            # 2. 加载和分块文档
-            _, ext = os.path.splitext(file_name)
-            ext = ext.lower()
-            
-            logger.info(f"Task {task_id}: Loading document with extension {ext}")
-            # 选择合适的加载器
-            if ext == ".pdf":
-                loader = PyPDFLoader(local_temp_path)
-            elif ext == ".docx":
-                loader = Docx2txtLoader(local_temp_path)
-            elif ext == ".md":
-                loader = UnstructuredMarkdownLoader(local_temp_path)
-            else:  # 默认使用文本加载器
-                loader = TextLoader(local_temp_path)
-            
-            logger.info(f"Task {task_id}: Loading document content")
-            documents = loader.load()
-            logger.info(f"Task {task_id}: Document loaded successfully")
-            
-            logger.info(f"Task {task_id}: Splitting document into chunks")
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=chunk_size,
-                chunk_overlap=chunk_overlap
-            )
-            chunks = text_splitter.split_documents(documents)
-            logger.info(f"Task {task_id}: Document split into {len(chunks)} chunks")
-            
-            # 3. 创建向量存储
+            # Nothing is written into a knowledge base that is being deleted
+            ensure_active(db, kb_id)
+
+            # 1. 创建向量存储
             logger.info(f"Task {task_id}: Initializing vector store")
-            embeddings = EmbeddingsFactory.create()
+            embeddings = TimedEmbeddings(EmbeddingsFactory.create_for_ingestion(), timer)
             
-            vector_store = VectorStoreFactory.create(
+            vector_store = TimedVectorStore(VectorStoreFactory.create(
                 store_type=settings.VECTOR_STORE_TYPE,
                 collection_name=f"kb_{kb_id}",
                 embedding_function=embeddings,
-            )
+            ), timer)
             
-            # 4. 将临时文件移动到永久目录
-            permanent_path = f"kb_{kb_id}/{file_name}"
-            try:
-                logger.info(f"Task {task_id}: Moving file to permanent storage")
-                # 复制到永久目录
-                source = CopySource(settings.MINIO_BUCKET_NAME, temp_path)
-                minio_client.copy_object(
-                    bucket_name=settings.MINIO_BUCKET_NAME,
-                    object_name=permanent_path,
-                    source=source
-                )
-                logger.info(f"Task {task_id}: File moved to permanent storage")
-                
-                # 删除临时文件
-                logger.info(f"Task {task_id}: Removing temporary file from MinIO")
-                minio_client.remove_object(
-                    bucket_name=settings.MINIO_BUCKET_NAME,
-                    object_name=temp_path
+            # 2. 将文件存入内容寻址的 blob. New uploads are stored there
+            # directly; older uploads still sit under a temp path and are
+            # copied unless the content is already known. The upload is
+            # pointed at the blob under the blob lock, so the blob cannot be
+            # released between the existence check and that reference
+            if temp_path != blob_path:
+                lock_blob(db, file_hash)
+                if not blob_exists(minio_client, file_hash):
+                    try:
+                        logger.info(f"Task {task_id}: Moving file to blob storage")
+                        with timer.stage("copy"):
+                            minio_client.copy_object(
+                                bucket_name=settings.MINIO_BUCKET_NAME,
+                                object_name=blob_path,
+                                source=CopySource(settings.MINIO_BUCKET_NAME, temp_path)
+                            )
+                        logger.info(f"Task {task_id}: File copied to blob storage")
+                    except MinioException as e:
+                        error_msg = f"Failed to move file to permanent storage: {str(e)}"
+                        logger.error(f"Task {task_id}: {error_msg}")
+                        raise Exception(error_msg)
+                upload.temp_path = blob_path
+                db.commit()
+                try:
+                    minio_client.remove_object(bucket_name=settings.MINIO_BUCKET_NAME, object_name=temp_path)
+                except MinioException as e:
+                    logger.warning(f"Task {task_id}: Failed to remove {temp_path}: {str(e)}")
+                temp_path = blob_path
+            
+            # 3. 创建文档记录. A retried task reuses the document of its earlier
+            # attempt and an edited re-upload updates the existing document;
+            # task.document_id is only set here for documents this task creates,
+            # so a failed update never deletes the existing document
+            document = db.query(Document).get(task.document_id) if task.document_id else None
+            if document is None:
+                document = db.query(Document).filter(
+                    Document.knowledge_base_id == kb_id,
+                    Document.file_name == file_name
+                ).first()
+            if document:
+                logger.info(f"Task {task_id}: Updating existing document record {document.id}")
+            else:
+                logger.info(f"Task {task_id}: Creating document record")
+                document = Document(
+                    file_name=file_name,
+                    file_path=blob_path,
+                    file_hash=file_hash,
+                    file_size=upload.file_size,
+                    content_type=upload.content_type,
+                    knowledge_base_id=kb_id
                 )
-                logger.info(f"Task {task_id}: Temporary file removed")
-            except MinioException as e:
-                error_msg = f"Failed to move file to permanent storage: {str(e)}"
-                logger.error(f"Task {task_id}: {error_msg}")
-                raise Exception(error_msg)
+                db.add(document)
+                db.commit()
+                db.refresh(document)
+                task.document_id = document.id
+                db.commit()
+                logger.info(f"Task {task_id}: Document record created with ID {document.id}")
+            previous_hash, previous_path = document.file_hash, document.file_path
+            # A document this task created is written in order and
+            # checkpointed; an existing one is synchronized with its chunks
+            owns_document = task.document_id == document.id
+            has_chunks = not owns_document and db.query(DocumentChunk.id).filter(
+                DocumentChunk.document_id == document.id
+            ).first() is not None
             
-            # 5. 创建文档记录
-            logger.info(f"Task {task_id}: Creating document record")
-            document = Document(
-                file_name=file_name,
-                file_path=permanent_path,
-                file_hash=task.document_upload.file_hash,
-                file_size=task.document_upload.file_size,
-                content_type=task.document_upload.content_type,
-                knowledge_base_id=kb_id
+            # 4. 加载分块. Content already ingested for another document is
+            # not downloaded or parsed again; its chunks are reused, unless
+            # near-duplicates are dropped and stored chunk sets are incomplete
+            near_duplicates = create_near_duplicate_filter(db, kb_id, exclude_document_id=document.id)
+            source_document_id = None
+            if not near_duplicates or near_duplicates.mode != "drop":
+                source_document_id = find_chunked_document(db, file_hash, exclude_document_id=document.id)
+            if source_document_id:
+                logger.info(f"Task {task_id}: Reusing chunks of document {source_document_id} with identical content")
+                with timer.stage("load"):
+                    chunks = load_chunks(db, source_document_id)
+            else:
+                _, ext = os.path.splitext(file_name)
+                ext = ext.lower()
+                pages = iter_cached_pages(minio_client, file_hash, ext)
+                if pages is not None:
+                    logger.info(f"Task {task_id}: Re-chunking cached parsed text")
+                else:
+                    local_temp_path = make_temp_file(suffix=ext)
+                    try:
+                        logger.info(f"Task {task_id}: Downloading file from MinIO: {temp_path} to {local_temp_path}")
+                        with timer.stage("download"):
+                            minio_client.fget_object(
+                                bucket_name=settings.MINIO_BUCKET_NAME,
+                                object_name=temp_path,
+                                file_path=local_temp_path
+                            )
+                        logger.info(f"Task {task_id}: File downloaded successfully")
+                    except MinioException as e:
+                        error_msg = f"Failed to download temp file: {str(e)}"
+                        logger.error(f"Task {task_id}: {error_msg}")
+                        raise Exception(error_msg)
+                    logger.info(f"Task {task_id}: Streaming document with extension {ext}")
+                    pages = cache_pages(minio_client, file_hash, ext, iter_document_pages(local_temp_path, ext))
+                # Pages are parsed lazily as the splitter pulls them
+                text_splitter = create_text_splitter(chunk_size, chunk_overlap)
+                chunks = timer.iter("split", iter_chunks(timer.iter("load", pages), text_splitter))
+            if near_duplicates:
+                chunks = timer.iter("dedup", near_duplicates.filter(chunks))
+            checkpoint_key = ingestion_checkpoint_key(
+                file_hash, chunk_size, chunk_overlap, f"document:{source_document_id}" if source_document_id else "file"
             )
-            db.add(document)
-            db.commit()
-            db.refresh(document)
-            logger.info(f"Task {task_id}: Document record created with ID {document.id}")
             
-            # 6. 存储文档块
-            logger.info(f"Task {task_id}: Storing document chunks")
-            for i, chunk in enumerate(chunks):
-                # 为每个 chunk 生成唯一的 ID
-                chunk_id = hashlib.sha256(
-                    f"{kb_id}:{file_name}:{chunk.page_content}".encode()
-                ).hexdigest()
-
-                chunk.metadata["source"] = file_name
-                chunk.metadata["kb_id"] = kb_id
-                chunk.metadata["document_id"] = document.id
-                chunk.metadata["chunk_id"] = chunk_id
-                
-                doc_chunk = DocumentChunk(
-                    id=chunk_id,  # 添加 ID 字段
-                    document_id=document.id,
-                    kb_id=kb_id,
-                    file_name=file_name,
-                    chunk_metadata={
-                        "page_content": chunk.page_content,
-                        **chunk.metadata
-                    },
-                    hash=hashlib.sha256(
-                        (chunk.page_content + str(chunk.metadata)).encode()
-                    ).hexdigest()
+            # 5. 按批次写入数据库和向量存储
+            if has_chunks:
+                # Matching needs every new chunk at once; only chunks that are
+                # new since the stored version get embedded
+                chunks = list(chunks)
+                heartbeat.ensure_held()
+                ensure_active(db, kb_id)
+                logger.info(f"Task {task_id}: Synchronizing {len(chunks)} chunks with stored version")
+                with timer.stage("db_insert"):
+                    sync_document_chunks(
+                        db, vector_store, chunks, kb_id, file_name, document.id, settings.INGESTION_BATCH_SIZE
+                    )
+                total_chunks = len(chunks)
+            else:
+                # Resume after the last batch an earlier attempt stored in
+                # both the database and the vector store; chunking is
+                # deterministic, so the chunks before it are skipped. Dropping
+                # near-duplicates is not: what is dropped depends on the
+                # chunks other documents stored since, so such a run restarts
+                total_chunks = 0
+                resumable = not near_duplicates or near_duplicates.mode != "drop"
+                if resumable and task.checkpoint_key == checkpoint_key and task.checkpoint_chunk_index:
+                    total_chunks = task.checkpoint_chunk_index
+                    logger.info(f"Task {task_id}: Resuming from checkpoint at chunk {total_chunks}")
+                removed = truncate_document_chunks(
+                    db, vector_store, document.id, total_chunks, settings.INGESTION_BATCH_SIZE
                 )
-                db.add(doc_chunk)
-                if i > 0 and i % 100 == 0:
-                    logger.info(f"Task {task_id}: Stored {i} chunks")
-                    db.commit()  # 每 100 条提交一次，避免事务太大
-            
-            # 7. 添加到向量存储
-            logger.info(f"Task {task_id}: Adding chunks to vector store")
-            vector_store.add_documents(chunks)
-            # 移除 persist() 调用，因为新版本不需要
-            logger.info(f"Task {task_id}: Chunks added to vector store")
+                if removed:
+                    logger.info(f"Task {task_id}: Removed {removed} chunks written after the checkpoint")
+                task.checkpoint_key = checkpoint_key
+                task.checkpoint_chunk_index = total_chunks
+                db.commit()
+                # Parsing, embedding and writing run as concurrent stages:
+                # while batch K is embedded, batch K+1 is parsed and batch
+                # K-1 is written. Database access stays on this thread
+                depth = settings.INGESTION_PIPELINE_DEPTH
+                batches = iter_batches(islice(chunks, total_chunks, None), settings.INGESTION_BATCH_SIZE)
+                if depth > 0:
+                    batches = prefetch(batches, depth, name=f"parse-{task_id}")
+                embedded_batches = embed_batches(embeddings, batches)
+                if depth > 0:
+                    embedded_batches = prefetch(embedded_batches, depth, name=f"embed-{task_id}")
+                with closing(embedded_batches):
+                    for batch, vectors in embedded_batches:
+                        # Another worker may own the task once the lease is lost
+                        heartbeat.ensure_held()
+                        ensure_active(db, kb_id)
+                        with timer.stage("db_insert"):
+                            ids = store_chunk_batch(db, batch, kb_id, file_name, document.id, start_index=total_chunks)
+                        embedded = [
+                            (chunk, chunk_id) for chunk, chunk_id in zip(batch, ids)
+                            if not is_near_duplicate(chunk.metadata)
+                        ]
+                        if embedded:
+                            vector_store.add_embeddings(
+                                [chunk for chunk, _ in embedded], vectors, [chunk_id for _, chunk_id in embedded]
+                            )
+                        total_chunks += len(batch)
+                        task.checkpoint_chunk_index = total_chunks
+                        db.commit()
+                        logger.info(f"Task {task_id}: Stored {total_chunks} chunks")
+            logger.info(f"Task {task_id}: Document split into {total_chunks} chunks")
+            if near_duplicates and near_duplicates.duplicates:
+                action = "dropped" if near_duplicates.mode == "drop" else "stored without embedding"
+                logger.info(f"Task {task_id}: {near_duplicates.duplicates} near-duplicate chunks {action}")
+
+            document.file_path = blob_path
+            document.file_hash = file_hash
+            document.file_size = upload.file_size
+            document.content_type = upload.content_type
+            task.document_id = document.id
+            record_task_metrics(task, timer, started_at, total_chunks, upload.file_size)
             
-            # 8. 更新任务状态
+            # 6. 更新任务状态
             logger.info(f"Task {task_id}: Updating task status to completed")
-            task.status = "completed"
-            task.document_id = document.id  # 更新为新创建的文档ID
+            heartbeat.ensure_held()
+            complete_task(task)
             
-            # 9. 更新上传记录状态
-            upload = task.document_upload  # 直接通过关系获取
-            if upload:
-                logger.info(f"Task {task_id}: Updating upload record status to completed")
-                upload.status = "completed"
+            # 7. 更新上传记录状态
+            logger.info(f"Task {task_id}: Updating upload record status to completed")
+            upload.status = "completed"
             
             db.commit()
             logger.info(f"Task {task_id}: Processing completed successfully")
+
+            # 8. 删除临时文件 and, for an updated document, the previous
+            # version of its content (only once the task is committed, so
+            # retries can re-read it)
+            stale_objects = [path for path in (temp_path, previous_path) if not is_blob_path(path)]
+            for object_name in set(stale_objects):
+                try:
+                    minio_client.remove_object(
+                        bucket_name=settings.MINIO_BUCKET_NAME,
+                        object_name=object_name
+                    )
+                    logger.info(f"Task {task_id}: Removed {object_name}")
+                except MinioException as e:
+                    logger.warning(f"Task {task_id}: Failed to remove {object_name}: {str(e)}")
+            if previous_hash != file_hash:
+                release_blob(db, minio_client, previous_hash)
             
         finally:
             # 清理本地临时文件
             try:
-                if os.path.exists(local_temp_path):
+                if local_temp_path and os.path.exists(local_temp_path):
                     logger.info(f"Task {task_id}: Cleaning up local temp file")
                     os.remove(local_temp_path)
                     logger.info(f"Task {task_id}: Local temp file cleaned up")
             except Exception as e:
                 logger.warning(f"Task {task_id}: Failed to clean up local temp file: {str(e)}")
         
+    except LeaseLost as e:
+        # The task belongs to whichever worker claimed it next; nothing of
+        # this run is committed and the task is left to its new owner
+        logger.warning(f"{str(e)}, stopping")
+        db.rollback()
+    except KnowledgeBaseDeleted as e:
+        # The deletion job waits for this task to stop and then removes
+        # everything it wrote
+        logger.info(f"Task {task_id}: {str(e)}, stopping")
+        db.rollback()
+        cancel_task(task, str(e))
+        db.commit()
     except Exception as e:
         logger.error(f"Task {task_id}: Error processing document: {str(e)}")
         logger.error(f"Task {task_id}: Stack trace: {traceback.format_exc()}")
-        task.status = "failed"
-        task.error_message = str(e)
+        db.rollback()
+        record_task_metrics(task, timer, started_at)
+        # Parses lost to a pool reset caused by another file's timeout are
+        # not this task's failure
+        if fail_task(task, str(e), count_attempt=not isinstance(e, ParserPoolReset)):
+            db.commit()
+            logger.info(f"Task {task_id}: Rescheduled for retry at {task.next_attempt_at}")
+            return
+        db.commit()
+        # The document record is created before streaming starts; drop the
+        # partial record so a permanently failed file does not show up in the
+        # KB, together with the vectors its stored batches already wrote
+        document = db.query(Document).get(task.document_id) if task.document_id else None
+        if document:
+            try:
+                if vector_store is None:
+                    vector_store = VectorStoreFactory.create(
+                        store_type=settings.VECTOR_STORE_TYPE,
+                        collection_name=f"kb_{kb_id}",
+                        embedding_function=EmbeddingsFactory.create(),
+                    )
+                truncate_document_chunks(db, vector_store, document.id, 0, settings.INGESTION_BATCH_SIZE)
+                task.document_id = None
+                db.delete(document)
+            except Exception as cleanup_error:
+                # Chunks whose vectors could not be removed keep the document
+                # visible, so deleting it later removes them
+                db.rollback()
+                logger.error(f"Task {task_id}: Failed to remove partial document {document.id}: {str(cleanup_error)}")
         db.commit()
         
-        # 清理临时文件
-        try:
-            logger.info(f"Task {task_id}: Cleaning up temporary file after error")
-            minio_client.remove_object(
-                bucket_name=settings.MINIO_BUCKET_NAME,
-                object_name=temp_path
-            )
-            logger.info(f"Task {task_id}: Temporary file cleaned up after error")
-        except:
-            logger.warning(f"Task {task_id}: Failed to clean up temporary file after error")
+        # 清理临时文件. Blobs stay: the upload still references the blob
+        # until it is cleaned up, and other documents may share it
+        if not is_blob_path(temp_path):
+            try:
+                logger.info(f"Task {task_id}: Cleaning up temporary file after error")
+                minio_client.remove_object(
+                    bucket_name=settings.MINIO_BUCKET_NAME,
+                    object_name=temp_path
+                )
+                logger.info(f"Task {task_id}: Temporary file cleaned up after error")
+            except:
+                logger.warning(f"Task {task_id}: Failed to clean up temporary file after error")
     finally:
+        heartbeat.stop()
         # if we create the db session, we need to close it
         if should_close_db and db:
             db.close()
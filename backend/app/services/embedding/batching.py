@@ -0,0 +1,197 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ProviderBatchDefaults:
+    batch_size: int
+    min_batch_size: int
+    max_batch_size: int
+    max_concurrency: int
+
+
+# Starting points per provider; the batch size then adapts within [min, max].
+# DashScope caps a request at 10 texts, local HuggingFace models gain nothing
+# from running concurrently on the same cores.
+PROVIDER_DEFAULTS: Dict[str, ProviderBatchDefaults] = {
+    "openai": ProviderBatchDefaults(batch_size=64, min_batch_size=8, max_batch_size=512, max_concurrency=4),
+    "dashscope": ProviderBatchDefaults(batch_size=10, min_batch_size=1, max_batch_size=10, max_concurrency=4),
+    "ollama": ProviderBatchDefaults(batch_size=16, min_batch_size=1, max_batch_size=128, max_concurrency=2),
+    "huggingface": ProviderBatchDefaults(batch_size=32, min_batch_size=8, max_batch_size=256, max_concurrency=1),
+    # Concurrent batches are packed into forward passes by the micro-batcher
+    "local_onnx": ProviderBatchDefaults(batch_size=32, min_batch_size=8, max_batch_size=256, max_concurrency=2),
+}
+FALLBACK_DEFAULTS = ProviderBatchDefaults(batch_size=32, min_batch_size=1, max_batch_size=256, max_concurrency=2)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Best-effort detection of provider throttling across client libraries"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status == 429:
+        return True
+    if "ratelimit" in type(error).__name__.lower():
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in ("429", "rate limit", "too many requests", "throttl"))
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Retry-After header of a throttled response, if the client exposes it"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    value = headers.get("retry-after") if hasattr(headers, "get") else None
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveBatchSizer:
+    """
+    Additive-increase / multiplicative-decrease batch sizing.
+
+    Batches that come back well under the target latency grow the size,
+    slow batches shrink it a little and throttled batches halve it.
+    """
+
+    def __init__(self, initial: int, min_size: int, max_size: int, target_latency: float):
+        self.min_size = max(1, min_size)
+        self.max_size = max(self.min_size, max_size)
+        self.target_latency = target_latency
+        self._size = min(max(initial, self.min_size), self.max_size)
+        self._lock = threading.Lock()
+
+    @property
+    def current(self) -> int:
+        return self._size
+
+    def on_success(self, batch_len: int, latency: float) -> None:
+        with self._lock:
+            if batch_len < self._size:
+                # A short trailing batch says nothing about larger ones
+                return
+            if latency < self.target_latency / 2:
+                self._size = min(self.max_size, self._size + max(1, self._size // 4))
+            elif latency > self.target_latency:
+                self._size = max(self.min_size, int(self._size * 0.75))
+
+    def on_throttle(self) -> None:
+        with self._lock:
+            self._size = max(self.min_size, self._size // 2)
+
+
+class ProviderLimiter:
+    """Concurrency slots and batch sizer shared by every caller of one provider"""
+
+    def __init__(self, defaults: ProviderBatchDefaults):
+        concurrency = settings.EMBEDDING_MAX_CONCURRENCY or defaults.max_concurrency
+        initial = settings.EMBEDDING_BATCH_SIZE or defaults.batch_size
+        self.max_concurrency = concurrency
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.sizer = AdaptiveBatchSizer(
+            initial=initial,
+            min_size=min(defaults.min_batch_size, initial),
+            max_size=max(defaults.max_batch_size, initial),
+            target_latency=settings.EMBEDDING_TARGET_LATENCY_SECONDS,
+        )
+
+
+_limiters: Dict[str, ProviderLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_provider_limiter(provider: str) -> ProviderLimiter:
+    with _limiters_lock:
+        if provider not in _limiters:
+            _limiters[provider] = ProviderLimiter(PROVIDER_DEFAULTS.get(provider, FALLBACK_DEFAULTS))
+        return _limiters[provider]
+
+
+class BatchedEmbeddings(Embeddings):
+    """
+    Wraps a provider embeddings client for bulk ingestion.
+
+    embed_documents splits its input into adaptively sized batches, keeps up
+    to the provider's concurrency limit of them in flight and retries
+    throttled batches with jittered exponential backoff. Queries pass
+    straight through.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        provider: str,
+        limiter: Optional[ProviderLimiter] = None,
+        max_retries: Optional[int] = None,
+    ):
+        self.embeddings = embeddings
+        self.provider = provider
+        self.limiter = limiter or get_provider_limiter(provider)
+        self.max_retries = settings.EMBEDDING_MAX_RETRIES if max_retries is None else max_retries
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            with self.limiter.slots:
+                started = time.monotonic()
+                try:
+                    vectors = self.embeddings.embed_documents(texts)
+                except Exception as e:
+                    if not is_rate_limit_error(e) or attempt >= self.max_retries:
+                        raise
+                    self.limiter.sizer.on_throttle()
+                    error = e
+                else:
+                    self.limiter.sizer.on_success(len(texts), time.monotonic() - started)
+                    return vectors
+            # Sleep outside the slot so other batches can use it meanwhile
+            delay = retry_after_seconds(error) or min(
+                settings.EMBEDDING_RETRY_BACKOFF_MAX_SECONDS,
+                settings.EMBEDDING_RETRY_BACKOFF_SECONDS * (2 ** attempt),
+            )
+            delay *= random.uniform(0.8, 1.2)
+            attempt += 1
+            logger.warning(
+                f"{self.provider} embeddings throttled, retry {attempt}/{self.max_retries} "
+                f"in {delay:.1f}s (batch size now {self.limiter.sizer.current})"
+            )
+            time.sleep(delay)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        results: List[Optional[List[List[float]]]] = []
+        in_flight: Dict[Future, int] = {}
+        offset = 0
+        with ThreadPoolExecutor(max_workers=self.limiter.max_concurrency) as executor:
+            while offset < len(texts) or in_flight:
+                # Cut the next batch only when a slot frees up, so every batch
+                # uses the most recently adapted size
+                while offset < len(texts) and len(in_flight) < self.limiter.max_concurrency:
+                    size = self.limiter.sizer.current
+                    batch = texts[offset:offset + size]
+                    results.append(None)
+                    in_flight[executor.submit(self._embed_batch, batch)] = len(results) - 1
+                    offset += len(batch)
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[in_flight.pop(future)] = future.result()
+        return [vector for batch in results for vector in batch]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.embeddings.aembed_query(text)
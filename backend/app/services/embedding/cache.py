@@ -0,0 +1,321 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from array import array
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.embedding_cache import EmbeddingCacheEntry
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def cache_key(provider: str, model: str, text_hash: str) -> str:
+    return hashlib.sha256(f"{provider}:{model}:{text_hash}".encode()).hexdigest()
+
+
+def pack_vector(vector: List[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def unpack_vector(data: bytes) -> List[float]:
+    values = array("f")
+    values.frombytes(data)
+    return values.tolist()
+
+
+class CacheStats:
+    """Thread-safe hit/miss counters"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def record(self, hits: int, misses: int) -> None:
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    @property
+    def hit_rate(self) -> Optional[float]:
+        total = self.hits + self.misses
+        return self.hits / total if total else None
+
+    def to_dict(self) -> Dict:
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate}
+
+
+class EmbeddingCacheBackend(ABC):
+    """Persistent key -> vector store with least-recently-used eviction"""
+
+    # Counting entries is a full scan on InnoDB, so eviction only runs after
+    # this many new entries (the cache may overshoot max_entries by as much)
+    EVICT_EVERY = 1000
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        self._added_since_evict = 0
+        self._evict_lock = threading.Lock()
+
+    def _should_evict(self, added: int) -> bool:
+        with self._evict_lock:
+            self._added_since_evict += added
+            if self._added_since_evict < min(self.EVICT_EVERY, self.max_entries):
+                return False
+            self._added_since_evict = 0
+            return True
+
+    @abstractmethod
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Return cached vectors for the keys present, marking them as used"""
+
+    @abstractmethod
+    def set_many(self, provider: str, model: str, vectors: Dict[str, List[float]]) -> None:
+        """Store vectors, evicting least recently used entries beyond max_entries"""
+
+    @abstractmethod
+    def count(self) -> int:
+        pass
+
+
+class SQLiteEmbeddingCache(EmbeddingCacheBackend):
+    """Embedding cache in a local SQLite file, shared by processes on one host"""
+
+    def __init__(self, path: str, max_entries: int):
+        super().__init__(max_entries)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embedding_cache ("
+                "key TEXT PRIMARY KEY, provider TEXT, model TEXT, vector BLOB, last_used REAL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_used ON embedding_cache (last_used)"
+            )
+            self._conn.commit()
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        if not keys:
+            return {}
+        found = {}
+        with self._lock:
+            # Stay below SQLite's bound parameter limit
+            for start in range(0, len(keys), 500):
+                part = keys[start:start + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embedding_cache WHERE key IN ({placeholders})", part
+                ).fetchall()
+                found.update({key: unpack_vector(vector) for key, vector in rows})
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embedding_cache SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+            self._conn.commit()
+        return found
+
+    def set_many(self, provider: str, model: str, vectors: Dict[str, List[float]]) -> None:
+        if not vectors:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embedding_cache (key, provider, model, vector, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(key, provider, model, pack_vector(vector), now) for key, vector in vectors.items()],
+            )
+            overflow = self._count() - self.max_entries if self._should_evict(len(vectors)) else 0
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM embedding_cache WHERE key IN "
+                    "(SELECT key FROM embedding_cache ORDER BY last_used LIMIT ?)",
+                    (overflow,),
+                )
+            self._conn.commit()
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._count()
+
+
+class SQLEmbeddingCache(EmbeddingCacheBackend):
+    """Embedding cache in the application database, shared by all nodes"""
+
+    def __init__(self, session_factory, max_entries: int):
+        super().__init__(max_entries)
+        self.session_factory = session_factory
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        if not keys:
+            return {}
+        with self.session_factory() as db:
+            rows = db.execute(
+                select(EmbeddingCacheEntry.key, EmbeddingCacheEntry.vector)
+                .where(EmbeddingCacheEntry.key.in_(keys))
+            ).all()
+            found = {key: unpack_vector(vector) for key, vector in rows}
+            if found:
+                db.execute(
+                    update(EmbeddingCacheEntry)
+                    .where(EmbeddingCacheEntry.key.in_(list(found)))
+                    .values(last_used_at=datetime.utcnow())
+                    .execution_options(synchronize_session=False)
+                )
+                db.commit()
+        return found
+
+    def set_many(self, provider: str, model: str, vectors: Dict[str, List[float]]) -> None:
+        if not vectors:
+            return
+        now = datetime.utcnow()
+        rows = [
+            {
+                "key": key,
+                "provider": provider,
+                "model": model,
+                "vector": pack_vector(vector),
+                "created_at": now,
+                "last_used_at": now,
+            }
+            for key, vector in vectors.items()
+        ]
+        with self.session_factory() as db:
+            if db.get_bind().dialect.name == "mysql":
+                # Concurrent workers may insert the same key
+                stmt = mysql_insert(EmbeddingCacheEntry).values(rows)
+                db.execute(stmt.on_duplicate_key_update(last_used_at=stmt.inserted.last_used_at))
+            else:
+                existing = set(db.execute(
+                    select(EmbeddingCacheEntry.key).where(EmbeddingCacheEntry.key.in_(list(vectors)))
+                ).scalars())
+                new_rows = [row for row in rows if row["key"] not in existing]
+                if new_rows:
+                    db.execute(insert(EmbeddingCacheEntry), new_rows)
+            db.commit()
+            if self._should_evict(len(rows)):
+                self._evict(db)
+
+    def _evict(self, db: Session) -> None:
+        overflow = self._count(db) - self.max_entries
+        if overflow <= 0:
+            return
+        oldest = db.execute(
+            select(EmbeddingCacheEntry.key)
+            .order_by(EmbeddingCacheEntry.last_used_at)
+            .limit(overflow)
+        ).scalars().all()
+        db.execute(
+            delete(EmbeddingCacheEntry)
+            .where(EmbeddingCacheEntry.key.in_(oldest))
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+
+    def _count(self, db: Session) -> int:
+        return db.query(EmbeddingCacheEntry).count()
+
+    def count(self) -> int:
+        with self.session_factory() as db:
+            return self._count(db)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Consults the embedding cache before calling the wrapped embeddings.
+
+    Texts are keyed by (provider, model, SHA-256 of the text), so identical
+    chunks in other documents or knowledge bases are only embedded once.
+    Queries pass straight through.
+    """
+
+    def __init__(self, embeddings: Embeddings, backend: EmbeddingCacheBackend, provider: str, model: str):
+        self.embeddings = embeddings
+        self.backend = backend
+        self.provider = provider
+        self.model = model
+
+    def _keys(self, texts: Iterable[str]) -> List[str]:
+        return [cache_key(self.provider, self.model, content_hash(text)) for text in texts]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        keys = self._keys(texts)
+        try:
+            cached = self.backend.get_many(list(set(keys)))
+        except Exception as e:
+            logger.warning(f"Embedding cache lookup failed, embedding without cache: {str(e)}")
+            cached = {}
+
+        # Embed each missing text once, even if it repeats within the batch
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        self.backend.stats.record(hits=len(texts) - len(missing), misses=len(missing))
+
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            try:
+                self.backend.set_many(self.provider, self.model, fresh)
+            except Exception as e:
+                logger.warning(f"Failed to store embeddings in cache: {str(e)}")
+            cached.update(fresh)
+
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.embeddings.aembed_query(text)
+
+
+_backend: Optional[EmbeddingCacheBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCacheBackend]:
+    """Process-wide cache backend selected by EMBEDDING_CACHE_BACKEND"""
+    global _backend
+    backend_type = settings.EMBEDDING_CACHE_BACKEND.lower()
+    if backend_type == "none":
+        return None
+    with _backend_lock:
+        if _backend is None:
+            if backend_type == "sqlite":
+                _backend = SQLiteEmbeddingCache(settings.EMBEDDING_CACHE_PATH, settings.EMBEDDING_CACHE_MAX_ENTRIES)
+            elif backend_type == "mysql":
+                from app.db.session import SessionLocal
+                _backend = SQLEmbeddingCache(SessionLocal, settings.EMBEDDING_CACHE_MAX_ENTRIES)
+            else:
+                raise ValueError(f"Unsupported embedding cache backend: {backend_type}")
+            logger.info(f"Using {backend_type} embedding cache")
+        return _backend
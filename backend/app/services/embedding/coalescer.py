@@ -0,0 +1,61 @@
+from typing import Callable, Dict, List
+
+from langchain_community.embeddings import DashScopeEmbeddings
+from langchain_community.embeddings.dashscope import embed_with_retry
+from langchain_core.embeddings import Embeddings
+
+from app.services.embedding.micro_batch import MicroBatcher
+
+
+def batch_query_fn(embeddings: Embeddings) -> Callable[[List[str]], List[List[float]]]:
+    """Embeds several queries in one request, as embed_query would embed each"""
+    if isinstance(embeddings, DashScopeEmbeddings):
+        # DashScope embeds queries with text_type="query", documents with "document"
+        return lambda texts: [
+            item["embedding"]
+            for item in embed_with_retry(embeddings, input=texts, text_type="query", model=embeddings.model)
+        ]
+    # OpenAI and Ollama embed a query exactly like a one-text document batch
+    return embeddings.embed_documents
+
+
+class CoalescedQueryEmbeddings(Embeddings):
+    """
+    Gathers queries from concurrent callers into batched requests to a
+    remote provider. A query waits at most max_wait seconds for others
+    before its batch is sent. Documents pass straight through.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        max_batch_size: int,
+        max_wait: float,
+        max_concurrency: int = 1,
+    ):
+        self.embeddings = embeddings
+        self.batcher: MicroBatcher[str, List[float]] = MicroBatcher(
+            batch_query_fn(embeddings),
+            max_batch_size,
+            max_wait,
+            name="query-coalescer",
+            max_concurrency=max_concurrency,
+        )
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.batcher.map([text])[0]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.batcher.amap([text]))[0]
+
+    def stats(self) -> Dict:
+        return {"max_wait_ms": 1000 * self.batcher.max_wait, **self.batcher.stats.to_dict()}
+
+    def close(self) -> None:
+        self.batcher.close()
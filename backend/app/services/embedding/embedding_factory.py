@@ -1,15 +1,82 @@
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
 from app.core.config import settings
+from langchain_core.embeddings import Embeddings
 from langchain_openai import OpenAIEmbeddings
 from langchain_ollama import OllamaEmbeddings
 from langchain_community.embeddings import DashScopeEmbeddings
 from langchain_huggingface import HuggingFaceEmbeddings
+from app.services.embedding.batching import FALLBACK_DEFAULTS, PROVIDER_DEFAULTS, BatchedEmbeddings
+from app.services.embedding.cache import CachedEmbeddings, get_embedding_cache
+from app.services.embedding.coalescer import CoalescedQueryEmbeddings
+from app.services.embedding.query_cache import CachedQueryEmbeddings, get_query_embedding_cache
+
+
+class SerializedEmbeddings(Embeddings):
+    """
+    Serializes calls to an embeddings client that must not run on several
+    threads at once. Fast HuggingFace tokenizers raise "Already borrowed"
+    when one instance is used concurrently.
+    """
+
+    def __init__(self, embeddings: Embeddings):
+        self.embeddings = embeddings
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        with self._lock:
+            return self.embeddings.embed_query(text)
+
+
+# Process-wide embeddings clients, keyed by the provider configuration they
+# were built from. Building one loads a local model or opens an HTTP
+# connection pool, so it is done once and the client is shared by every
+# request, chat and ingestion task.
+_registry: Dict[Tuple, Embeddings] = {}
+_registry_lock = threading.Lock()
+
+# Providers reached over the network, whose queries are worth coalescing;
+# local_onnx batches queries itself
+REMOTE_PROVIDERS = ("openai", "dashscope", "ollama")
+
+
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.EMBEDDINGS_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.EMBEDDINGS_HTTP_MAX_CONNECTIONS,
+        keepalive_expiry=settings.EMBEDDINGS_HTTP_KEEPALIVE_SECONDS,
+    )
 
 
 class EmbeddingsFactory:
     @staticmethod
     def create():
         """
-        Factory method to create an embeddings instance based on .env config.
+        Shared embeddings instance for the .env config, built on first use.
+        """
+        return EmbeddingsFactory._shared(EmbeddingsFactory.config_key(), EmbeddingsFactory.build)
+
+    @staticmethod
+    def _shared(key: Tuple, build: Callable[[], Embeddings]) -> Embeddings:
+        embeddings = _registry.get(key)
+        if embeddings is None:
+            with _registry_lock:
+                embeddings = _registry.get(key)
+                if embeddings is None:
+                    embeddings = build()
+                    _registry[key] = embeddings
+        return embeddings
+
+    @staticmethod
+    def build():
+        """
+        Factory method to create a new embeddings instance based on .env config.
         """
         embeddings_provider = settings.EMBEDDINGS_PROVIDER.lower()
 
@@ -17,7 +84,9 @@ class EmbeddingsFactory:
             return OpenAIEmbeddings(
                 openai_api_key=settings.OPENAI_API_KEY,
                 openai_api_base=settings.OPENAI_API_BASE,
-                model=settings.OPENAI_EMBEDDINGS_MODEL
+                model=settings.OPENAI_EMBEDDINGS_MODEL,
+                # Keep-alive pool shared by all threads using this client
+                http_client=httpx.Client(limits=_http_limits())
             )
         elif embeddings_provider == "dashscope":
             return DashScopeEmbeddings(
@@ -27,15 +96,126 @@ class EmbeddingsFactory:
         elif embeddings_provider == "ollama":
             return OllamaEmbeddings(
                 model=settings.OLLAMA_EMBEDDINGS_MODEL,
-                base_url=settings.OLLAMA_API_BASE
+                base_url=settings.OLLAMA_API_BASE,
+                client_kwargs={"limits": _http_limits()}
             )
         elif embeddings_provider == "huggingface":
             model_kwargs = {}
             if settings.HUGGINGFACE_API_KEY:
                 model_kwargs["token"] = settings.HUGGINGFACE_API_KEY
-            return HuggingFaceEmbeddings(
+            return SerializedEmbeddings(HuggingFaceEmbeddings(
                 model_name=settings.HUGGINGFACE_EMBEDDINGS_MODEL,
                 model_kwargs=model_kwargs
+            ))
+        elif embeddings_provider == "local_onnx":
+            # Imported here so other providers do not load ONNX Runtime
+            from app.services.embedding.onnx_embeddings import OnnxEmbeddings
+            return OnnxEmbeddings.from_path(
+                settings.ONNX_EMBEDDINGS_MODEL_PATH,
+                model_file=settings.ONNX_EMBEDDINGS_MODEL_FILE,
+                max_length=settings.ONNX_EMBEDDINGS_MAX_LENGTH,
+                threads=settings.ONNX_EMBEDDINGS_THREADS,
+                max_batch_size=settings.EMBEDDING_MICRO_BATCH_SIZE,
+                max_wait=settings.EMBEDDING_MICRO_BATCH_WAIT_MS / 1000
             )
         else:
             raise ValueError(f"Unsupported embeddings provider: {embeddings_provider}")
+
+    @staticmethod
+    def config_key() -> Tuple:
+        """
+        Settings an embeddings instance depends on; a change builds a new one.
+        """
+        embeddings_provider = settings.EMBEDDINGS_PROVIDER.lower()
+        return {
+            "openai": (embeddings_provider, settings.OPENAI_EMBEDDINGS_MODEL, settings.OPENAI_API_BASE, settings.OPENAI_API_KEY),
+            "dashscope": (embeddings_provider, settings.DASH_SCOPE_EMBEDDINGS_MODEL, settings.DASH_SCOPE_API_KEY),
+            "ollama": (embeddings_provider, settings.OLLAMA_EMBEDDINGS_MODEL, settings.OLLAMA_API_BASE),
+            "huggingface": (embeddings_provider, settings.HUGGINGFACE_EMBEDDINGS_MODEL, settings.HUGGINGFACE_API_KEY),
+            "local_onnx": (
+                embeddings_provider, settings.ONNX_EMBEDDINGS_MODEL_PATH, settings.ONNX_EMBEDDINGS_MODEL_FILE,
+                settings.ONNX_EMBEDDINGS_MAX_LENGTH
+            ),
+        }.get(embeddings_provider, (embeddings_provider,))
+
+    @staticmethod
+    def clear() -> None:
+        """
+        Drop the shared instances, e.g. after the configuration changed.
+        """
+        with _registry_lock:
+            instances = list(_registry.values())
+            _registry.clear()
+        for embeddings in instances:
+            # Stops the batching threads of coalesced and local ONNX embeddings
+            close = getattr(embeddings, "close", None)
+            if close is not None:
+                close()
+
+    @staticmethod
+    def model_name() -> str:
+        """
+        Name of the configured embeddings model, used to key cached vectors.
+        """
+        embeddings_provider = settings.EMBEDDINGS_PROVIDER.lower()
+        return {
+            "openai": settings.OPENAI_EMBEDDINGS_MODEL,
+            "dashscope": settings.DASH_SCOPE_EMBEDDINGS_MODEL,
+            "ollama": settings.OLLAMA_EMBEDDINGS_MODEL,
+            "huggingface": settings.HUGGINGFACE_EMBEDDINGS_MODEL,
+            "local_onnx": f"{settings.ONNX_EMBEDDINGS_MODEL_PATH}/{settings.ONNX_EMBEDDINGS_MODEL_FILE}",
+        }.get(embeddings_provider, "")
+
+    @staticmethod
+    def create_for_ingestion():
+        """
+        Create an embeddings instance for bulk document ingestion, with
+        concurrent, rate-limit aware batching of embed_documents calls and,
+        if configured, a persistent cache of already embedded chunks.
+        """
+        provider = settings.EMBEDDINGS_PROVIDER.lower()
+        embeddings = BatchedEmbeddings(EmbeddingsFactory.create(), provider=provider)
+        cache = get_embedding_cache()
+        if cache is None:
+            return embeddings
+        return CachedEmbeddings(embeddings, cache, provider=provider, model=EmbeddingsFactory.model_name())
+
+    @staticmethod
+    def create_for_queries():
+        """
+        Create an embeddings instance for retrieval, which reuses recent
+        embeddings of the same query instead of calling the provider again.
+        """
+        provider = settings.EMBEDDINGS_PROVIDER.lower()
+        embeddings = EmbeddingsFactory.create()
+        if provider in REMOTE_PROVIDERS and settings.QUERY_EMBEDDING_COALESCE_WAIT_MS > 0:
+            embeddings = EmbeddingsFactory._shared(
+                EmbeddingsFactory._coalescer_key(), lambda: EmbeddingsFactory._coalesce(embeddings, provider)
+            )
+        cache = get_query_embedding_cache()
+        if cache is None:
+            return embeddings
+        return CachedQueryEmbeddings(embeddings, cache, provider=provider, model=EmbeddingsFactory.model_name())
+
+    @staticmethod
+    def _coalescer_key() -> Tuple:
+        return ("coalesced", settings.QUERY_EMBEDDING_COALESCE_WAIT_MS, settings.QUERY_EMBEDDING_COALESCE_MAX_BATCH) \
+            + EmbeddingsFactory.config_key()
+
+    @staticmethod
+    def _coalesce(embeddings: Embeddings, provider: str) -> CoalescedQueryEmbeddings:
+        defaults = PROVIDER_DEFAULTS.get(provider, FALLBACK_DEFAULTS)
+        return CoalescedQueryEmbeddings(
+            embeddings,
+            max_batch_size=min(settings.QUERY_EMBEDDING_COALESCE_MAX_BATCH, defaults.max_batch_size),
+            max_wait=settings.QUERY_EMBEDDING_COALESCE_WAIT_MS / 1000,
+            max_concurrency=defaults.max_concurrency,
+        )
+
+    @staticmethod
+    def coalescer_stats() -> Optional[Dict]:
+        """
+        Batch fill and wait times of the query coalescer, if one is running.
+        """
+        coalescer = _registry.get(EmbeddingsFactory._coalescer_key())
+        return coalescer.stats() if coalescer is not None else None
@@ -0,0 +1,195 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_STOP = object()
+
+
+class BatchStats:
+    """Thread-safe counters of how full batches are and how long items wait"""
+
+    def __init__(self, max_batch_size: int):
+        self.max_batch_size = max_batch_size
+        self.batches = 0
+        self.full_batches = 0
+        self.requests = 0
+        self.items = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.call_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, requests: int, items: int, waits: List[float], call_seconds: float) -> None:
+        with self._lock:
+            self.batches += 1
+            self.full_batches += int(items >= self.max_batch_size)
+            self.requests += requests
+            self.items += items
+            self.wait_seconds += sum(waits)
+            self.max_wait_seconds = max([self.max_wait_seconds, *waits])
+            self.call_seconds += call_seconds
+
+    def to_dict(self) -> Dict:
+        batches = self.batches or None
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "items": self.items,
+            "full_batches": self.full_batches,
+            "avg_batch_size": self.items / batches if batches else None,
+            # Share of the batch capacity that was used
+            "avg_fill": self.items / (batches * self.max_batch_size) if batches else None,
+            "avg_wait_ms": 1000 * self.wait_seconds / self.requests if self.requests else None,
+            "max_wait_ms": 1000 * self.max_wait_seconds,
+            "avg_call_ms": 1000 * self.call_seconds / batches if batches else None,
+        }
+
+
+class MicroBatcher(Generic[T, R]):
+    """
+    Packs concurrent requests into batches for one background thread.
+
+    A request waits at most max_wait seconds for others to join its batch,
+    and a batch holds at most max_batch_size items. Requests larger than
+    that are split over several batches. fn receives the items of a batch
+    and returns one result per item, in order.
+
+    Up to max_concurrency batches run at once; while all of them are busy,
+    new requests queue up and are packed into the next batch.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[List[T]], Sequence[R]],
+        max_batch_size: int,
+        max_wait: float,
+        name: str = "micro-batch",
+        max_concurrency: int = 1,
+    ):
+        self.fn = fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait)
+        self.stats = BatchStats(self.max_batch_size)
+        self._requests: "queue.Queue" = queue.Queue()
+        self._slots = threading.Semaphore(max(1, max_concurrency))
+        # A single slot runs batches on the collecting thread itself
+        self._executor = ThreadPoolExecutor(max_concurrency, thread_name_prefix=name) if max_concurrency > 1 else None
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, items: Sequence[T]) -> "Future[List[R]]":
+        """Queue items; the future resolves to their results in order"""
+        pieces = [
+            list(items[start:start + self.max_batch_size])
+            for start in range(0, len(items), self.max_batch_size)
+        ]
+        now = time.monotonic()
+        if len(pieces) <= 1:
+            future: Future = Future()
+            if pieces:
+                self._requests.put((pieces[0], future, now))
+            else:
+                future.set_result([])
+            return future
+
+        futures = []
+        for piece in pieces:
+            futures.append(Future())
+            self._requests.put((piece, futures[-1], now))
+        combined: Future = Future()
+        remaining = [len(futures)]
+        lock = threading.Lock()
+
+        def done(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            error = next((f.exception() for f in futures if f.exception()), None)
+            if error:
+                combined.set_exception(error)
+            else:
+                combined.set_result([result for f in futures for result in f.result()])
+
+        for f in futures:
+            f.add_done_callback(done)
+        return combined
+
+    def map(self, items: Sequence[T]) -> List[R]:
+        return self.submit(items).result()
+
+    async def amap(self, items: Sequence[T]) -> List[R]:
+        return await asyncio.wrap_future(self.submit(items))
+
+    def close(self) -> None:
+        self._requests.put(_STOP)
+        self._thread.join()
+
+    def _collect(self, first: Tuple) -> Tuple[List[Tuple], Optional[Tuple], bool]:
+        """Requests for one batch, the request that did not fit and whether to stop"""
+        batch = [first]
+        size = len(first[0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                request = self._requests.get(timeout=timeout) if timeout > 0 else self._requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is _STOP:
+                return batch, None, True
+            if size + len(request[0]) > self.max_batch_size:
+                return batch, request, False
+            batch.append(request)
+            size += len(request[0])
+        return batch, None, False
+
+    def _run(self) -> None:
+        carry = None
+        stop = False
+        while not stop or carry:
+            # Requests arriving while every slot is busy join the next batch
+            self._slots.acquire()
+            request = carry or self._requests.get()
+            if request is _STOP:
+                self._slots.release()
+                break
+            batch, carry, stop = self._collect(request)
+            if self._executor is None:
+                self._call(batch)
+            else:
+                self._executor.submit(self._call, batch)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    def _call(self, batch: List[Tuple]) -> None:
+        try:
+            batch = [request for request in batch if request[1].set_running_or_notify_cancel()]
+            if not batch:
+                return
+            flat = [item for items, _, _ in batch for item in items]
+            started = time.monotonic()
+            try:
+                results = list(self.fn(flat))
+                if len(results) != len(flat):
+                    raise ValueError(f"Expected {len(flat)} results, got {len(results)}")
+            except BaseException as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                return
+            finally:
+                self.stats.record(
+                    len(batch), len(flat), [started - enqueued for _, _, enqueued in batch], time.monotonic() - started
+                )
+            offset = 0
+            for items, future, _ in batch:
+                future.set_result(results[offset:offset + len(items)])
+                offset += len(items)
+        finally:
+            self._slots.release()
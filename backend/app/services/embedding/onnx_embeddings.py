@@ -0,0 +1,99 @@
+"""
+Local CPU embeddings with ONNX Runtime.
+
+The model directory holds an ONNX export of a sentence-transformers model
+and its tokenizer.json, e.g. as written by
+
+    optimum-cli export onnx --model sentence-transformers/all-MiniLM-L6-v2 models/minilm
+
+An int8 model for faster CPU inference can be made from it with
+onnxruntime.quantization.quantize_dynamic and selected with
+ONNX_EMBEDDINGS_MODEL_FILE.
+"""
+import os
+from typing import List
+
+import numpy as np
+import onnxruntime as ort
+from langchain_core.embeddings import Embeddings
+from tokenizers import Tokenizer
+
+from app.services.embedding.micro_batch import MicroBatcher
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Mean-pooled, L2-normalized sentence embeddings from an ONNX model.
+
+    All calls, queries and ingestion batches alike, go through a
+    MicroBatcher, so concurrent texts share one forward pass.
+    """
+
+    def __init__(
+        self,
+        session: "ort.InferenceSession",
+        tokenizer: Tokenizer,
+        max_batch_size: int = 32,
+        max_wait: float = 0.005,
+    ):
+        self.session = session
+        self.tokenizer = tokenizer
+        self.input_names = {model_input.name for model_input in session.get_inputs()}
+        if tokenizer.padding is None:
+            # Pad each batch to its longest text
+            tokenizer.enable_padding()
+        self.batcher: MicroBatcher[str, List[float]] = MicroBatcher(
+            self._forward, max_batch_size, max_wait, name="onnx-embeddings"
+        )
+
+    @classmethod
+    def from_path(
+        cls,
+        model_path: str,
+        model_file: str = "model.onnx",
+        max_length: int = 512,
+        threads: int = 0,
+        max_batch_size: int = 32,
+        max_wait: float = 0.005,
+    ) -> "OnnxEmbeddings":
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        session = ort.InferenceSession(
+            os.path.join(model_path, model_file), options, providers=["CPUExecutionProvider"]
+        )
+        tokenizer = Tokenizer.from_file(os.path.join(model_path, "tokenizer.json"))
+        tokenizer.enable_truncation(max_length=max_length)
+        return cls(session, tokenizer, max_batch_size=max_batch_size, max_wait=max_wait)
+
+    def _forward(self, texts: List[str]) -> List[List[float]]:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        output = self.session.run(None, {name: value for name, value in feeds.items() if name in self.input_names})[0]
+
+        if output.ndim == 3:
+            # Token embeddings: average over the non-padding tokens
+            mask = attention_mask[:, :, None].astype(output.dtype)
+            output = (output * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(output, axis=1, keepdims=True)
+        return (output / np.clip(norms, 1e-12, None)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.batcher.map(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.batcher.map([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.batcher.amap(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.batcher.amap([text]))[0]
+
+    def close(self) -> None:
+        self.batcher.close()
@@ -0,0 +1,171 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.services.embedding.cache import CacheStats, cache_key, content_hash, pack_vector, unpack_vector
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(text: str) -> str:
+    """Queries differing only in Unicode form or whitespace share an embedding"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class SQLiteQueryEmbeddingCache:
+    """Query embeddings in a local SQLite file, shared by the processes on one host"""
+
+    # Expired and surplus entries are removed after this many writes
+    EVICT_EVERY = 100
+
+    def __init__(self, path: str, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = CacheStats()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._lock = threading.Lock()
+        self._writes = 0
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS query_embedding_cache ("
+                "key TEXT PRIMARY KEY, vector BLOB, expires_at REAL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_query_embedding_cache_expires_at "
+                "ON query_embedding_cache (expires_at)"
+            )
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector FROM query_embedding_cache WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+        self.stats.record(hits=int(row is not None), misses=int(row is None))
+        return unpack_vector(row[0]) if row else None
+
+    def set(self, key: str, vector: List[float]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO query_embedding_cache (key, vector, expires_at) VALUES (?, ?, ?)",
+                (key, pack_vector(vector), now + self.ttl),
+            )
+            self._writes += 1
+            if self._writes >= self.EVICT_EVERY:
+                self._writes = 0
+                self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute("DELETE FROM query_embedding_cache WHERE expires_at <= ?", (now,))
+        overflow = self._conn.execute("SELECT COUNT(*) FROM query_embedding_cache").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            # Entries expiring first were set longest ago
+            self._conn.execute(
+                "DELETE FROM query_embedding_cache WHERE key IN "
+                "(SELECT key FROM query_embedding_cache ORDER BY expires_at LIMIT ?)",
+                (overflow,),
+            )
+
+
+class QueryEmbeddingCache:
+    """In-memory LRU cache of query embeddings, backed by an optional SQLite tier"""
+
+    def __init__(self, memory: LRUCache, disk: Optional[SQLiteQueryEmbeddingCache] = None):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key: str) -> Optional[List[float]]:
+        vector = self.memory.get(key)
+        if vector is None and self.disk is not None:
+            try:
+                vector = self.disk.get(key)
+            except Exception as e:
+                logger.warning(f"Query embedding cache lookup failed: {str(e)}")
+            if vector is not None:
+                self.memory.set(key, vector)
+        return vector
+
+    def set(self, key: str, vector: List[float]) -> None:
+        self.memory.set(key, vector)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, vector)
+            except Exception as e:
+                logger.warning(f"Failed to store query embedding in cache: {str(e)}")
+
+    def stats(self) -> Dict:
+        stats = {"memory": self.memory.stats(), "ttl_seconds": self.memory.ttl}
+        if self.disk is not None:
+            stats["disk"] = {"max_entries": self.disk.max_entries, **self.disk.stats.to_dict()}
+        return stats
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    Looks up query embeddings in the query cache before calling the wrapped
+    embeddings. Documents pass straight through.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: QueryEmbeddingCache, provider: str, model: str):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.provider = provider
+        self.model = model
+
+    def _key(self, text: str) -> str:
+        return cache_key(self.provider, self.model, content_hash(normalize_query(text)))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        vector = self.cache.get(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.set(key, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        vector = self.cache.get(key)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            self.cache.set(key, vector)
+        return vector
+
+
+_query_cache: Optional[QueryEmbeddingCache] = None
+_query_cache_lock = threading.Lock()
+
+
+def get_query_embedding_cache() -> Optional[QueryEmbeddingCache]:
+    """Process-wide query embedding cache; None when QUERY_EMBEDDING_CACHE_SIZE is 0"""
+    global _query_cache
+    if settings.QUERY_EMBEDDING_CACHE_SIZE <= 0:
+        return None
+    with _query_cache_lock:
+        if _query_cache is None:
+            ttl = settings.QUERY_EMBEDDING_CACHE_TTL_SECONDS
+            disk = None
+            if settings.QUERY_EMBEDDING_CACHE_PATH:
+                disk = SQLiteQueryEmbeddingCache(
+                    settings.QUERY_EMBEDDING_CACHE_PATH, settings.QUERY_EMBEDDING_CACHE_DISK_ENTRIES, ttl
+                )
+            _query_cache = QueryEmbeddingCache(LRUCache(settings.QUERY_EMBEDDING_CACHE_SIZE, ttl=ttl), disk)
+        return _query_cache
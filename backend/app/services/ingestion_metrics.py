@@ -0,0 +1,161 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from app.models.knowledge import ProcessingTask
+from app.services.vector_store.base import BaseVectorStore
+
+# Stages recorded for an ingestion task, in pipeline order
+STAGES = ("queue_wait", "copy", "download", "load", "split", "dedup", "db_insert", "embed", "upsert")
+
+# Upper bounds (seconds) of the histogram buckets served for dashboards
+HISTOGRAM_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900)
+
+
+class StageTimer:
+    """
+    Accumulates wall-clock seconds per ingestion stage.
+
+    Stages nest: time spent in an inner stage is not counted for the stage
+    around it, so lazily chained steps (splitting pulls pages from the
+    loader, the vector store embeds while upserting) are attributed to the
+    step actually running. Stages running concurrently on different
+    threads are each counted in full, so their sum may exceed wall time.
+    """
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = defaultdict(float)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @property
+    def _stack(self) -> List[List[Any]]:
+        # [stage, started_at, child seconds] frames of the current thread
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.seconds[stage] += seconds
+
+    @contextmanager
+    def stage(self, name: str):
+        stack = self._stack
+        frame = [name, time.perf_counter(), 0.0]
+        stack.append(frame)
+        try:
+            yield
+        finally:
+            stack.pop()
+            elapsed = time.perf_counter() - frame[1]
+            self.add(name, elapsed - frame[2])
+            if stack:
+                stack[-1][2] += elapsed
+
+    def iter(self, name: str, items: Iterable) -> Iterator:
+        """Yield from items, timing each step of the iteration as the stage"""
+        iterator = iter(items)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def to_dict(self) -> Dict[str, float]:
+        with self._lock:
+            return {name: round(seconds, 4) for name, seconds in self.seconds.items()}
+
+
+class TimedEmbeddings(Embeddings):
+    """Records embed_documents calls of the wrapped embeddings as the "embed" stage"""
+
+    def __init__(self, embeddings: Embeddings, timer: StageTimer):
+        self.embeddings = embeddings
+        self.timer = timer
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self.timer.stage("embed"):
+            return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+
+class TimedVectorStore:
+    """Records writes to the wrapped vector store as the "upsert" stage"""
+
+    def __init__(self, vector_store: BaseVectorStore, timer: StageTimer):
+        self.vector_store = vector_store
+        self.timer = timer
+
+    def add_documents(self, documents, ids=None) -> None:
+        with self.timer.stage("upsert"):
+            self.vector_store.add_documents(documents, ids=ids)
+
+    def add_embeddings(self, documents, embeddings, ids) -> None:
+        with self.timer.stage("upsert"):
+            self.vector_store.add_embeddings(documents, embeddings, ids)
+
+    def delete(self, ids) -> None:
+        with self.timer.stage("upsert"):
+            self.vector_store.delete(ids)
+
+    def delete_document(self, document_id: int) -> None:
+        with self.timer.stage("upsert"):
+            self.vector_store.delete_document(document_id)
+
+    def __getattr__(self, name):
+        return getattr(self.vector_store, name)
+
+
+def record_task_metrics(
+    task: ProcessingTask,
+    timer: StageTimer,
+    started_at: float,
+    chunk_count: Optional[int] = None,
+    byte_count: Optional[int] = None,
+) -> None:
+    """Store the attempt's stage timings and counts on the task (caller commits)"""
+    task.stage_timings = {**timer.to_dict(), "total": round(time.perf_counter() - started_at, 4)}
+    task.chunk_count = chunk_count
+    task.byte_count = byte_count
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def aggregate_stage_timings(timings: Iterable[Optional[Dict[str, float]]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Per-stage count, sum, percentiles and cumulative histogram over tasks.
+
+    Buckets are cumulative like Prometheus histograms: each "le" bucket
+    counts the tasks whose stage took at most that many seconds.
+    """
+    values: Dict[str, List[float]] = defaultdict(list)
+    for timing in timings:
+        for stage, seconds in (timing or {}).items():
+            values[stage].append(seconds)
+
+    order = {stage: i for i, stage in enumerate(STAGES + ("total",))}
+    result = {}
+    for stage in sorted(values, key=lambda s: (order.get(s, len(order)), s)):
+        ordered = sorted(values[stage])
+        buckets = {str(bound): sum(1 for v in ordered if v <= bound) for bound in HISTOGRAM_BUCKETS}
+        buckets["+Inf"] = len(ordered)
+        result[stage] = {
+            "count": len(ordered),
+            "sum": round(sum(ordered), 4),
+            "p50": _percentile(ordered, 0.5),
+            "p95": _percentile(ordered, 0.95),
+            "max": ordered[-1],
+            "buckets": buckets,
+        }
+    return result
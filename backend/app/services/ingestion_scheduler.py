@@ -0,0 +1,150 @@
+import asyncio
+import functools
+import logging
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class JobTiming:
+    """Queue and run timings of a single ingestion job"""
+    job_id: int
+    enqueued_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    status: str = "queued"  # queued, running, completed, failed
+
+    @property
+    def queue_seconds(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        return self.started_at - self.enqueued_at
+
+    @property
+    def run_seconds(self) -> Optional[float]:
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "queue_seconds": self.queue_seconds,
+            "run_seconds": self.run_seconds,
+        }
+
+
+class IngestionScheduler:
+    """
+    Bounded scheduler for document ingestion jobs.
+
+    Jobs are queued on an asyncio queue and drained by a fixed number of
+    worker coroutines. Each job is a blocking callable executed on a
+    dedicated thread pool, so MinIO, parsing, database and embedding calls
+    never run on the event loop.
+    """
+
+    def __init__(self, max_concurrency: int, max_history: int = 1000):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        self.max_history = max_history
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency,
+            thread_name_prefix="ingestion",
+        )
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._timings: "OrderedDict[int, JobTiming]" = OrderedDict()
+        self._running = 0
+
+    def _ensure_workers(self) -> None:
+        """Lazily start the worker coroutines on the running event loop"""
+        if self._queue is not None and self._workers:
+            return
+        self._queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        self._workers = [
+            loop.create_task(self._worker(i)) for i in range(self.max_concurrency)
+        ]
+        logger.info(f"Started {self.max_concurrency} ingestion workers")
+
+    async def submit(self, job_id: int, func: Callable[..., Any], *args: Any, **kwargs: Any) -> None:
+        """Enqueue a blocking job; returns as soon as the job is queued"""
+        self._ensure_workers()
+        self._record(JobTiming(job_id=job_id, enqueued_at=time.monotonic()))
+        await self._queue.put((job_id, functools.partial(func, *args, **kwargs)))
+
+    async def _worker(self, worker_id: int) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            job_id, job = await self._queue.get()
+            timing = self._timings.get(job_id)
+            if timing:
+                timing.started_at = time.monotonic()
+                timing.status = "running"
+            self._running += 1
+            try:
+                await loop.run_in_executor(self._executor, job)
+                if timing:
+                    timing.status = "completed"
+            except Exception as e:
+                logger.error(f"Ingestion job {job_id} failed on worker {worker_id}: {str(e)}")
+                if timing:
+                    timing.status = "failed"
+            finally:
+                self._running -= 1
+                if timing:
+                    timing.finished_at = time.monotonic()
+                self._queue.task_done()
+
+    def _record(self, timing: JobTiming) -> None:
+        self._timings[timing.job_id] = timing
+        self._timings.move_to_end(timing.job_id)
+        while len(self._timings) > self.max_history:
+            self._timings.popitem(last=False)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    def get_timing(self, job_id: int) -> Optional[JobTiming]:
+        return self._timings.get(job_id)
+
+    def stats(self, recent: int = 20) -> Dict[str, Any]:
+        """Snapshot of the scheduler state"""
+        finished = [t for t in self._timings.values() if t.finished_at is not None]
+        queue_times = [t.queue_seconds for t in finished]
+        run_times = [t.run_seconds for t in finished]
+        return {
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self.queue_depth,
+            "running": self.running,
+            "avg_queue_seconds": sum(queue_times) / len(queue_times) if queue_times else None,
+            "avg_run_seconds": sum(run_times) / len(run_times) if run_times else None,
+            "recent_jobs": [t.to_dict() for t in list(self._timings.values())[-recent:]],
+        }
+
+    async def shutdown(self) -> None:
+        """Cancel idle workers and wait for running jobs to finish"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+        await asyncio.to_thread(self._executor.shutdown, True)
+
+
+ingestion_scheduler = IngestionScheduler(settings.INGESTION_MAX_CONCURRENCY)
@@ -0,0 +1,235 @@
+import logging
+import time
+from typing import Dict, Iterator, List, Optional, Set
+
+from minio import Minio
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.minio import get_minio_client, remove_objects_batched
+from app.db.session import SessionLocal
+from app.models.knowledge import Document, DocumentChunk, DocumentUpload, KnowledgeBase, ProcessingTask
+from app.services.blob_store import is_blob_path, release_blob
+from app.services.embedding.embedding_factory import EmbeddingsFactory
+from app.services.task_queue import has_leased_tasks
+from app.services.vector_store import VectorStoreFactory
+
+logger = logging.getLogger(__name__)
+
+ACTIVE, DELETING = "active", "deleting"
+# Stage recorded when a deletion job stopped on an error; it can be queued again
+FAILED_STAGE = "failed"
+# Interval at which a deletion checks whether running ingestion tasks stopped
+TASK_POLL_SECONDS = 1.0
+
+
+class KnowledgeBaseDeleted(Exception):
+    """Raised to stop ingestion into a knowledge base that is being deleted"""
+
+
+def ensure_active(db: Session, kb_id: int) -> None:
+    """Raise KnowledgeBaseDeleted unless the knowledge base is active"""
+    status = db.query(KnowledgeBase.status).filter(KnowledgeBase.id == kb_id).scalar()
+    if status != ACTIVE:
+        raise KnowledgeBaseDeleted(f"Knowledge base {kb_id} is being deleted")
+
+
+def deletion_failed(kb: KnowledgeBase) -> bool:
+    return kb.status == DELETING and (kb.deletion_progress or {}).get("stage") == FAILED_STAGE
+
+
+def mark_deleting(db: Session, kb: KnowledgeBase) -> None:
+    """
+    Hide the knowledge base and queue its contents for deletion. A failed
+    deletion is queued again with the progress it recorded.
+    """
+    progress = dict(kb.deletion_progress or {}) if kb.status == DELETING else {}
+    kb.status = DELETING
+    kb.deletion_progress = {"deleted": {}, "errors": [], **progress, "stage": "queued"}
+    db.commit()
+
+
+def public_progress(kb: KnowledgeBase) -> Dict:
+    """Deletion progress without the bookkeeping kept for resumed runs"""
+    progress = dict(kb.deletion_progress or {})
+    progress.pop("file_hashes", None)
+    return progress
+
+
+def delete_rows(db: Session, model, condition, batch_size: int) -> Iterator[int]:
+    """
+    Delete matching rows with DELETE ... LIMIT, one committed batch at a time.
+
+    Short transactions keep lock times and undo logs small however many rows
+    there are. Yields the number of rows removed by each batch. Dialects
+    without DELETE ... LIMIT delete everything in the first statement.
+    """
+    while True:
+        result = db.execute(
+            delete(model).where(condition).with_dialect_options(mysql_limit=batch_size)
+        )
+        db.commit()
+        if result.rowcount:
+            yield result.rowcount
+        if result.rowcount < batch_size:
+            return
+
+
+def remove_prefix(client: Minio, prefix: str, batch_size: int) -> Iterator[int]:
+    """Remove every object under prefix with batched DeleteObjects requests"""
+    objects = client.list_objects(settings.MINIO_BUCKET_NAME, prefix=prefix, recursive=True)
+    return remove_objects_batched(client, (obj.object_name for obj in objects), batch_size)
+
+
+class DeletionProgress:
+    """Keeps KnowledgeBase.deletion_progress up to date as the job advances"""
+
+    def __init__(self, db: Session, kb: KnowledgeBase):
+        self.db = db
+        self.kb = kb
+        self.progress: Dict = dict(kb.deletion_progress or {})
+        self.progress.setdefault("deleted", {})
+        self.progress.setdefault("errors", [])
+
+    def stage(self, name: str) -> None:
+        self.progress["stage"] = name
+        self._save()
+
+    def count(self, kind: str, n: int) -> None:
+        deleted = self.progress["deleted"]
+        deleted[kind] = deleted.get(kind, 0) + n
+        self._save()
+
+    def error(self, message: str) -> None:
+        logger.error(f"Knowledge base {self.kb.id}: {message}")
+        self.progress["errors"].append(message)
+        self._save()
+
+    def file_hashes(self, load) -> List[str]:
+        """
+        Blobs to release once the rows are gone. They are recorded before any
+        row is deleted, so a resumed run releases them too.
+        """
+        if "file_hashes" not in self.progress:
+            self.progress["file_hashes"] = sorted(load())
+            self._save()
+        return self.progress["file_hashes"]
+
+    def _save(self) -> None:
+        # Assign a new dict so the JSON column is marked as changed
+        self.kb.deletion_progress = {
+            **self.progress, "deleted": dict(self.progress["deleted"]), "errors": list(self.progress["errors"])
+        }
+        self.db.commit()
+
+
+def _file_hashes(db: Session, kb_id: int) -> Set[str]:
+    hashes = {
+        file_hash for (file_hash,) in
+        db.query(Document.file_hash).filter(Document.knowledge_base_id == kb_id).distinct()
+    }
+    uploads = db.query(DocumentUpload.file_hash, DocumentUpload.temp_path).filter(
+        DocumentUpload.knowledge_base_id == kb_id
+    )
+    hashes |= {file_hash for file_hash, temp_path in uploads if is_blob_path(temp_path)}
+    hashes.discard(None)
+    hashes.discard("")
+    return hashes
+
+
+def delete_knowledge_base_contents(kb_id: int, db: Optional[Session] = None, minio_client: Optional[Minio] = None) -> None:
+    """
+    Delete a knowledge base marked as deleting, in batches.
+
+    Running ingestion tasks are waited for, then rows go first so queued
+    tasks are cancelled before anything else; the vector collection is
+    dropped after its chunk rows. Each step is idempotent, so a job
+    interrupted by a restart is simply run again.
+    """
+    should_close_db = db is None
+    db = db or SessionLocal()
+    progress = None
+    try:
+        kb = db.query(KnowledgeBase).filter(
+            KnowledgeBase.id == kb_id, KnowledgeBase.status == DELETING
+        ).first()
+        if not kb:
+            return
+        progress = DeletionProgress(db, kb)
+        batch_size = settings.KB_DELETE_BATCH_SIZE
+        minio_client = minio_client or get_minio_client()
+        file_hashes = progress.file_hashes(lambda: _file_hashes(db, kb_id))
+
+        # 0. Ingestion tasks stop before their next batch once the knowledge
+        # base is deleting; wait for those still running so nothing is
+        # written after its rows and collection are gone. A dead worker's
+        # lease expires
+        progress.stage("waiting")
+        while has_leased_tasks(db, kb_id):
+            db.commit()
+            time.sleep(TASK_POLL_SECONDS)
+
+        # 1. Database rows, children before parents
+        steps = [
+            ("tasks", ProcessingTask, ProcessingTask.knowledge_base_id == kb_id),
+            ("chunks", DocumentChunk, DocumentChunk.kb_id == kb_id),
+            ("uploads", DocumentUpload, DocumentUpload.knowledge_base_id == kb_id),
+            ("documents", Document, Document.knowledge_base_id == kb_id),
+        ]
+        for kind, model, condition in steps:
+            progress.stage(kind)
+            for n in delete_rows(db, model, condition, batch_size):
+                progress.count(kind, n)
+
+        # 2. Vector collection
+        progress.stage("vectors")
+        try:
+            vector_store = VectorStoreFactory.create(
+                store_type=settings.VECTOR_STORE_TYPE,
+                collection_name=f"kb_{kb_id}",
+                embedding_function=EmbeddingsFactory.create(),
+            )
+            vector_store._store.delete_collection(f"kb_{kb_id}")
+        except Exception as e:
+            progress.error(f"Failed to clean up vector store: {str(e)}")
+
+        # 3. Objects stored under the knowledge base, then blobs nothing else references
+        progress.stage("files")
+        try:
+            for n in remove_prefix(minio_client, f"kb_{kb_id}/", batch_size):
+                progress.count("files", n)
+        except Exception as e:
+            progress.error(f"Failed to clean up MinIO files: {str(e)}")
+        for file_hash in file_hashes:
+            if release_blob(db, minio_client, file_hash):
+                progress.count("blobs", 1)
+
+        # 4. The knowledge base itself, with its chat links
+        db.delete(kb)
+        db.commit()
+        logger.info(f"Deleted knowledge base {kb_id}: {progress.progress['deleted']}")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to delete knowledge base {kb_id}: {str(e)}")
+        if progress is not None:
+            # Lets the DELETE endpoint queue the job again
+            try:
+                progress.error(str(e))
+                progress.stage(FAILED_STAGE)
+            except Exception:
+                db.rollback()
+    finally:
+        if should_close_db:
+            db.close()
+
+
+def resume_deletions() -> None:
+    """Finish deletions interrupted by a restart"""
+    db = SessionLocal()
+    try:
+        kb_ids = [kb_id for (kb_id,) in db.query(KnowledgeBase.id).filter(KnowledgeBase.status == DELETING)]
+    finally:
+        db.close()
+    for kb_id in kb_ids:
+        delete_knowledge_base_contents(kb_id)
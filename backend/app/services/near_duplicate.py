@@ -0,0 +1,167 @@
+import hashlib
+import logging
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document as LangchainDocument
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.knowledge import DocumentChunk
+
+logger = logging.getLogger(__name__)
+
+NEAR_DUPLICATE_MODES = ("off", "drop", "merge")
+# Chunk metadata keys set by the filter: the signature is moved into
+# DocumentChunk.simhash when the row is written, the flag marks merged
+# duplicates that are stored but not embedded
+SIGNATURE_KEY = "simhash"
+NEAR_DUPLICATE_KEY = "near_duplicate"
+
+_TOKEN_RE = re.compile(r"\w+")
+SHINGLE_SIZE = 3
+
+
+def simhash(text: str) -> Optional[int]:
+    """64-bit SimHash over word shingles, None for text without words"""
+    tokens = _TOKEN_RE.findall(text.lower())
+    if not tokens:
+        return None
+    if len(tokens) > SHINGLE_SIZE:
+        features = [" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)]
+    else:
+        features = [" ".join(tokens)]
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(f.encode(), digest_size=8).digest(), "little") for f in features),
+        dtype="<u8",
+        count=len(features),
+    )
+    # Each bit of the signature is the majority vote of that bit across features
+    bits = np.unpackbits(hashes.view(np.uint8), bitorder="little").reshape(-1, 64)
+    majority = bits.sum(axis=0) * 2 > len(features)
+    return int(np.packbits(majority, bitorder="little").view("<u8")[0])
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def format_signature(signature: int) -> str:
+    return format(signature, "016x")
+
+
+def is_near_duplicate(metadata: Dict) -> bool:
+    return bool(metadata.get(NEAR_DUPLICATE_KEY))
+
+
+class SimHashIndex:
+    """
+    LSH index answering "is any signature within max_distance bits?".
+
+    Signatures are split into max_distance + 1 bands. Two signatures that
+    differ in at most max_distance bits agree exactly on at least one band,
+    so only signatures sharing a band bucket are compared.
+    """
+
+    def __init__(self, max_distance: int = 3):
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        width, extra = divmod(64, bands)
+        self._bands = []
+        shift = 0
+        for band in range(bands):
+            bits = width + (1 if band < extra else 0)
+            self._bands.append((shift, (1 << bits) - 1))
+            shift += bits
+        self._buckets: List[Dict[int, List[int]]] = [defaultdict(list) for _ in self._bands]
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, signature: int) -> None:
+        for (shift, mask), buckets in zip(self._bands, self._buckets):
+            buckets[(signature >> shift) & mask].append(signature)
+        self._size += 1
+
+    def find(self, signature: int) -> Optional[int]:
+        """A stored signature within max_distance bits, if any"""
+        for (shift, mask), buckets in zip(self._bands, self._buckets):
+            for candidate in buckets.get((signature >> shift) & mask, ()):
+                if hamming_distance(signature, candidate) <= self.max_distance:
+                    return candidate
+        return None
+
+
+class NearDuplicateFilter:
+    """
+    Removes chunks that nearly repeat a chunk already in the knowledge base.
+
+    The index starts from the signatures stored for the knowledge base and
+    grows with every chunk that passes, so repeats within the document are
+    caught too. In "drop" mode near-duplicates are discarded; in "merge"
+    mode they are kept flagged with NEAR_DUPLICATE_KEY so they are stored
+    but not embedded.
+
+    Merged duplicates keep no link to the chunk they matched, so retrieval
+    only finds their content while that chunk exists. Deleting or
+    re-ingesting the matched document does not embed them again; their
+    text stays in the database but is no longer retrieved.
+    """
+
+    def __init__(self, index: SimHashIndex, mode: str):
+        self.index = index
+        self.mode = mode
+        self.duplicates = 0
+
+    @classmethod
+    def load(
+        cls, db: Session, kb_id: int, exclude_document_id: Optional[int], mode: str, max_distance: int
+    ) -> "NearDuplicateFilter":
+        index = SimHashIndex(max_distance)
+        query = select(DocumentChunk.simhash).where(
+            DocumentChunk.kb_id == kb_id, DocumentChunk.simhash.isnot(None)
+        )
+        if exclude_document_id is not None:
+            # The document's own previous chunks are about to be replaced
+            query = query.where(DocumentChunk.document_id != exclude_document_id)
+        for signature in db.execute(query.execution_options(yield_per=10000)).scalars():
+            index.add(int(signature, 16))
+        return cls(index, mode)
+
+    def filter(self, chunks: Iterable[LangchainDocument]) -> Iterator[LangchainDocument]:
+        for chunk in chunks:
+            chunk.metadata.pop(NEAR_DUPLICATE_KEY, None)
+            signature = simhash(chunk.page_content)
+            if signature is None:
+                yield chunk
+                continue
+            if self.index.find(signature) is not None:
+                self.duplicates += 1
+                if self.mode == "drop":
+                    continue
+                chunk.metadata[NEAR_DUPLICATE_KEY] = True
+                yield chunk
+                continue
+            self.index.add(signature)
+            chunk.metadata[SIGNATURE_KEY] = format_signature(signature)
+            yield chunk
+
+
+def create_near_duplicate_filter(
+    db: Session, kb_id: int, exclude_document_id: Optional[int] = None
+) -> Optional[NearDuplicateFilter]:
+    """Filter configured by NEAR_DUPLICATE_MODE, None when detection is off"""
+    mode = settings.NEAR_DUPLICATE_MODE.lower()
+    if mode not in NEAR_DUPLICATE_MODES:
+        raise ValueError(f"Unsupported near-duplicate mode: {mode}")
+    if mode == "off":
+        return None
+    near_duplicates = NearDuplicateFilter.load(
+        db, kb_id, exclude_document_id, mode, settings.NEAR_DUPLICATE_MAX_DISTANCE
+    )
+    logger.info(f"Loaded {len(near_duplicates.index)} chunk signatures of knowledge base {kb_id}")
+    return near_duplicates
@@ -0,0 +1,109 @@
+import gzip
+import json
+import logging
+import os
+from typing import Iterable, Iterator, List, Optional
+
+from langchain_core.documents import Document as LangchainDocument
+from minio import Minio
+from minio.error import S3Error
+
+from app.core.config import settings
+from app.core.tempfiles import make_temp_file
+from app.services.document_parser import LOADER_VERSION
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_PREFIX = "artifacts/"
+
+
+def artifact_prefix(file_hash: str) -> str:
+    return f"{ARTIFACT_PREFIX}{file_hash[:2]}/{file_hash}/"
+
+
+def artifact_object_name(file_hash: str, ext: str) -> str:
+    """
+    Parsed text of a file: one gzip-compressed JSON line per page.
+
+    The extension is part of the key because it selects the loader.
+    """
+    ext = ext.lstrip(".") or "txt"
+    return f"{artifact_prefix(file_hash)}{ext}-v{LOADER_VERSION}.jsonl.gz"
+
+
+def iter_cached_pages(client: Minio, file_hash: str, ext: str) -> Optional[Iterator[LangchainDocument]]:
+    """
+    Stream the cached pages of a file, or return None when there is no artifact.
+
+    Pages are decompressed as they are read, so memory stays bounded by a
+    single page.
+    """
+    if not settings.PARSED_TEXT_CACHE_ENABLED or not file_hash:
+        return None
+    try:
+        response = client.get_object(settings.MINIO_BUCKET_NAME, artifact_object_name(file_hash, ext))
+    except S3Error as e:
+        if e.code in ("NoSuchKey", "NoSuchObject"):
+            return None
+        raise
+
+    def pages() -> Iterator[LangchainDocument]:
+        try:
+            with gzip.open(response, "rt", encoding="utf-8") as lines:
+                for line in lines:
+                    page = json.loads(line)
+                    yield LangchainDocument(page_content=page["content"], metadata=page["metadata"])
+        finally:
+            response.close()
+            response.release_conn()
+
+    return pages()
+
+
+def load_cached_pages(client: Minio, file_hash: str, ext: str) -> Optional[List[LangchainDocument]]:
+    pages = iter_cached_pages(client, file_hash, ext)
+    return list(pages) if pages is not None else None
+
+
+def cache_pages(
+    client: Minio, file_hash: str, ext: str, pages: Iterable[LangchainDocument]
+) -> Iterator[LangchainDocument]:
+    """
+    Pass pages through while writing them to a local artifact file.
+
+    The artifact is uploaded once the last page has been consumed; if the
+    consumer stops early nothing is stored. Failing to store the artifact
+    never fails the caller.
+    """
+    if not settings.PARSED_TEXT_CACHE_ENABLED or not file_hash:
+        yield from pages
+        return
+    path = make_temp_file(suffix=".jsonl.gz")
+    try:
+        with gzip.open(path, "wt", encoding="utf-8") as out:
+            for page in pages:
+                out.write(json.dumps({"content": page.page_content, "metadata": page.metadata}, default=str))
+                out.write("\n")
+                yield page
+        try:
+            client.fput_object(
+                settings.MINIO_BUCKET_NAME,
+                artifact_object_name(file_hash, ext),
+                path,
+                content_type="application/gzip",
+            )
+        except Exception as e:
+            logger.warning(f"Failed to store parsed text of {file_hash}: {str(e)}")
+    finally:
+        os.unlink(path)
+
+
+def store_pages(client: Minio, file_hash: str, ext: str, pages: Iterable[LangchainDocument]) -> None:
+    for _ in cache_pages(client, file_hash, ext, pages):
+        pass
+
+
+def remove_artifacts(client: Minio, file_hash: str) -> None:
+    """Delete the cached parsed text of every extension and loader version"""
+    for obj in client.list_objects(settings.MINIO_BUCKET_NAME, prefix=artifact_prefix(file_hash), recursive=True):
+        client.remove_object(settings.MINIO_BUCKET_NAME, obj.object_name)
@@ -0,0 +1,184 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional
+
+from minio import Minio
+from sqlalchemy import delete, func, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.minio import abort_multipart_upload, get_minio_client, remove_objects_batched
+from app.core.tempfiles import sweep_temp_files
+from app.db.session import SessionLocal
+from app.models.knowledge import DocumentUpload, ProcessingTask
+from app.services.blob_store import is_blob_path, release_blob
+from app.services.resumable_upload import STAGING_PREFIX, UPLOADING
+
+logger = logging.getLogger(__name__)
+
+# Tasks that still read their upload
+ACTIVE_TASK_STATUSES = ("pending", "processing")
+
+
+def _expired_upload_pages(db: Session, expire_before: datetime, batch_size: int) -> Iterator[List[DocumentUpload]]:
+    """
+    Uploads without activity since expire_before, in pages ordered by id,
+    resuming after the last id seen. A resumable upload that still receives
+    parts or is being verified stays, however long ago it was started.
+    """
+    last_id = 0
+    while True:
+        page = (
+            db.query(DocumentUpload)
+            .filter(
+                func.coalesce(DocumentUpload.updated_at, DocumentUpload.created_at) < expire_before,
+                DocumentUpload.id > last_id,
+            )
+            .order_by(DocumentUpload.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not page:
+            return
+        last_id = page[-1].id
+        yield page
+
+
+def reap_expired_uploads(db: Session, client: Minio, expire_before: datetime, batch_size: int) -> int:
+    """
+    Delete uploads last active before expire_before, one committed page at a time.
+
+    Uploads a pending or running task still reads are kept. Staging objects
+    are removed in batches; shared blobs are only released, so a blob is
+    deleted only once nothing references it. Returns the number of uploads
+    deleted.
+    """
+    deleted = 0
+    for page in _expired_upload_pages(db, expire_before, batch_size):
+        page_ids = [upload.id for upload in page]
+        in_use = {
+            upload_id for (upload_id,) in db.query(ProcessingTask.document_upload_id).filter(
+                ProcessingTask.document_upload_id.in_(page_ids),
+                ProcessingTask.status.in_(ACTIVE_TASK_STATUSES)
+            )
+        }
+        uploads = [upload for upload in page if upload.id not in in_use]
+        if not uploads:
+            continue
+
+        staging_paths = []
+        released_hashes = set()
+        for upload in uploads:
+            if is_blob_path(upload.temp_path):
+                released_hashes.add(upload.file_hash)
+            elif upload.status == UPLOADING and upload.multipart_upload_id:
+                # Abandoned resumable upload: drop the parts stored so far
+                try:
+                    abort_multipart_upload(client, upload.temp_path, upload.multipart_upload_id)
+                except Exception as e:
+                    logger.error(f"Failed to abort multipart upload {upload.temp_path}: {str(e)}")
+            else:
+                staging_paths.append(upload.temp_path)
+        for _ in remove_objects_batched(client, staging_paths, batch_size):
+            pass
+
+        ids = [upload.id for upload in uploads]
+        db.execute(
+            update(ProcessingTask)
+            .where(ProcessingTask.document_upload_id.in_(ids))
+            .values(document_upload_id=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.execute(delete(DocumentUpload).where(DocumentUpload.id.in_(ids)))
+        db.commit()
+        deleted += len(ids)
+
+        for file_hash in released_hashes:
+            release_blob(db, client, file_hash)
+    return deleted
+
+
+def _staging_prefixes(client: Minio) -> Iterator[str]:
+    """Prefixes holding upload staging objects: resumable uploads and legacy kb_*/temp/ files"""
+    yield STAGING_PREFIX
+    for obj in client.list_objects(settings.MINIO_BUCKET_NAME, prefix="kb_"):
+        if obj.is_dir:
+            yield f"{obj.object_name}temp/"
+
+
+def reap_orphaned_objects(db: Session, client: Minio, expire_before: datetime, batch_size: int) -> int:
+    """
+    Delete expired staging objects no upload row points at.
+
+    These are left behind when a process dies between writing the object
+    and committing or deleting its row. Returns the number of objects removed.
+    """
+    expire_before = expire_before.replace(tzinfo=timezone.utc)
+
+    def orphans() -> Iterator[str]:
+        for prefix in _staging_prefixes(client):
+            objects = client.list_objects(settings.MINIO_BUCKET_NAME, prefix=prefix, recursive=True)
+            batch = []
+            for obj in objects:
+                if obj.last_modified and obj.last_modified < expire_before:
+                    batch.append(obj.object_name)
+                if len(batch) >= batch_size:
+                    yield from _unreferenced(db, batch)
+                    batch = []
+            yield from _unreferenced(db, batch)
+
+    return sum(remove_objects_batched(client, orphans(), batch_size))
+
+
+def _unreferenced(db: Session, object_names: List[str]) -> List[str]:
+    if not object_names:
+        return []
+    referenced = {
+        temp_path for (temp_path,) in
+        db.query(DocumentUpload.temp_path).filter(DocumentUpload.temp_path.in_(object_names))
+    }
+    return [name for name in object_names if name not in referenced]
+
+
+def reap(db: Optional[Session] = None, client: Optional[Minio] = None) -> Dict[str, int]:
+    """Run every reaper pass once; a failing pass does not stop the others"""
+    should_close_db = db is None
+    db = db or SessionLocal()
+    client = client or get_minio_client()
+    expire_before = datetime.utcnow() - timedelta(hours=settings.UPLOAD_EXPIRE_HOURS)
+    batch_size = settings.REAPER_BATCH_SIZE
+    result = {"uploads": 0, "objects": 0, "temp_files": 0}
+    try:
+        try:
+            result["uploads"] = reap_expired_uploads(db, client, expire_before, batch_size)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to reap expired uploads: {str(e)}")
+        try:
+            result["objects"] = reap_orphaned_objects(db, client, expire_before, batch_size)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to reap orphaned objects: {str(e)}")
+        result["temp_files"] = sweep_temp_files(settings.REAPER_TEMP_FILE_MAX_AGE_HOURS * 3600)
+    finally:
+        if should_close_db:
+            db.close()
+    if any(result.values()):
+        logger.info(f"Reaper removed {result}")
+    return result
+
+
+async def run_reaper_loop(stop: asyncio.Event) -> None:
+    """Reap every REAPER_INTERVAL_SECONDS until `stop` is set"""
+    if settings.REAPER_INTERVAL_SECONDS <= 0:
+        return
+    while not stop.is_set():
+        try:
+            await asyncio.to_thread(reap)
+        except Exception as e:
+            logger.error(f"Reaper failed: {str(e)}")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=settings.REAPER_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,207 @@
+import logging
+import math
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from minio import Minio
+from minio.commonconfig import CopySource
+from minio.datatypes import Part
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.minio import (
+    HashingReader,
+    abort_multipart_upload,
+    complete_multipart_upload,
+    create_multipart_upload,
+    get_minio_client,
+    list_uploaded_parts,
+)
+from app.db.session import SessionLocal
+from app.models.knowledge import Document, DocumentUpload
+from app.services.blob_store import blob_exists, blob_object_name, lock_blob
+
+logger = logging.getLogger(__name__)
+
+STAGING_PREFIX = "uploads/"
+# S3 limits: at most 10000 parts, each at least 5 MiB except the last
+MAX_PARTS = 10000
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+# DocumentUpload.status of a resumable upload: "uploading" while parts come
+# in, "verifying" while the assembled file is hashed, then "pending" (ready
+# to process), "exists" (identical document already in the knowledge base)
+# or "failed"
+UPLOADING, VERIFYING = "uploading", "verifying"
+
+
+class UploadError(ValueError):
+    """A request that does not fit the state of the resumable upload"""
+
+
+def plan_parts(file_size: int) -> Tuple[int, int]:
+    """Part size and number of parts for a file of this size"""
+    part_size = max(settings.RESUMABLE_UPLOAD_PART_SIZE, MIN_PART_SIZE, math.ceil(file_size / MAX_PARTS))
+    return part_size, max(1, math.ceil(file_size / part_size))
+
+
+def expected_part_size(upload: DocumentUpload, part_number: int) -> int:
+    if part_number < upload.total_parts:
+        return upload.part_size
+    return upload.file_size - upload.part_size * (upload.total_parts - 1)
+
+
+def start_upload(
+    db: Session, client: Minio, kb_id: int, file_name: str, file_size: int, content_type: str
+) -> DocumentUpload:
+    """
+    Open a multipart upload into a staging object.
+
+    The content hash is only known once every part has arrived, so parts
+    cannot go to the content-addressed blob directly.
+    """
+    part_size, total_parts = plan_parts(file_size)
+    staging_path = f"{STAGING_PREFIX}{uuid.uuid4().hex}"
+    multipart_upload_id = create_multipart_upload(client, staging_path, content_type)
+    upload = DocumentUpload(
+        knowledge_base_id=kb_id,
+        file_name=file_name,
+        file_hash="",
+        file_size=file_size,
+        content_type=content_type,
+        temp_path=staging_path,
+        status=UPLOADING,
+        multipart_upload_id=multipart_upload_id,
+        part_size=part_size,
+        total_parts=total_parts,
+        updated_at=datetime.utcnow(),
+    )
+    db.add(upload)
+    db.commit()
+    db.refresh(upload)
+    return upload
+
+
+def check_part(upload: DocumentUpload, part_number: int, size: int) -> None:
+    if upload.status != UPLOADING:
+        raise UploadError(f"Upload is {upload.status}, parts can no longer be added")
+    if not 1 <= part_number <= upload.total_parts:
+        raise UploadError(f"Part number must be between 1 and {upload.total_parts}")
+    expected = expected_part_size(upload, part_number)
+    if size != expected:
+        raise UploadError(f"Part {part_number} must be {expected} bytes, got {size}")
+
+
+def touch_upload(db: Session, upload: DocumentUpload) -> None:
+    """Record activity on an upload, which keeps the reaper away from it"""
+    upload.updated_at = datetime.utcnow()
+    db.commit()
+
+
+def upload_status(client: Minio, upload: DocumentUpload) -> Dict:
+    """Upload state in the shape of the regular upload results, plus part progress"""
+    result = {
+        "upload_id": upload.id,
+        "file_name": upload.file_name,
+        "status": upload.status,
+        "error_message": upload.error_message,
+        "file_size": upload.file_size,
+        "part_size": upload.part_size,
+        "total_parts": upload.total_parts,
+        "skip_processing": upload.status != "pending",
+    }
+    if upload.status == UPLOADING:
+        parts = list_uploaded_parts(client, upload.temp_path, upload.multipart_upload_id)
+        uploaded = {part.part_number for part in parts}
+        result["uploaded_parts"] = sorted(uploaded)
+        result["missing_parts"] = [n for n in range(1, upload.total_parts + 1) if n not in uploaded]
+        result["bytes_uploaded"] = sum(part.size for part in parts)
+    else:
+        result["temp_path"] = upload.temp_path
+    return result
+
+
+def complete_upload(db: Session, client: Minio, upload: DocumentUpload) -> None:
+    """Assemble the parts once all of them are stored; verification follows in finalize_upload"""
+    if upload.status == VERIFYING:
+        return
+    if upload.status != UPLOADING:
+        raise UploadError(f"Upload is {upload.status}")
+    parts: List[Part] = list_uploaded_parts(client, upload.temp_path, upload.multipart_upload_id)
+    uploaded = {part.part_number for part in parts}
+    missing = [n for n in range(1, upload.total_parts + 1) if n not in uploaded]
+    if missing:
+        raise UploadError(f"Missing parts: {missing[:20]}")
+    complete_multipart_upload(client, upload.temp_path, upload.multipart_upload_id, parts)
+    upload.status = VERIFYING
+    touch_upload(db, upload)
+
+
+def abort_upload(db: Session, client: Minio, upload: DocumentUpload) -> None:
+    """Discard an unfinished upload and its stored parts"""
+    if upload.status == UPLOADING:
+        abort_multipart_upload(client, upload.temp_path, upload.multipart_upload_id)
+    elif upload.temp_path.startswith(STAGING_PREFIX):
+        client.remove_object(settings.MINIO_BUCKET_NAME, upload.temp_path)
+    db.delete(upload)
+    db.commit()
+
+
+def finalize_upload(upload_id: int, db: Optional[Session] = None) -> None:
+    """
+    Hash the assembled file and move it into its content-addressed blob.
+
+    The hash is computed here from the stored bytes, never taken from the
+    client, so an upload can only be matched with content it really holds.
+    Runs in the background after complete_upload; re-running it after an
+    interruption is safe.
+    """
+    should_close_db = db is None
+    db = db or SessionLocal()
+    client = get_minio_client()
+    upload = db.query(DocumentUpload).get(upload_id)
+    try:
+        if not upload or upload.status != VERIFYING:
+            return
+        staging_path = upload.temp_path
+        response = client.get_object(settings.MINIO_BUCKET_NAME, staging_path)
+        try:
+            reader = HashingReader(response)
+            while reader.read(1024 * 1024):
+                pass
+        finally:
+            response.close()
+            response.release_conn()
+        if reader.size != upload.file_size:
+            raise UploadError(f"Assembled file has {reader.size} bytes, expected {upload.file_size}")
+
+        file_hash = reader.hexdigest()
+        # Held until the upload referencing the blob is committed
+        lock_blob(db, file_hash)
+        if not blob_exists(client, file_hash):
+            client.copy_object(
+                settings.MINIO_BUCKET_NAME, blob_object_name(file_hash), CopySource(settings.MINIO_BUCKET_NAME, staging_path)
+            )
+        existing_document = db.query(Document).filter(
+            Document.file_name == upload.file_name,
+            Document.file_hash == file_hash,
+            Document.knowledge_base_id == upload.knowledge_base_id
+        ).first()
+        upload.file_hash = file_hash
+        upload.temp_path = blob_object_name(file_hash)
+        upload.status = "exists" if existing_document else "pending"
+        db.commit()
+        # Only drop the staging copy once the upload points at the blob
+        client.remove_object(settings.MINIO_BUCKET_NAME, staging_path)
+        logger.info(f"Upload {upload_id}: verified {reader.size} bytes as {file_hash}")
+    except Exception as e:
+        logger.error(f"Upload {upload_id}: verification failed: {str(e)}")
+        db.rollback()
+        if upload:
+            upload.status = "failed"
+            upload.error_message = str(e)
+            db.commit()
+    finally:
+        if should_close_db:
+            db.close()
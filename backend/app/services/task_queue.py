@@ -0,0 +1,240 @@
+import logging
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import and_, or_, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.knowledge import ProcessingTask
+
+logger = logging.getLogger(__name__)
+
+# Identifies this process as the lease holder of the tasks it claims
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def backoff_seconds(attempt: int) -> float:
+    """Exponential backoff before retry number `attempt` (1-based)"""
+    delay = settings.INGESTION_RETRY_BACKOFF_SECONDS * (2 ** max(attempt - 1, 0))
+    return min(delay, settings.INGESTION_RETRY_BACKOFF_MAX_SECONDS)
+
+
+def _lease_expired(now: datetime):
+    """
+    Processing tasks nobody holds a live lease on. Tasks left in processing
+    by the old in-process runner never had a lease and count as expired.
+    """
+    return or_(ProcessingTask.lease_expires_at.is_(None), ProcessingTask.lease_expires_at < now)
+
+
+def _claimable(now: datetime):
+    """Tasks that are due and pending, or whose lease has expired"""
+    return and_(
+        ProcessingTask.attempts < settings.INGESTION_MAX_ATTEMPTS,
+        or_(
+            and_(
+                ProcessingTask.status == "pending",
+                or_(
+                    ProcessingTask.next_attempt_at.is_(None),
+                    ProcessingTask.next_attempt_at <= now,
+                ),
+            ),
+            and_(
+                ProcessingTask.status == "processing",
+                _lease_expired(now),
+            ),
+        ),
+    )
+
+
+def claim_task(db: Session, task_id: int, worker_id: str = WORKER_ID) -> bool:
+    """
+    Atomically take the lease on a task.
+
+    The conditional UPDATE is the only synchronization point between workers,
+    so exactly one of several competing workers succeeds.
+    """
+    now = datetime.utcnow()
+    result = db.execute(
+        update(ProcessingTask)
+        .where(ProcessingTask.id == task_id, _claimable(now))
+        .values(
+            status="processing",
+            locked_by=worker_id,
+            heartbeat_at=now,
+            lease_expires_at=now + timedelta(seconds=settings.INGESTION_LEASE_SECONDS),
+            attempts=ProcessingTask.attempts + 1,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def find_claimable_tasks(db: Session, limit: int) -> List[int]:
+    """IDs of tasks a worker may try to claim, oldest first"""
+    if limit <= 0:
+        return []
+    now = datetime.utcnow()
+    rows = (
+        db.query(ProcessingTask.id)
+        .filter(_claimable(now))
+        .order_by(ProcessingTask.id)
+        .limit(limit)
+        .all()
+    )
+    return [row[0] for row in rows]
+
+
+def heartbeat(db: Session, task_id: int, worker_id: str = WORKER_ID) -> bool:
+    """Extend the lease on a task held by this worker"""
+    now = datetime.utcnow()
+    result = db.execute(
+        update(ProcessingTask)
+        .where(
+            ProcessingTask.id == task_id,
+            ProcessingTask.locked_by == worker_id,
+            ProcessingTask.status == "processing",
+        )
+        .values(
+            heartbeat_at=now,
+            lease_expires_at=now + timedelta(seconds=settings.INGESTION_LEASE_SECONDS),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def complete_task(task: ProcessingTask) -> None:
+    """Mark a task completed and release its lease (caller commits)"""
+    task.status = "completed"
+    task.error_message = None
+    task.locked_by = None
+    task.lease_expires_at = None
+    task.next_attempt_at = None
+
+
+def fail_task(task: ProcessingTask, error_message: str, count_attempt: bool = True) -> bool:
+    """
+    Record a failed attempt (caller commits).
+
+    Returns True if the task was rescheduled for another attempt, False if
+    it ran out of attempts and is now permanently failed. A failure that is
+    not the task's fault (count_attempt=False) gives the attempt back and
+    reschedules the task right away.
+    """
+    task.error_message = error_message
+    task.locked_by = None
+    task.lease_expires_at = None
+    if not count_attempt:
+        task.attempts = max(0, task.attempts - 1)
+        task.status = "pending"
+        task.next_attempt_at = datetime.utcnow()
+        return True
+    if task.attempts < settings.INGESTION_MAX_ATTEMPTS:
+        task.status = "pending"
+        task.next_attempt_at = datetime.utcnow() + timedelta(seconds=backoff_seconds(task.attempts))
+        return True
+    task.status = "failed"
+    task.next_attempt_at = None
+    return False
+
+
+def cancel_task(task: ProcessingTask, reason: str) -> None:
+    """Stop a task for good, without further attempts (caller commits)"""
+    task.status = "failed"
+    task.error_message = reason
+    task.locked_by = None
+    task.lease_expires_at = None
+    task.next_attempt_at = None
+
+
+def has_leased_tasks(db: Session, knowledge_base_id: int) -> bool:
+    """Whether a live worker is still processing a task of the knowledge base"""
+    return db.query(ProcessingTask.id).filter(
+        ProcessingTask.knowledge_base_id == knowledge_base_id,
+        ProcessingTask.status == "processing",
+        ~_lease_expired(datetime.utcnow()),
+    ).first() is not None
+
+
+def fail_exhausted_tasks(db: Session) -> int:
+    """Permanently fail tasks whose lease expired after their last allowed attempt"""
+    now = datetime.utcnow()
+    result = db.execute(
+        update(ProcessingTask)
+        .where(
+            ProcessingTask.status == "processing",
+            _lease_expired(now),
+            ProcessingTask.attempts >= settings.INGESTION_MAX_ATTEMPTS,
+        )
+        .values(
+            status="failed",
+            error_message="Worker lost while processing and no attempts left",
+            locked_by=None,
+            lease_expires_at=None,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+
+class LeaseLost(Exception):
+    """Raised when a worker no longer holds the lease of the task it processes"""
+
+
+class LeaseHeartbeat:
+    """Keeps a task lease alive from a background thread while it is processed"""
+
+    def __init__(self, task_id: int, worker_id: str = WORKER_ID, interval: Optional[float] = None):
+        self.task_id = task_id
+        self.worker_id = worker_id
+        self.interval = interval or settings.INGESTION_HEARTBEAT_SECONDS
+        self._stop = threading.Event()
+        # Set once the lease is taken over or has expired; another worker
+        # may be processing the task from then on
+        self.lost = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            db = SessionLocal()
+            try:
+                if not heartbeat(db, self.task_id, self.worker_id):
+                    logger.warning(f"Task {self.task_id}: lease lost by worker {self.worker_id}")
+                    self.lost.set()
+                    return
+            except Exception as e:
+                logger.warning(f"Task {self.task_id}: heartbeat failed: {str(e)}")
+            finally:
+                db.close()
+
+    def ensure_held(self) -> None:
+        """Raise LeaseLost once the lease could not be renewed"""
+        if self.lost.is_set():
+            raise LeaseLost(f"Task {self.task_id}: lease lost by worker {self.worker_id}")
+
+    def start(self) -> "LeaseHeartbeat":
+        self._thread = threading.Thread(
+            target=self._run, name=f"heartbeat-{self.task_id}", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> "LeaseHeartbeat":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
@@ -0,0 +1,159 @@
+import copy
+import re
+from collections import deque
+from functools import lru_cache
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document as LangchainDocument
+
+from app.core.config import settings
+
+DEFAULT_SEPARATORS = ["\n\n", "\n", " ", ""]
+
+# (start, end, length) of a piece of the text being split
+Span = Tuple[int, int, int]
+
+
+@lru_cache(maxsize=None)
+def token_length_function(encoding_name: str) -> Callable[[str], int]:
+    """Length function counting tiktoken tokens; the encoding is loaded once per process"""
+    import tiktoken
+
+    encoding = tiktoken.get_encoding(encoding_name)
+
+    def length(text: str) -> int:
+        return len(encoding.encode(text, disallowed_special=()))
+
+    return length
+
+
+class TextSplitter:
+    """
+    Drop-in replacement for langchain's RecursiveCharacterTextSplitter.
+
+    Produces the same chunks as RecursiveCharacterTextSplitter with its
+    defaults (separators kept at the start of each piece, whitespace
+    stripped), but works on (start, end) offsets into the original text:
+    pieces are never concatenated, and a chunk is sliced out of the text once
+    it is complete. length_function switches chunk_size and chunk_overlap
+    from characters to another unit such as tokens.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = 4000,
+        chunk_overlap: int = 200,
+        separators: Optional[List[str]] = None,
+        length_function: Optional[Callable[[str], int]] = None,
+    ):
+        if chunk_size <= 0:
+            raise ValueError(f"chunk_size must be > 0, got {chunk_size}")
+        if chunk_overlap < 0:
+            raise ValueError(f"chunk_overlap must be >= 0, got {chunk_overlap}")
+        if chunk_overlap > chunk_size:
+            raise ValueError(
+                f"Got a larger chunk overlap ({chunk_overlap}) than chunk size ({chunk_size}), should be smaller."
+            )
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators or DEFAULT_SEPARATORS
+        self.length_function = length_function
+        self._patterns = {sep: re.compile(re.escape(sep)) for sep in self.separators if sep}
+
+    @classmethod
+    def from_tiktoken_encoding(cls, encoding_name: str, **kwargs) -> "TextSplitter":
+        return cls(length_function=token_length_function(encoding_name), **kwargs)
+
+    def split_text(self, text: str) -> List[str]:
+        chunks: List[str] = []
+        self._split(text, 0, len(text), self.separators, chunks)
+        return chunks
+
+    def create_documents(self, texts: List[str], metadatas: Optional[List[dict]] = None) -> List[LangchainDocument]:
+        metadatas = metadatas or [{}] * len(texts)
+        return [
+            LangchainDocument(page_content=chunk, metadata=copy.deepcopy(metadata))
+            for text, metadata in zip(texts, metadatas)
+            for chunk in self.split_text(text)
+        ]
+
+    def split_documents(self, documents: Iterable[LangchainDocument]) -> List[LangchainDocument]:
+        documents = list(documents)
+        return self.create_documents(
+            [doc.page_content for doc in documents], [doc.metadata for doc in documents]
+        )
+
+    def _pieces(self, text: str, start: int, end: int, separator: str) -> Iterable[Span]:
+        """Split text[start:end] before every separator, skipping empty pieces"""
+        length_function = self.length_function
+        if not separator:
+            if length_function is None:
+                return [(i, i + 1, 1) for i in range(start, end)]
+            return [(i, i + 1, length_function(text[i])) for i in range(start, end)]
+        bounds = [start]
+        bounds.extend(match.start() for match in self._patterns[separator].finditer(text, start, end))
+        bounds.append(end)
+        if length_function is None:
+            return [(a, b, b - a) for a, b in zip(bounds, bounds[1:]) if a < b]
+        return [(a, b, length_function(text[a:b])) for a, b in zip(bounds, bounds[1:]) if a < b]
+
+    def _split(self, text: str, start: int, end: int, separators: List[str], chunks: List[str]) -> None:
+        # Split on the first separator present; pieces that are still too
+        # long are split again with the remaining separators
+        separator = separators[-1]
+        remaining: List[str] = []
+        for i, candidate in enumerate(separators):
+            if candidate == "":
+                separator = candidate
+                break
+            if text.find(candidate, start, end) != -1:
+                separator = candidate
+                remaining = separators[i + 1:]
+                break
+
+        good: List[Span] = []
+        for span in self._pieces(text, start, end, separator):
+            if span[2] < self.chunk_size:
+                good.append(span)
+                continue
+            if good:
+                self._merge(text, good, chunks)
+                good = []
+            if remaining:
+                self._split(text, span[0], span[1], remaining, chunks)
+            else:
+                chunks.append(text[span[0]:span[1]])
+        if good:
+            self._merge(text, good, chunks)
+
+    def _merge(self, text: str, spans: List[Span], chunks: List[str]) -> None:
+        # Pieces keep their separator, so adjacent pieces join without one
+        # and a run of them is a single slice of the text
+        current: deque = deque()
+        total = 0
+        for span in spans:
+            length = span[2]
+            if current and total + length > self.chunk_size:
+                self._emit(text, current, chunks)
+                # Keep the tail of the chunk as overlap for the next one
+                while current and (total > self.chunk_overlap or total + length > self.chunk_size):
+                    total -= current.popleft()[2]
+            current.append(span)
+            total += length
+        if current:
+            self._emit(text, current, chunks)
+
+    @staticmethod
+    def _emit(text: str, current: deque, chunks: List[str]) -> None:
+        chunk = text[current[0][0]:current[-1][1]].strip()
+        if chunk:
+            chunks.append(chunk)
+
+
+def create_text_splitter(chunk_size: int, chunk_overlap: int) -> TextSplitter:
+    """Splitter measuring chunks in characters, or in tokens when CHUNK_TOKEN_ENCODING is set"""
+    if settings.CHUNK_TOKEN_ENCODING:
+        return TextSplitter.from_tiktoken_encoding(
+            settings.CHUNK_TOKEN_ENCODING, chunk_size=chunk_size, chunk_overlap=chunk_overlap
+        )
+    return TextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
@@ -12,8 +12,13 @@ class BaseVectorStore(ABC):
         pass
     
     @abstractmethod
-    def add_documents(self, documents: List[Document]) -> None:
-        """Add documents to the vector store"""
+    def add_documents(self, documents: List[Document], ids: Optional[List[str]] = None) -> None:
+        """Add documents to the vector store, replacing any stored under the same IDs"""
+        pass
+    
+    @abstractmethod
+    def add_embeddings(self, documents: List[Document], embeddings: List[List[float]], ids: List[str]) -> None:
+        """Add documents with precomputed embeddings, replacing any stored under the same IDs"""
         pass
     
     @abstractmethod
@@ -21,6 +26,11 @@ class BaseVectorStore(ABC):
         """Delete documents from the vector store"""
         pass
     
+    @abstractmethod
+    def delete_document(self, document_id: int) -> None:
+        """Delete every chunk of a knowledge base document"""
+        pass
+    
     @abstractmethod
     def as_retriever(self, **kwargs: Any):
         """Return a retriever interface for the vector store"""
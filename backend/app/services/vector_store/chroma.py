@@ -1,4 +1,4 @@
-from typing import List, Any
+from typing import List, Any, Optional
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 from langchain_chroma import Chroma
@@ -22,14 +22,27 @@ class ChromaVectorStore(BaseVectorStore):
             collection_name=collection_name,
             embedding_function=embedding_function,
         )
-    def add_documents(self, documents: List[Document]) -> None:
+    def add_documents(self, documents: List[Document], ids: Optional[List[str]] = None) -> None:
         """Add documents to Chroma"""
-        self._store.add_documents(documents)
+        self._store.add_documents(documents, ids=ids)
+    
+    def add_embeddings(self, documents: List[Document], embeddings: List[List[float]], ids: List[str]) -> None:
+        """Add documents with precomputed embeddings to Chroma"""
+        self._store._collection.upsert(
+            ids=ids,
+            embeddings=embeddings,
+            metadatas=[doc.metadata for doc in documents],
+            documents=[doc.page_content for doc in documents],
+        )
     
     def delete(self, ids: List[str]) -> None:
         """Delete documents from Chroma"""
         self._store.delete(ids)
     
+    def delete_document(self, document_id: int) -> None:
+        """Delete every chunk of a document from Chroma"""
+        self._store.delete(where={"document_id": document_id})
+    
     def as_retriever(self, **kwargs: Any):
         """Return a retriever interface"""
         return self._store.as_retriever(**kwargs)
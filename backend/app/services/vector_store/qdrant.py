@@ -1,11 +1,18 @@
-from typing import List, Any
+import uuid
+from typing import List, Any, Optional
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 from langchain_community.vectorstores import Qdrant
+from qdrant_client.http import models as rest
 from app.core.config import settings
 
 from .base import BaseVectorStore
 
+def _point_id(chunk_id: str) -> str:
+    """Qdrant only accepts UUIDs and integers as point IDs"""
+    return str(uuid.uuid5(uuid.NAMESPACE_OID, chunk_id))
+
+
 class QdrantStore(BaseVectorStore):
     """Qdrant vector store implementation"""
     
@@ -18,13 +25,53 @@ class QdrantStore(BaseVectorStore):
             prefer_grpc=settings.QDRANT_PREFER_GRPC
         )
     
-    def add_documents(self, documents: List[Document]) -> None:
+    def add_documents(self, documents: List[Document], ids: Optional[List[str]] = None) -> None:
         """Add documents to Qdrant"""
-        self._store.add_documents(documents)
+        # Embed the whole list in one embed_documents call instead of
+        # langchain's fixed 64-document batches, so the embeddings client
+        # controls batching
+        self._store.add_documents(
+            documents,
+            ids=[_point_id(chunk_id) for chunk_id in ids] if ids else None,
+            batch_size=max(len(documents), 1),
+        )
+    
+    def add_embeddings(self, documents: List[Document], embeddings: List[List[float]], ids: List[str]) -> None:
+        """Add documents with precomputed embeddings to Qdrant"""
+        vector_name = self._store.vector_name
+        payloads = Qdrant._build_payloads(
+            [doc.page_content for doc in documents],
+            [doc.metadata for doc in documents],
+            self._store.content_payload_key,
+            self._store.metadata_payload_key,
+        )
+        self._store.client.upsert(
+            collection_name=self._store.collection_name,
+            points=[
+                rest.PointStruct(
+                    id=_point_id(chunk_id),
+                    vector=vector if vector_name is None else {vector_name: vector},
+                    payload=payload,
+                )
+                for chunk_id, vector, payload in zip(ids, embeddings, payloads)
+            ],
+        )
     
     def delete(self, ids: List[str]) -> None:
         """Delete documents from Qdrant"""
-        self._store.delete(ids)
+        self._store.delete([_point_id(chunk_id) for chunk_id in ids])
+    
+    def delete_document(self, document_id: int) -> None:
+        """Delete every chunk of a document from Qdrant"""
+        self._store.client.delete(
+            collection_name=self._store.collection_name,
+            points_selector=rest.Filter(must=[
+                rest.FieldCondition(
+                    key=f"{self._store.metadata_payload_key}.document_id",
+                    match=rest.MatchValue(value=document_id),
+                )
+            ]),
+        )
     
     def as_retriever(self, **kwargs: Any):
         """Return a retriever interface"""
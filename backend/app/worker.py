@@ -0,0 +1,108 @@
+"""
+Standalone ingestion worker.
+
+Polls the processing_tasks table for pending tasks (and tasks whose lease
+expired because their worker died) and processes them on the local
+ingestion scheduler. Run any number of these next to the API:
+
+    python -m app.worker
+"""
+import asyncio
+import logging
+import signal
+
+from sqlalchemy.orm import selectinload
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.knowledge import ProcessingTask
+from app.services.document_parser import shutdown_parser_pool
+from app.services.document_processor import process_document_background
+from app.services.ingestion_scheduler import IngestionScheduler, ingestion_scheduler
+from app.services.reaper import run_reaper_loop
+from app.services.task_queue import WORKER_ID, fail_exhausted_tasks, find_claimable_tasks
+
+logger = logging.getLogger(__name__)
+
+
+async def dispatch_claimable_tasks(scheduler: IngestionScheduler) -> int:
+    """
+    Submit claimable tasks to the scheduler, up to its free capacity.
+
+    The task is only claimed once a scheduler thread picks it up, so a task
+    fetched here by several workers is still processed exactly once.
+    """
+    capacity = scheduler.max_concurrency - scheduler.running - scheduler.queue_depth
+    if capacity <= 0:
+        return 0
+
+    db = SessionLocal()
+    try:
+        fail_exhausted_tasks(db)
+        task_ids = find_claimable_tasks(db, capacity)
+        if not task_ids:
+            return 0
+        tasks = (
+            db.query(ProcessingTask)
+            .options(selectinload(ProcessingTask.document_upload))
+            .filter(ProcessingTask.id.in_(task_ids))
+            .all()
+        )
+        submitted = 0
+        for task in tasks:
+            upload = task.document_upload
+            if not upload:
+                logger.warning(f"Task {task.id}: No upload record, skipping")
+                continue
+            await scheduler.submit(
+                task.id,
+                process_document_background,
+                upload.temp_path,
+                upload.file_name,
+                task.knowledge_base_id,
+                task.id,
+                None
+            )
+            submitted += 1
+        return submitted
+    finally:
+        db.close()
+
+
+async def run_dispatch_loop(scheduler: IngestionScheduler, stop: asyncio.Event) -> None:
+    """Poll for claimable tasks until `stop` is set"""
+    logger.info(f"Ingestion worker {WORKER_ID} polling every {settings.INGESTION_POLL_SECONDS}s")
+    while not stop.is_set():
+        try:
+            submitted = await dispatch_claimable_tasks(scheduler)
+            if submitted:
+                logger.info(f"Dispatched {submitted} ingestion tasks")
+        except Exception as e:
+            logger.error(f"Failed to dispatch ingestion tasks: {str(e)}")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=settings.INGESTION_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def main() -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    # Temp files are local, so every worker host sweeps its own
+    reaper = asyncio.create_task(run_reaper_loop(stop))
+    await run_dispatch_loop(ingestion_scheduler, stop)
+    await reaper
+    logger.info("Shutting down, waiting for running tasks to finish")
+    await ingestion_scheduler.shutdown()
+    shutdown_parser_pool()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+"""
+Compare TextSplitter with langchain's RecursiveCharacterTextSplitter in MB/s
+and chunks/s on synthetic documents.
+
+    python -m benchmarks.bench_text_splitter                       # 16 MB, prose and markdown
+    python -m benchmarks.bench_text_splitter --mb 64 --chunk-size 1000 --chunk-overlap 200
+
+Both splitters run on the same text and must return the same chunks.
+"""
+import argparse
+import random
+import time
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from app.services.text_splitter import TextSplitter
+
+WORDS = (
+    "the of and to in is that for it as with was on be by this are from or at an which "
+    "retrieval embedding vector document chunk knowledge index query answer context model"
+).split()
+
+
+def make_prose(size: int, rng: random.Random) -> str:
+    """Paragraphs of sentences, separated by blank lines"""
+    parts, length = [], 0
+    while length < size:
+        sentences = [
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 25))).capitalize() + "."
+            for _ in range(rng.randint(1, 8))
+        ]
+        paragraph = " ".join(sentences)
+        parts.append(paragraph)
+        length += len(paragraph) + 2
+    return "\n\n".join(parts)
+
+
+def make_markdown(size: int, rng: random.Random) -> str:
+    """Headings, short lines, lists and occasional long unbroken tokens"""
+    lines, length = [], 0
+    while length < size:
+        kind = rng.random()
+        if kind < 0.1:
+            line = "\n## " + " ".join(rng.choice(WORDS) for _ in range(4)) + "\n"
+        elif kind < 0.4:
+            line = "- " + " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 12)))
+        elif kind < 0.42:
+            line = "".join(rng.choice("abcdef0123456789") for _ in range(rng.randint(500, 3000)))
+        else:
+            line = " ".join(rng.choice(WORDS) for _ in range(rng.randint(10, 60)))
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines)
+
+
+DOCUMENTS = {"prose": make_prose, "markdown": make_markdown}
+
+
+def run(splitter, text: str):
+    started = time.perf_counter()
+    chunks = splitter.split_text(text)
+    return chunks, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=float, default=16)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--documents", nargs="+", choices=list(DOCUMENTS), default=list(DOCUMENTS))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    splitters = {
+        "langchain": RecursiveCharacterTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap),
+        "native": TextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap),
+    }
+    for document in args.documents:
+        text = DOCUMENTS[document](int(args.mb * 1024 * 1024), random.Random(args.seed))
+        mb = len(text) / (1024 * 1024)
+        results = {}
+        for name, splitter in splitters.items():
+            chunks, elapsed = run(splitter, text)
+            results[name] = chunks
+            print(
+                f"{document:9s} {name:10s} {mb:7.1f} MB  {len(chunks):8d} chunks  {elapsed:7.2f}s  "
+                f"{mb / elapsed:8.1f} MB/s  {len(chunks) / elapsed:10.0f} chunks/s"
+            )
+        if results["langchain"] != results["native"]:
+            raise SystemExit(f"{document}: splitters returned different chunks")
+
+
+if __name__ == "__main__":
+    main()
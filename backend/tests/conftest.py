@@ -0,0 +1,33 @@
+"""Shared fixtures for the backend tests."""
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.mysql import LONGTEXT
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+
+import app.models  # noqa: F401  registers every model's table on Base.metadata
+from app.models.base import Base
+
+
+@compiles(LONGTEXT, "sqlite")
+def _longtext_as_text(type_, compiler, **kw):
+    return "TEXT"
+
+
+@pytest.fixture
+def db_tables():
+    """
+    Tables the db fixture creates. Override it in a module, or parametrize
+    it, to test against a subset of the schema.
+    """
+    return Base.metadata.sorted_tables
+
+
+@pytest.fixture
+def db(db_tables):
+    """Session on a fresh in-memory SQLite database"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=db_tables)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
@@ -0,0 +1,88 @@
+"""Unit tests for content-addressed blob storage."""
+import hashlib
+import io
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from langchain_core.documents import Document as LangchainDocument
+
+from app.models.knowledge import BlobLock, Document, DocumentUpload, ProcessingTask
+from app.services.blob_store import blob_object_name, blob_refcount, hash_stream, lock_blob, release_blob
+from app.services.chunk_record import find_chunked_document, load_chunks
+from app.services.document_processor import store_chunk_batch
+
+HASH = hashlib.sha256(b"content").hexdigest()
+
+
+def _document(db, kb_id, file_hash=HASH):
+    document = Document(
+        file_name="a.pdf", file_path=blob_object_name(file_hash), file_hash=file_hash,
+        file_size=7, content_type="application/pdf", knowledge_base_id=kb_id,
+    )
+    db.add(document)
+    db.commit()
+    return document
+
+
+class TestBlobStore:
+    """Tests for blob naming, hashing and reference counting."""
+
+    def test_blob_object_name(self):
+        assert blob_object_name(HASH) == f"blobs/{HASH[:2]}/{HASH}"
+
+    def test_hash_stream_rewinds(self):
+        stream = io.BytesIO(b"content")
+        assert hash_stream(stream, chunk_size=3) == (7, HASH)
+        assert stream.read() == b"content"
+
+    def test_blob_is_released_with_its_last_reference(self, db):
+        client = MagicMock()
+        first, second = _document(db, kb_id=1), _document(db, kb_id=2)
+        db.add(DocumentUpload(
+            knowledge_base_id=3, file_name="a.pdf", file_hash=HASH, file_size=7,
+            content_type="application/pdf", temp_path=blob_object_name(HASH),
+            created_at=datetime.utcnow(), status="pending",
+        ))
+        db.commit()
+        assert blob_refcount(db, HASH) == 3
+
+        db.delete(first)
+        db.commit()
+        assert not release_blob(db, client, HASH)
+        db.delete(second)
+        db.query(DocumentUpload).delete()
+        db.commit()
+        assert release_blob(db, client, HASH)
+        client.remove_object.assert_called_once_with("documents", blob_object_name(HASH))
+
+
+    def test_lock_blob_keeps_one_row_per_blob(self, db):
+        lock_blob(db, HASH)
+        db.commit()
+        lock_blob(db, HASH)
+        _document(db, kb_id=1)
+        # release_blob takes the lock too and ends its transaction
+        assert not release_blob(db, MagicMock(), HASH)
+        assert db.query(BlobLock).count() == 1
+
+
+class TestChunkReuse:
+    """Tests for reusing chunks of documents with identical content."""
+
+    def test_chunks_of_identical_content_are_reused(self, db):
+        source = _document(db, kb_id=1)
+        chunks = [LangchainDocument(page_content=f"part {i}", metadata={"page": i}) for i in range(3)]
+        store_chunk_batch(db, chunks, 1, "a.pdf", source.id)
+        target = _document(db, kb_id=2)
+
+        assert find_chunked_document(db, HASH, exclude_document_id=target.id) == source.id
+        reused = load_chunks(db, source.id)
+        assert [c.page_content for c in reused] == ["part 0", "part 1", "part 2"]
+        assert [c.metadata for c in reused] == [{"page": 0}, {"page": 1}, {"page": 2}]
+
+    def test_documents_being_ingested_are_not_reused(self, db):
+        source = _document(db, kb_id=1)
+        store_chunk_batch(db, [LangchainDocument(page_content="part", metadata={})], 1, "a.pdf", source.id)
+        db.add(ProcessingTask(knowledge_base_id=1, document_id=source.id, status="processing"))
+        db.commit()
+        assert find_chunked_document(db, HASH) is None
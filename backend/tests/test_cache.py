@@ -0,0 +1,57 @@
+"""Unit tests for the in-memory LRU cache."""
+from unittest.mock import patch
+
+from app.core.cache import LRUCache
+
+
+class TestLRUCache:
+    """Tests for LRUCache."""
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        assert cache.get("a") == 1
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert len(cache) == 2
+
+    def test_stats(self):
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.get("a")
+        cache.get("missing")
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+        assert cache.stats()["hit_rate"] == 0.5
+
+    def test_zero_size_disables_caching(self):
+        cache = LRUCache(maxsize=0)
+        cache.set("a", 1)
+        assert cache.get("a") is None
+
+    def test_entries_expire_after_ttl(self):
+        cache = LRUCache(maxsize=2, ttl=10)
+        with patch("app.core.cache.time.monotonic", return_value=100.0):
+            cache.set("a", 1)
+        with patch("app.core.cache.time.monotonic", return_value=109.0):
+            assert cache.get("a") == 1
+        with patch("app.core.cache.time.monotonic", return_value=110.0):
+            assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_weigher_bounds_total_weight(self):
+        cache = LRUCache(maxsize=10, weigher=len)
+        cache.set("a", "xxxx")
+        cache.set("b", "xxxx")
+        cache.set("c", "xxxx")
+        assert cache.get("a") is None
+        assert cache.weight == 8
+        cache.set("b", "x")
+        assert cache.weight == 5
+        # Entries larger than the whole cache are not stored
+        cache.set("d", "x" * 11)
+        assert cache.get("d") is None
+        assert cache.get("c") == "xxxx"
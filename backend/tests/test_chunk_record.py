@@ -0,0 +1,42 @@
+"""Unit tests for bulk DocumentChunk writes."""
+from sqlalchemy import event
+
+from app.models.knowledge import DocumentChunk
+from app.services.chunk_record import upsert_chunk_rows
+
+
+def _row(i, content_hash="h"):
+    return {
+        "id": f"chunk-{i}",
+        "kb_id": 1,
+        "document_id": 1,
+        "file_name": "a.txt",
+        "chunk_metadata": {"page_content": f"text {i}"},
+        "hash": content_hash,
+    }
+
+
+class TestUpsertChunkRows:
+    """Tests for upsert_chunk_rows."""
+
+    def test_rows_are_written_in_batches(self, db):
+        """Rows are sent batch_size at a time, one statement per batch."""
+        statements = []
+        event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+        upsert_chunk_rows(db, [_row(i) for i in range(7)], batch_size=3)
+        db.commit()
+        assert len(statements) == 3
+        assert db.query(DocumentChunk).count() == 7
+        chunk = db.get(DocumentChunk, "chunk-6")
+        assert chunk.chunk_metadata == {"page_content": "text 6"}
+        assert chunk.created_at is not None
+
+    def test_existing_rows_are_updated(self, db):
+        """Writing a chunk ID again updates the row instead of failing."""
+        upsert_chunk_rows(db, [_row(0), _row(1)])
+        db.commit()
+        upsert_chunk_rows(db, [_row(1, content_hash="changed"), _row(1, content_hash="changed")])
+        db.commit()
+        db.expire_all()
+        assert db.query(DocumentChunk).count() == 2
+        assert db.get(DocumentChunk, "chunk-1").hash == "changed"
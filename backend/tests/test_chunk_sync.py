@@ -0,0 +1,108 @@
+"""Unit tests for position-aware chunk synchronization."""
+import pytest
+from langchain_core.documents import Document as LangchainDocument
+
+from app.models.knowledge import DocumentChunk
+from app.services.chunk_sync import sync_document_chunks, synchronize_chunks
+from app.services.document_processor import store_chunk_batch
+
+
+class FakeVectorStore:
+    def __init__(self):
+        self.docs = {}
+        self.added = []
+
+    def add_documents(self, documents, ids=None):
+        self.added.extend(ids)
+        for chunk_id, doc in zip(ids, documents):
+            self.docs[chunk_id] = doc.page_content
+
+    def delete(self, ids):
+        for chunk_id in ids:
+            self.docs.pop(chunk_id, None)
+
+    def delete_document(self, document_id):
+        self.docs.clear()
+
+
+def _chunks(texts):
+    return [LangchainDocument(page_content=text, metadata={}) for text in texts]
+
+
+def _ingest(db, store, texts):
+    chunks = _chunks(texts)
+    ids = store_chunk_batch(db, chunks, 1, "a.txt", 1)
+    store.add_documents(chunks, ids=ids)
+
+
+def _stored_texts(db):
+    rows = db.query(DocumentChunk).order_by(DocumentChunk.chunk_index).all()
+    return [row.chunk_metadata["page_content"] for row in rows]
+
+
+class TestSynchronizeChunks:
+    """Tests for the synchronize_chunks matching algorithm."""
+
+    def test_matches_by_hash_and_position(self):
+        old = [
+            {'uuid': f'uuid_{i}', 'index': i, 'content_hash': h, 'chunk_content': h}
+            for i, h in enumerate(['A', 'B', 'C', 'D', 'E'])
+        ]
+        new = [
+            {'index': i, 'content_hash': h, 'chunk_content': h}
+            for i, h in enumerate(['A', 'C', 'D', 'D', 'D'])
+        ]
+        result = synchronize_chunks(old, new)
+        assert sorted(result['to_delete']) == ['uuid_1', 'uuid_4']
+        assert {(u['uuid'], u['index']) for u in result['to_update']} == {('uuid_0', 0), ('uuid_2', 1), ('uuid_3', 2)}
+        assert sorted(c['index'] for c in result['to_create']) == [3, 4]
+
+    def test_unique_content_matches_beyond_threshold(self):
+        """A chunk that moved far but occurs once is kept, not recreated."""
+        old = [{'uuid': 'u', 'index': 0, 'content_hash': 'A', 'chunk_content': 'A'}]
+        new = [{'index': 50, 'content_hash': 'A', 'chunk_content': 'A'}]
+        result = synchronize_chunks(old, new)
+        assert result['to_update'][0]['uuid'] == 'u'
+        assert not result['to_create'] and not result['to_delete']
+
+    def test_rejects_incomplete_chunks(self):
+        with pytest.raises(ValueError):
+            synchronize_chunks([{'index': 0, 'content_hash': 'A', 'chunk_content': 'A'}], [])
+
+
+class TestSyncDocumentChunks:
+    """Tests for applying a sync to the database and vector store."""
+
+    def test_only_changed_chunks_are_embedded(self, db):
+        store = FakeVectorStore()
+        _ingest(db, store, ["intro", "one", "two", "three"])
+        store.added.clear()
+
+        stats = sync_document_chunks(
+            db, store, _chunks(["intro", "new", "one", "two"]), 1, "a.txt", 1, batch_size=2
+        )
+        assert stats["created"] == 1
+        assert stats["deleted"] == 1
+        assert stats["moved"] == 2
+        assert stats["unchanged"] == 1
+        assert [store.docs[chunk_id] for chunk_id in store.added] == ["new"]
+        assert _stored_texts(db) == ["intro", "new", "one", "two"]
+        assert sorted(store.docs.values()) == ["intro", "new", "one", "two"]
+
+    def test_repeated_content_gets_distinct_ids(self, db):
+        store = FakeVectorStore()
+        _ingest(db, store, ["same", "other"])
+        sync_document_chunks(db, store, _chunks(["same", "same", "same"]), 1, "a.txt", 1, batch_size=10)
+        assert _stored_texts(db) == ["same", "same", "same"]
+        assert len(store.docs) == 3
+
+    def test_chunks_without_positions_are_replaced(self, db):
+        store = FakeVectorStore()
+        db.add(DocumentChunk(id="legacy", kb_id=1, document_id=1, file_name="a.txt", hash="x",
+                             chunk_metadata={"page_content": "old"}))
+        db.commit()
+        store.docs["random-id"] = "old"
+        stats = sync_document_chunks(db, store, _chunks(["fresh"]), 1, "a.txt", 1, batch_size=10)
+        assert stats["created"] == 1
+        assert _stored_texts(db) == ["fresh"]
+        assert list(store.docs.values()) == ["fresh"]
@@ -0,0 +1,200 @@
+"""Unit tests for the process-pool document parser."""
+import asyncio
+import glob
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import patch
+
+import pytest
+
+from app.services import document_parser
+
+
+@pytest.fixture
+def text_file(tmp_path):
+    path = tmp_path / "sample.txt"
+    path.write_text("hello parser\nsecond line", encoding="utf-8")
+    return str(path)
+
+
+class TestDocumentParser:
+    """Tests for parse_file and the pooled loaders."""
+
+    def test_parse_file_returns_compact_pages(self, text_file):
+        """parse_file returns plain (content, metadata) tuples."""
+        pages = document_parser.parse_file(text_file, ".txt")
+        assert pages == [("hello parser\nsecond line", {"source": text_file})]
+
+    @patch.object(document_parser.settings, "PARSER_MAX_WORKERS", 0)
+    def test_load_document_without_pool(self, text_file):
+        """With the pool disabled, parsing happens in the calling thread."""
+        assert document_parser.get_parser_pool() is None
+        docs = document_parser.load_document(text_file, ".txt")
+        assert docs[0].page_content == "hello parser\nsecond line"
+
+    @patch.object(document_parser.settings, "PARSER_MAX_WORKERS", 1)
+    def test_load_document_on_pool(self, text_file):
+        """Sync, async and streaming loaders parse on the process pool."""
+        try:
+            docs = document_parser.load_document(text_file, ".txt")
+            async_docs = asyncio.run(document_parser.aload_document(text_file, ".txt"))
+            with patch.object(document_parser.settings, "PARSER_STREAMING_MIN_BYTES", 0):
+                streamed = list(document_parser.iter_document_pages(text_file, ".txt"))
+        finally:
+            document_parser.shutdown_parser_pool()
+        assert docs[0].page_content == "hello parser\nsecond line"
+        assert async_docs[0].metadata == {"source": text_file}
+        assert streamed[0].page_content == "hello parser\nsecond line"
+
+
+class StalledPool:
+    """A pool whose parses never finish"""
+
+    def __init__(self):
+        self.futures = []
+
+    def submit(self, fn, *args):
+        self.futures.append(Future())
+        return self.futures[-1]
+
+
+class TerminablePool(StalledPool):
+    """A stalled pool whose shutdown breaks its pending parses, like a terminated process pool"""
+
+    _processes = {}
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        for future in self.futures:
+            if not future.done():
+                future.set_exception(BrokenProcessPool("terminated"))
+
+
+def _jsonl_files():
+    return set(glob.glob(os.path.join(tempfile.gettempdir(), "ragwebui_*.jsonl")))
+
+
+class TestPoolReset:
+    """Tests for parses in flight when another parse times out."""
+
+    @patch.object(document_parser.settings, "PARSER_TIMEOUT_SECONDS", 0.5)
+    def test_parse_in_flight_is_retried_after_a_reset(self, text_file):
+        stalled, healthy = TerminablePool(), ThreadPoolExecutor(1)
+        timed_out = []
+
+        def slow_parse():
+            try:
+                document_parser.load_document(text_file, ".txt")
+            except document_parser.DocumentParseTimeout as e:
+                timed_out.append(e)
+
+        with patch.object(document_parser, "get_parser_pool",
+                          side_effect=lambda: healthy if stalled in document_parser._reset_pools else stalled):
+            slow = threading.Thread(target=slow_parse)
+            slow.start()
+            time.sleep(0.2)
+            # Submitted to the same pool, then broken by the other parse's timeout
+            docs = document_parser.load_document(text_file, ".txt")
+            slow.join()
+        healthy.shutdown()
+        assert len(timed_out) == 1
+        assert docs[0].page_content == "hello parser\nsecond line"
+        assert len(stalled.futures) == 2
+
+    def test_streamed_parse_reports_the_reset(self, text_file):
+        pool = TerminablePool()
+        document_parser._reset_pools.add(pool)
+        threading.Timer(0.1, pool.shutdown).start()
+        with pytest.raises(document_parser.ParserPoolReset):
+            list(document_parser._stream_from_pool(pool, text_file, ".txt"))
+
+    def test_crashed_pool_is_not_a_reset(self, text_file):
+        pool = TerminablePool()
+        threading.Timer(0.1, pool.shutdown).start()
+        with pytest.raises(BrokenProcessPool):
+            list(document_parser._stream_from_pool(pool, text_file, ".txt"))
+
+
+class TestStreamingParse:
+    """Tests for large files streamed through the pool."""
+
+    def test_pages_are_streamed_through_a_temp_file(self, text_file):
+        before = _jsonl_files()
+        with ThreadPoolExecutor(1) as pool:
+            pages = list(document_parser._stream_from_pool(pool, text_file, ".txt"))
+        assert [(p.page_content, p.metadata) for p in pages] == [("hello parser\nsecond line", {"source": text_file})]
+        assert _jsonl_files() == before
+
+    @patch.object(document_parser.settings, "PARSER_TIMEOUT_SECONDS", 0.1)
+    def test_streaming_parse_times_out(self, text_file):
+        before = _jsonl_files()
+        pool = StalledPool()
+        with patch.object(document_parser, "_reset_pool") as reset:
+            with pytest.raises(document_parser.DocumentParseTimeout):
+                list(document_parser._stream_from_pool(pool, text_file, ".txt"))
+        reset.assert_called_once_with(pool)
+        assert _jsonl_files() == before
+
+    @patch.object(document_parser.settings, "PARSER_STREAMING_MIN_BYTES", 0)
+    def test_large_files_are_parsed_on_the_pool(self, text_file):
+        with patch.object(document_parser, "get_parser_pool", return_value=StalledPool()), \
+                patch.object(document_parser, "_stream_from_pool", return_value=iter([])) as stream:
+            list(document_parser.iter_document_pages(text_file, ".txt"))
+        stream.assert_called_once()
+
+    @patch.object(document_parser.settings, "PARSER_TIMEOUT_SECONDS", 0.1)
+    def test_preview_samples_time_out(self, text_file):
+        pool = ThreadPoolExecutor(1)
+        with patch.object(document_parser, "get_parser_pool", return_value=pool), \
+                patch.object(document_parser, "_reset_pool") as reset, \
+                patch.object(document_parser, "parse_sample", side_effect=lambda *args: time.sleep(0.5)):
+            with pytest.raises(document_parser.DocumentParseTimeout):
+                asyncio.run(document_parser.aload_document_sample(text_file, ".txt", "head", 2, "seed"))
+        pool.shutdown()
+        reset.assert_called_once_with(pool)
+
+
+class TestPageSampling:
+    """Tests for head_pages and sample_pages."""
+
+    @staticmethod
+    def _pages(count, consumed):
+        for i in range(count):
+            consumed.append(i)
+            yield document_parser.LangchainDocument(page_content=f"page {i}", metadata={"page": i})
+
+    def test_head_pages_stops_reading(self):
+        consumed = []
+        pages = document_parser.head_pages(self._pages(100, consumed), 3)
+        assert [p.metadata["page"] for p in pages] == [0, 1, 2]
+        assert consumed == [0, 1, 2]
+
+    def test_sample_pages_is_ordered_and_reproducible(self):
+        first = document_parser.sample_pages(self._pages(100, []), 5, seed="abc")
+        second = document_parser.sample_pages(self._pages(100, []), 5, seed="abc")
+        indices = [p.metadata["page"] for p in first]
+        assert len(indices) == 5
+        assert indices == sorted(indices)
+        assert indices == [p.metadata["page"] for p in second]
+
+    def test_sample_of_short_document_is_the_document(self):
+        pages = document_parser.sample_pages(self._pages(3, []), 5, seed="abc")
+        assert [p.metadata["page"] for p in pages] == [0, 1, 2]
+
+    def test_sampled_pdf_pages_match_sample_pages(self, tmp_path):
+        import pypdf
+
+        writer = pypdf.PdfWriter()
+        for _ in range(30):
+            writer.add_blank_page(width=72, height=72)
+        path = tmp_path / "blank.pdf"
+        with open(path, "wb") as f:
+            writer.write(f)
+
+        sampled = document_parser.load_document_sample(str(path), ".pdf", "sample", 4, seed="abc")
+        streamed = document_parser.sample_pages(self._pages(30, []), 4, seed="abc")
+        assert [p.metadata["page"] for p in sampled] == [p.metadata["page"] for p in streamed]
+        assert [p.metadata["page"] for p in sampled] == document_parser.sample_indices(30, 4, "abc")
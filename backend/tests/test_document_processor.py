@@ -0,0 +1,283 @@
+"""Unit tests for the streaming ingestion helpers."""
+import asyncio
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document as LangchainDocument
+
+from app.models.knowledge import BlobLock, Document, DocumentChunk, DocumentUpload, KnowledgeBase, ProcessingTask
+from app.services import document_processor
+from app.services.blob_store import blob_object_name
+from app.services.document_processor import iter_batches, iter_chunks, preview_document
+from app.services.document_parser import ParserPoolReset
+from app.services.task_queue import LeaseLost
+
+
+def _pages(count):
+    for i in range(count):
+        yield LangchainDocument(
+            page_content=" ".join(f"page{i}-word{j}" for j in range(200)),
+            metadata={"page": i},
+        )
+
+
+class TestStreamingPipeline:
+    """Tests for iter_chunks and iter_batches."""
+
+    def test_iter_chunks_matches_split_documents(self):
+        """Chunking page by page yields the same chunks as splitting all pages at once."""
+        splitter = RecursiveCharacterTextSplitter(chunk_size=300, chunk_overlap=50)
+        expected = splitter.split_documents(list(_pages(5)))
+        streamed = list(iter_chunks(_pages(5), splitter))
+        assert [c.page_content for c in streamed] == [c.page_content for c in expected]
+        assert [c.metadata for c in streamed] == [c.metadata for c in expected]
+
+    def test_iter_chunks_is_lazy(self):
+        """Pages are only consumed as chunks are requested."""
+        consumed = []
+
+        def pages():
+            for page in _pages(3):
+                consumed.append(page.metadata["page"])
+                yield page
+
+        splitter = RecursiveCharacterTextSplitter(chunk_size=300, chunk_overlap=0)
+        next(iter_chunks(pages(), splitter))
+        assert consumed == [0]
+
+    def test_iter_batches(self):
+        """Items are grouped into batches of at most batch_size."""
+        assert list(iter_batches(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+        assert list(iter_batches([], 3)) == []
+
+
+class TestPreviewDocument:
+    """Tests for preview_document caching, sampling and pagination."""
+
+    def setup_method(self):
+        document_processor._preview_cache.clear()
+
+    def _preview(self, **kwargs):
+        params = dict(chunk_size=300, chunk_overlap=50, file_name="a.pdf", file_hash="abc")
+        params.update(kwargs)
+        return asyncio.run(preview_document("blobs/ab/abc", **params))
+
+    @patch("app.services.document_processor.get_minio_client", MagicMock())
+    def test_previews_are_cached_by_content_and_parameters(self):
+        """The same content and chunking parameters are only split once."""
+        with patch("app.services.document_processor.iter_cached_pages", side_effect=lambda *a: _pages(2)) as load:
+            first = self._preview()
+            second = self._preview(file_name="b.pdf")
+            other = self._preview(chunk_size=500)
+        assert second is first
+        assert other.total_chunks < first.total_chunks
+        assert load.call_count == 2
+
+    @patch("app.services.document_processor.get_minio_client", MagicMock())
+    @patch("app.services.document_processor.iter_cached_pages", side_effect=lambda *a: _pages(50))
+    def test_head_and_sample_modes_read_few_pages(self, _load):
+        """Sampled previews only chunk max_pages pages; samples are stable."""
+        head = self._preview(mode="head", max_pages=3)
+        assert head.pages == 3
+        assert {c.metadata["page"] for c in head.chunks} == {0, 1, 2}
+        sample = self._preview(mode="sample", max_pages=5)
+        pages = sorted({c.metadata["page"] for c in sample.chunks})
+        assert len(pages) == 5
+        document_processor._preview_cache.clear()
+        assert sorted({c.metadata["page"] for c in self._preview(mode="sample", max_pages=5).chunks}) == pages
+
+    @patch("app.services.document_processor.get_minio_client", MagicMock())
+    @patch("app.services.document_processor.iter_cached_pages", side_effect=lambda *a: _pages(5))
+    def test_cache_is_bounded_by_chunk_bytes(self, _load):
+        """Cached previews count with the size of their chunks, not per entry."""
+        first = self._preview()
+        size = document_processor._preview_size(first)
+        assert document_processor._preview_cache.weight == size
+        with patch.object(document_processor._preview_cache, "maxsize", size + 1):
+            self._preview(file_hash="def")
+        assert len(document_processor._preview_cache) == 1
+        assert self._preview(file_hash="def") is not first
+
+    @patch("app.services.document_processor.get_minio_client", MagicMock())
+    @patch("app.services.document_processor.iter_cached_pages", side_effect=lambda *a: _pages(5))
+    def test_chunks_are_paginated(self, _load):
+        full = self._preview()
+        page = self._preview(offset=2, limit=3)
+        assert page.total_chunks == full.total_chunks
+        assert [c.content for c in page.chunks] == [c.content for c in full.chunks[2:5]]
+        assert (page.offset, page.limit) == (2, 3)
+        assert len(full.chunks) == full.total_chunks
+
+
+class FakeEmbeddings:
+    def embed_documents(self, texts):
+        return [[float(len(text))] for text in texts]
+
+
+class FlakyVectorStore:
+    """Vector store whose add_documents fails on the given call"""
+
+    def __init__(self, fail_on_call=None):
+        self.docs = {}
+        self.calls = 0
+        self.fail_on_call = fail_on_call
+        self.embedded = 0
+
+    def add_embeddings(self, documents, embeddings, ids):
+        self.calls += 1
+        if self.calls == self.fail_on_call:
+            raise RuntimeError("vector store unavailable")
+        assert len(embeddings) == len(documents)
+        self.embedded += len(documents)
+        self.docs.update(zip(ids, documents))
+
+    def delete(self, ids):
+        for chunk_id in ids:
+            self.docs.pop(chunk_id, None)
+
+    def delete_document(self, document_id):
+        self.docs.clear()
+
+
+class TestResumableIngestion:
+    """Tests for checkpointed retries of process_document_background."""
+
+    @pytest.fixture(params=[0, 2], ids=["sequential", "pipelined"], autouse=True)
+    def pipeline_depth(self, request):
+        with patch.object(document_processor.settings, "INGESTION_PIPELINE_DEPTH", request.param):
+            yield
+
+    def _run(self, db, task, store, client=None, heartbeat=None, pages=None):
+        task.next_attempt_at = None  # skip the retry backoff
+        db.commit()
+        lease_heartbeat = MagicMock()
+        if heartbeat:
+            lease_heartbeat.return_value.start.return_value = heartbeat
+        with patch.object(document_processor, "get_minio_client", return_value=client or MagicMock()), \
+                patch.object(document_processor, "LeaseHeartbeat", lease_heartbeat), \
+                patch.object(document_processor, "blob_exists", return_value=True), \
+                patch.object(document_processor, "iter_cached_pages", side_effect=pages or (lambda *a: _pages(6))), \
+                patch.object(document_processor.EmbeddingsFactory, "create_for_ingestion", return_value=FakeEmbeddings()), \
+                patch.object(document_processor.VectorStoreFactory, "create", return_value=store), \
+                patch.object(document_processor.settings, "INGESTION_BATCH_SIZE", 10):
+            document_processor.process_document_background(
+                task.document_upload.temp_path, "a.txt", 1, task.id, db=db, chunk_size=300, chunk_overlap=0
+            )
+        db.refresh(task)
+
+    def _task(self, db):
+        db.add(KnowledgeBase(id=1, name="kb", user_id=1))
+        upload = DocumentUpload(
+            knowledge_base_id=1, file_name="a.txt", file_hash="ab" * 32, file_size=10,
+            content_type="text/plain", temp_path=blob_object_name("ab" * 32), created_at=datetime.utcnow()
+        )
+        db.add(upload)
+        db.commit()
+        task = ProcessingTask(knowledge_base_id=1, document_upload_id=upload.id, status="pending")
+        db.add(task)
+        db.commit()
+        return task
+
+    def test_retry_resumes_after_last_acknowledged_batch(self, db):
+        task = self._task(db)
+        failing = FlakyVectorStore(fail_on_call=3)
+        self._run(db, task, failing)
+        assert task.status == "pending"
+        assert task.checkpoint_chunk_index == 20
+        # Rows of the failed batch are kept until the retry removes them
+        assert db.query(DocumentChunk).count() == 30
+
+        store = FlakyVectorStore()
+        store.docs = dict(failing.docs)
+        self._run(db, task, store)
+        total = len(list(iter_chunks(_pages(6), RecursiveCharacterTextSplitter(chunk_size=300, chunk_overlap=0))))
+        assert task.status == "completed"
+        assert task.chunk_count == total
+        assert store.embedded == total - 20
+        assert db.query(DocumentChunk).count() == total
+        assert set(store.docs) == {row.id for row in db.query(DocumentChunk.id)}
+
+    def test_ingestion_stops_when_lease_is_lost(self, db):
+        task = self._task(db)
+        heartbeat = MagicMock()
+        heartbeat.ensure_held.side_effect = [None, LeaseLost("lease lost")]
+        store = FlakyVectorStore()
+        self._run(db, task, store, heartbeat=heartbeat)
+        # The task is left to the worker that took it over
+        assert task.status == "processing"
+        assert task.error_message is None
+        assert task.checkpoint_chunk_index == 10
+        assert db.query(DocumentChunk).count() == 10
+        assert len(store.docs) == 10
+
+    def test_parser_pool_reset_does_not_use_an_attempt(self, db):
+        task = self._task(db)
+
+        def interrupted_pages(*args):
+            yield from _pages(1)
+            raise ParserPoolReset("interrupted by a parser pool reset")
+
+        with patch.object(document_processor.settings, "INGESTION_MAX_ATTEMPTS", 1):
+            self._run(db, task, FlakyVectorStore(), pages=interrupted_pages)
+        assert task.status == "pending"
+        assert task.attempts == 0
+
+    def test_legacy_upload_is_moved_to_its_blob(self, db):
+        task = self._task(db)
+        task.document_upload.temp_path = "kb_1/temp/a.txt"
+        client = MagicMock()
+        self._run(db, task, FlakyVectorStore(), client=client)
+        assert task.status == "completed"
+        # The upload references the blob before the legacy object is removed
+        assert task.document_upload.temp_path == blob_object_name("ab" * 32)
+        assert db.query(BlobLock).count() == 1
+        client.remove_object.assert_called_once_with(bucket_name="documents", object_name="kb_1/temp/a.txt")
+
+    def test_permanent_failure_removes_stored_vectors(self, db):
+        task = self._task(db)
+        store = FlakyVectorStore(fail_on_call=3)
+        with patch.object(document_processor.settings, "INGESTION_MAX_ATTEMPTS", 1):
+            self._run(db, task, store)
+        assert task.status == "failed"
+        assert task.document_id is None
+        assert db.query(Document).count() == 0
+        assert db.query(DocumentChunk).count() == 0
+        # The two batches stored before the failure are gone from the vector store
+        assert store.embedded == 20
+        assert store.docs == {}
+
+    def test_ingestion_stops_when_knowledge_base_is_deleted(self, db):
+        task = self._task(db)
+        store = FlakyVectorStore()
+        original = store.add_embeddings
+
+        def add_embeddings(documents, embeddings, ids):
+            original(documents, embeddings, ids)
+            if store.embedded == 10:
+                db.get(KnowledgeBase, 1).status = "deleting"
+
+        store.add_embeddings = add_embeddings
+        self._run(db, task, store)
+        assert task.status == "failed"
+        assert "being deleted" in task.error_message
+        assert task.locked_by is None
+        # Nothing is written after the batch that was in flight
+        assert store.embedded == 10
+        assert db.query(DocumentChunk).count() == 10
+
+    def test_retry_restarts_when_near_duplicates_are_dropped(self, db):
+        task = self._task(db)
+        with patch.object(document_processor.settings, "NEAR_DUPLICATE_MODE", "drop"):
+            failing = FlakyVectorStore(fail_on_call=3)
+            self._run(db, task, failing)
+            assert task.checkpoint_chunk_index == 20
+
+            store = FlakyVectorStore()
+            store.docs = dict(failing.docs)
+            self._run(db, task, store)
+        assert task.status == "completed"
+        # Every stored chunk was embedded again by the retry
+        assert store.embedded == db.query(DocumentChunk).count() == task.chunk_count
+        assert set(store.docs) == {row.id for row in db.query(DocumentChunk.id)}
@@ -0,0 +1,128 @@
+"""Unit tests for batched ingestion embeddings."""
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from app.services.embedding.batching import (
+    AdaptiveBatchSizer,
+    BatchedEmbeddings,
+    ProviderBatchDefaults,
+    ProviderLimiter,
+    is_rate_limit_error,
+)
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+class FakeEmbeddings(Embeddings):
+    """Records batch sizes and peak concurrency; optionally throttles."""
+
+    def __init__(self, throttle_first: int = 0, delay: float = 0.0):
+        self.batches = []
+        self.throttle_first = throttle_first
+        self.delay = delay
+        self.current = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self.lock:
+            if self.throttle_first > 0:
+                self.throttle_first -= 1
+                raise RateLimited("Too Many Requests")
+            self.batches.append(len(texts))
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+        time.sleep(self.delay)
+        with self.lock:
+            self.current -= 1
+        return [[float(text)] for text in texts]
+
+    def embed_query(self, text):
+        return [float(text)]
+
+
+def _limiter(batch_size=4, concurrency=2, max_batch_size=4):
+    defaults = ProviderBatchDefaults(
+        batch_size=batch_size, min_batch_size=1, max_batch_size=max_batch_size, max_concurrency=concurrency
+    )
+    return ProviderLimiter(defaults)
+
+
+class TestBatchedEmbeddings:
+    """Tests for BatchedEmbeddings batching, ordering and retries."""
+
+    def test_batches_preserve_order(self):
+        """Results come back in input order across concurrent batches."""
+        fake = FakeEmbeddings(delay=0.01)
+        batched = BatchedEmbeddings(fake, "fake", limiter=_limiter())
+        texts = [str(i) for i in range(10)]
+        assert batched.embed_documents(texts) == [[float(i)] for i in range(10)]
+        assert max(fake.batches) <= 4
+        assert sum(fake.batches) == 10
+
+    def test_concurrency_is_bounded(self):
+        """No more batches run in parallel than the provider limit."""
+        fake = FakeEmbeddings(delay=0.02)
+        batched = BatchedEmbeddings(fake, "fake", limiter=_limiter(batch_size=1, concurrency=3, max_batch_size=1))
+        batched.embed_documents([str(i) for i in range(12)])
+        assert fake.peak <= 3
+
+    @patch("app.services.embedding.batching.time.sleep")
+    def test_throttled_batches_are_retried(self, _sleep):
+        """429 responses are retried and shrink the batch size."""
+        fake = FakeEmbeddings(throttle_first=2)
+        limiter = _limiter(concurrency=1)
+        batched = BatchedEmbeddings(fake, "fake", limiter=limiter, max_retries=3)
+        assert batched.embed_documents(["1", "2", "3", "4"]) == [[1.0], [2.0], [3.0], [4.0]]
+        assert limiter.sizer.current < 4
+
+    @patch("app.services.embedding.batching.time.sleep")
+    def test_gives_up_after_max_retries(self, _sleep):
+        """Throttling beyond max_retries is raised to the caller."""
+        fake = FakeEmbeddings(throttle_first=10)
+        batched = BatchedEmbeddings(fake, "fake", limiter=_limiter(concurrency=1), max_retries=2)
+        with pytest.raises(RateLimited):
+            batched.embed_documents(["1"])
+
+    def test_other_errors_are_not_retried(self):
+        """Non-throttling errors propagate immediately."""
+        class Broken(FakeEmbeddings):
+            def embed_documents(self, texts):
+                raise ValueError("bad input")
+
+        batched = BatchedEmbeddings(Broken(), "fake", limiter=_limiter())
+        with pytest.raises(ValueError):
+            batched.embed_documents(["1"])
+
+
+class TestAdaptiveBatchSizer:
+    """Tests for AdaptiveBatchSizer."""
+
+    def test_grows_when_fast_and_shrinks_when_slow(self):
+        sizer = AdaptiveBatchSizer(initial=16, min_size=4, max_size=64, target_latency=1.0)
+        sizer.on_success(16, 0.1)
+        assert sizer.current == 20
+        sizer.on_success(20, 2.0)
+        assert sizer.current == 15
+
+    def test_throttle_halves_within_bounds(self):
+        sizer = AdaptiveBatchSizer(initial=16, min_size=4, max_size=64, target_latency=1.0)
+        for _ in range(5):
+            sizer.on_throttle()
+        assert sizer.current == 4
+
+    def test_short_batches_are_ignored(self):
+        sizer = AdaptiveBatchSizer(initial=16, min_size=4, max_size=64, target_latency=1.0)
+        sizer.on_success(3, 0.01)
+        assert sizer.current == 16
+
+    def test_rate_limit_detection(self):
+        assert is_rate_limit_error(RateLimited())
+        assert is_rate_limit_error(Exception("Error code: 429 - rate limit exceeded"))
+        assert not is_rate_limit_error(ValueError("bad input"))
@@ -0,0 +1,70 @@
+"""Unit tests for the persistent embedding cache."""
+import pytest
+from langchain_core.embeddings import Embeddings
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.embedding_cache import EmbeddingCacheEntry
+from app.services.embedding.cache import (
+    CachedEmbeddings,
+    SQLEmbeddingCache,
+    SQLiteEmbeddingCache,
+)
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), 0.5] for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 0.5]
+
+
+@pytest.fixture(params=["sqlite", "sql"])
+def backend(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteEmbeddingCache(str(tmp_path / "cache.sqlite3"), max_entries=100)
+    engine = create_engine("sqlite://")
+    EmbeddingCacheEntry.__table__.create(engine)
+    return SQLEmbeddingCache(sessionmaker(bind=engine), max_entries=100)
+
+
+class TestCachedEmbeddings:
+    """Tests for CachedEmbeddings on both backends."""
+
+    def test_second_pass_is_served_from_cache(self, backend):
+        """Already embedded texts are not sent to the provider again."""
+        inner = CountingEmbeddings()
+        cached = CachedEmbeddings(inner, backend, provider="fake", model="m1")
+        first = cached.embed_documents(["a", "bb", "a"])
+        second = cached.embed_documents(["bb", "ccc"])
+        assert first == [[1.0, 0.5], [2.0, 0.5], [1.0, 0.5]]
+        assert second == [[2.0, 0.5], [3.0, 0.5]]
+        # "a" is embedded once despite repeating, "bb" only on the first pass
+        assert inner.calls == [["a", "bb"], ["ccc"]]
+        assert backend.stats.hits == 2
+        assert backend.stats.misses == 3
+
+    def test_model_is_part_of_the_key(self, backend):
+        """Vectors of one model are never served for another."""
+        inner = CountingEmbeddings()
+        CachedEmbeddings(inner, backend, provider="fake", model="m1").embed_documents(["a"])
+        CachedEmbeddings(inner, backend, provider="fake", model="m2").embed_documents(["a"])
+        assert inner.calls == [["a"], ["a"]]
+
+    def test_least_recently_used_entries_are_evicted(self, backend):
+        """Entries beyond max_entries are evicted, oldest use first."""
+        backend.max_entries = 2
+        backend.EVICT_EVERY = 1
+        inner = CountingEmbeddings()
+        cached = CachedEmbeddings(inner, backend, provider="fake", model="m1")
+        cached.embed_documents(["a"])
+        cached.embed_documents(["bb"])
+        cached.embed_documents(["ccc"])
+        assert backend.count() == 2
+        cached.embed_documents(["a"])
+        assert inner.calls[-1] == ["a"]
@@ -0,0 +1,94 @@
+"""Unit tests for the shared embeddings registry."""
+import threading
+import time
+from unittest.mock import patch
+
+import httpx
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from app.core.config import settings
+from app.services.embedding.embedding_factory import EmbeddingsFactory, SerializedEmbeddings
+
+
+class FakeModel(Embeddings):
+    """Counts how many instances are built and overlapping calls."""
+
+    instances = 0
+
+    def __init__(self, **kwargs):
+        type(self).instances += 1
+        self.current = 0
+        self.peak = 0
+
+    def embed_documents(self, texts):
+        self.current += 1
+        self.peak = max(self.peak, self.current)
+        time.sleep(0.01)
+        self.current -= 1
+        return [[0.0] for _ in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+@pytest.fixture(autouse=True)
+def registry():
+    EmbeddingsFactory.clear()
+    FakeModel.instances = 0
+    yield
+    EmbeddingsFactory.clear()
+
+
+class TestEmbeddingsFactory:
+    """Tests for EmbeddingsFactory.create."""
+
+    def test_instances_are_shared_per_configuration(self):
+        with patch.object(settings, "EMBEDDINGS_PROVIDER", "openai"), \
+                patch.object(settings, "OPENAI_API_KEY", "test-key"):
+            first = EmbeddingsFactory.create()
+            assert EmbeddingsFactory.create() is first
+            assert isinstance(first.http_client, httpx.Client)
+            with patch.object(settings, "OPENAI_EMBEDDINGS_MODEL", "text-embedding-3-small"):
+                assert EmbeddingsFactory.create() is not first
+
+    def test_concurrent_first_use_builds_one_instance(self):
+        def build():
+            time.sleep(0.05)
+            return FakeModel()
+
+        with patch.object(settings, "EMBEDDINGS_PROVIDER", "ollama"), \
+                patch.object(EmbeddingsFactory, "build", staticmethod(build)):
+            results = []
+            threads = [threading.Thread(target=lambda: results.append(EmbeddingsFactory.create())) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        assert FakeModel.instances == 1
+        assert len({id(result) for result in results}) == 1
+
+    def test_local_models_are_loaded_once_and_serialized(self):
+        with patch.object(settings, "EMBEDDINGS_PROVIDER", "huggingface"), \
+                patch("app.services.embedding.embedding_factory.HuggingFaceEmbeddings", FakeModel):
+            embeddings = EmbeddingsFactory.create()
+            assert isinstance(embeddings, SerializedEmbeddings)
+            threads = [threading.Thread(target=EmbeddingsFactory.create().embed_query, args=("q",)) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        assert FakeModel.instances == 1
+        assert embeddings.embeddings.peak == 1
+
+    def test_local_onnx_model_is_built_from_settings(self):
+        pytest.importorskip("onnxruntime")
+        with patch.object(settings, "EMBEDDINGS_PROVIDER", "local_onnx"), \
+                patch.object(settings, "ONNX_EMBEDDINGS_MODEL_PATH", "models/minilm"), \
+                patch.object(settings, "ONNX_EMBEDDINGS_MODEL_FILE", "model_quantized.onnx"), \
+                patch("app.services.embedding.onnx_embeddings.OnnxEmbeddings.from_path") as from_path:
+            assert EmbeddingsFactory.create() is EmbeddingsFactory.create()
+            assert EmbeddingsFactory.model_name() == "models/minilm/model_quantized.onnx"
+        from_path.assert_called_once()
+        assert from_path.call_args.args == ("models/minilm",)
+        assert from_path.call_args.kwargs["model_file"] == "model_quantized.onnx"
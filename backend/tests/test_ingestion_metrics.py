@@ -0,0 +1,91 @@
+"""Unit tests for ingestion stage timing."""
+from unittest.mock import patch
+
+from app.services.ingestion_metrics import (
+    StageTimer,
+    TimedEmbeddings,
+    TimedVectorStore,
+    aggregate_stage_timings,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class FakeEmbeddings:
+    def __init__(self, clock):
+        self.clock = clock
+
+    def embed_documents(self, texts):
+        self.clock.advance(3.0)
+        return [[0.0] for _ in texts]
+
+
+class FakeVectorStore:
+    def __init__(self, clock, embeddings):
+        self.clock = clock
+        self.embeddings = embeddings
+
+    def add_documents(self, documents, ids=None):
+        self.clock.advance(1.0)
+        self.embeddings.embed_documents(documents)
+
+
+class TestStageTimer:
+    """Tests for StageTimer."""
+
+    def test_nested_stages_record_exclusive_time(self):
+        clock = FakeClock()
+        with patch("app.services.ingestion_metrics.time.perf_counter", clock):
+            timer = StageTimer()
+            embeddings = TimedEmbeddings(FakeEmbeddings(clock), timer)
+            store = TimedVectorStore(FakeVectorStore(clock, embeddings), timer)
+            store.add_documents(["a", "b"])
+            with timer.stage("db_insert"):
+                clock.advance(0.5)
+        assert timer.to_dict() == {"embed": 3.0, "upsert": 1.0, "db_insert": 0.5}
+
+    def test_iter_attributes_lazy_pipelines_to_each_step(self):
+        clock = FakeClock()
+
+        def pages():
+            for page in range(3):
+                clock.advance(2.0)  # parsing
+                yield page
+
+        def split(items):
+            for item in items:
+                clock.advance(0.25)  # splitting
+                yield item
+
+        with patch("app.services.ingestion_metrics.time.perf_counter", clock):
+            timer = StageTimer()
+            chunks = list(timer.iter("split", split(timer.iter("load", pages()))))
+        assert chunks == [0, 1, 2]
+        assert timer.to_dict() == {"load": 6.0, "split": 0.75}
+
+
+class TestAggregateStageTimings:
+    """Tests for the dashboard aggregation."""
+
+    def test_histogram_buckets_are_cumulative(self):
+        result = aggregate_stage_timings([
+            {"load": 0.05, "embed": 4.0, "total": 5.0},
+            {"load": 2.0, "embed": 40.0, "total": 45.0},
+            None,
+        ])
+        assert list(result) == ["load", "embed", "total"]
+        assert result["load"]["count"] == 2
+        assert result["load"]["buckets"]["0.1"] == 1
+        assert result["load"]["buckets"]["2.5"] == 2
+        assert result["embed"]["buckets"]["30"] == 1
+        assert result["embed"]["buckets"]["+Inf"] == 2
+        assert result["embed"]["max"] == 40.0
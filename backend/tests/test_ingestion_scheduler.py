@@ -0,0 +1,122 @@
+"""Unit tests for the bounded ingestion scheduler."""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.ingestion_scheduler import IngestionScheduler
+
+
+class TestIngestionScheduler:
+    """Tests for IngestionScheduler concurrency and timings."""
+
+    def test_concurrency_is_bounded(self):
+        """No more than max_concurrency jobs run at the same time."""
+        scheduler = IngestionScheduler(max_concurrency=2)
+        lock = threading.Lock()
+        state = {"current": 0, "peak": 0}
+
+        def job():
+            with lock:
+                state["current"] += 1
+                state["peak"] = max(state["peak"], state["current"])
+            time.sleep(0.05)
+            with lock:
+                state["current"] -= 1
+
+        async def run():
+            for i in range(6):
+                await scheduler.submit(i, job)
+            assert scheduler.queue_depth > 0
+            await scheduler._queue.join()
+            await scheduler.shutdown()
+
+        asyncio.run(run())
+        assert state["peak"] == 2
+
+    def test_jobs_run_off_the_event_loop(self):
+        """Blocking jobs execute on worker threads, not the loop thread."""
+        scheduler = IngestionScheduler(max_concurrency=1)
+        seen = {}
+
+        def job():
+            seen["thread"] = threading.current_thread().name
+
+        async def run():
+            await scheduler.submit(1, job)
+            await scheduler._queue.join()
+            await scheduler.shutdown()
+
+        asyncio.run(run())
+        assert seen["thread"].startswith("ingestion")
+
+    def test_shutdown_does_not_block_the_event_loop(self):
+        """The loop keeps running while shutdown waits for a running job."""
+        scheduler = IngestionScheduler(max_concurrency=1)
+        started, release = threading.Event(), threading.Event()
+
+        def job():
+            started.set()
+            release.wait(2)
+
+        async def releaser():
+            await asyncio.sleep(0.05)
+            release.set()
+
+        async def run():
+            await scheduler.submit(1, job)
+            while not started.is_set():
+                await asyncio.sleep(0.01)
+            begin = time.monotonic()
+            await asyncio.gather(scheduler.shutdown(), releaser())
+            return time.monotonic() - begin
+
+        assert asyncio.run(run()) < 1
+
+    def test_timings_and_status_recorded(self):
+        """Queue and run timings are recorded per job, failures included."""
+        scheduler = IngestionScheduler(max_concurrency=1)
+
+        def ok():
+            time.sleep(0.02)
+
+        def boom():
+            raise RuntimeError("boom")
+
+        async def run():
+            await scheduler.submit(1, ok)
+            await scheduler.submit(2, boom)
+            await scheduler._queue.join()
+            stats = scheduler.stats()
+            await scheduler.shutdown()
+            return stats
+
+        stats = asyncio.run(run())
+        first = scheduler.get_timing(1)
+        second = scheduler.get_timing(2)
+        assert first.status == "completed"
+        assert first.run_seconds >= 0.02
+        assert second.status == "failed"
+        assert second.queue_seconds >= first.run_seconds
+        assert stats["queue_depth"] == 0
+        assert [job["job_id"] for job in stats["recent_jobs"]] == [1, 2]
+
+    def test_history_is_bounded(self):
+        """Only the most recent max_history timings are kept."""
+        scheduler = IngestionScheduler(max_concurrency=1, max_history=3)
+
+        async def run():
+            for i in range(5):
+                await scheduler.submit(i, lambda: None)
+            await scheduler._queue.join()
+            await scheduler.shutdown()
+
+        asyncio.run(run())
+        assert scheduler.get_timing(0) is None
+        assert scheduler.get_timing(4) is not None
+
+    def test_invalid_concurrency(self):
+        """A concurrency limit below one is rejected."""
+        with pytest.raises(ValueError):
+            IngestionScheduler(max_concurrency=0)
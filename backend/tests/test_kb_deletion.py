@@ -0,0 +1,150 @@
+"""Unit tests for batched knowledge base deletion."""
+import hashlib
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+from app.models.knowledge import Document, DocumentChunk, DocumentUpload, KnowledgeBase, ProcessingTask
+from app.services import kb_deletion
+from app.services.blob_store import blob_object_name
+
+HASH = hashlib.sha256(b"content").hexdigest()
+
+
+def _knowledge_base(db, kb_id, chunks=0):
+    db.add(KnowledgeBase(id=kb_id, name=f"kb {kb_id}", user_id=1))
+    document = Document(
+        file_name="a.pdf", file_path=blob_object_name(HASH), file_hash=HASH, file_size=7,
+        content_type="application/pdf", knowledge_base_id=kb_id,
+    )
+    db.add(document)
+    db.flush()
+    db.add(ProcessingTask(knowledge_base_id=kb_id, document_id=document.id, status="completed"))
+    db.add(DocumentUpload(
+        knowledge_base_id=kb_id, file_name="a.pdf", file_hash=HASH, file_size=7,
+        content_type="application/pdf", temp_path=blob_object_name(HASH), created_at=datetime.utcnow(),
+    ))
+    for i in range(chunks):
+        db.add(DocumentChunk(
+            id=f"{kb_id}-{i}", kb_id=kb_id, document_id=document.id, file_name="a.pdf",
+            chunk_index=i, hash=str(i),
+        ))
+    db.commit()
+
+
+def _minio(object_count):
+    client = MagicMock()
+    client.list_objects.return_value = [SimpleNamespace(object_name=f"kb_1/{i}") for i in range(object_count)]
+    client.remove_objects.return_value = iter([])
+    return client
+
+
+class TestDeleteKnowledgeBase:
+    """Tests for the background deletion job."""
+
+    def _run(self, db, client):
+        with patch.object(kb_deletion, "VectorStoreFactory") as factory, \
+                patch.object(kb_deletion, "EmbeddingsFactory"):
+            kb_deletion.delete_knowledge_base_contents(1, db=db, minio_client=client)
+        return factory.create.return_value
+
+    def test_only_knowledge_bases_marked_deleting_are_deleted(self, db):
+        _knowledge_base(db, 1, chunks=3)
+        self._run(db, _minio(0))
+        assert db.query(DocumentChunk).count() == 3
+
+    def test_contents_are_deleted_in_batches(self, db):
+        _knowledge_base(db, 1, chunks=5)
+        _knowledge_base(db, 2, chunks=2)
+        kb = db.get(KnowledgeBase, 1)
+        kb_deletion.mark_deleting(db, kb)
+        client = _minio(2500)
+
+        with patch.object(kb_deletion.settings, "KB_DELETE_BATCH_SIZE", 1000):
+            vector_store = self._run(db, client)
+
+        assert db.get(KnowledgeBase, 1) is None
+        assert db.query(DocumentChunk).filter(DocumentChunk.kb_id == 1).count() == 0
+        assert db.query(Document).filter(Document.knowledge_base_id == 1).count() == 0
+        assert db.query(DocumentChunk).filter(DocumentChunk.kb_id == 2).count() == 2
+        vector_store._store.delete_collection.assert_called_once_with("kb_1")
+        assert [len(call.args[1]) for call in client.remove_objects.call_args_list] == [1000, 1000, 500]
+        # The blob is still referenced by the other knowledge base
+        client.remove_object.assert_not_called()
+
+    def test_progress_is_recorded(self, db):
+        _knowledge_base(db, 1, chunks=5)
+        kb = db.get(KnowledgeBase, 1)
+        kb_deletion.mark_deleting(db, kb)
+        client = _minio(3)
+        saved = []
+        original_save = kb_deletion.DeletionProgress._save
+
+        def save(progress):
+            saved.append(dict(progress.progress, deleted=dict(progress.progress["deleted"])))
+            original_save(progress)
+
+        with patch.object(kb_deletion.DeletionProgress, "_save", save):
+            self._run(db, client)
+
+        # Blobs to release are recorded before any row is deleted
+        assert saved[0]["file_hashes"] == [HASH]
+        stages = [entry["stage"] for entry in saved]
+        assert stages.index("waiting") < stages.index("tasks")
+        assert saved[-1]["deleted"] == {"tasks": 1, "chunks": 5, "uploads": 1, "documents": 1, "files": 3, "blobs": 1}
+        client.remove_object.assert_any_call(kb_deletion.settings.MINIO_BUCKET_NAME, blob_object_name(HASH))
+
+    def test_failed_deletion_releases_blobs_when_run_again(self, db):
+        _knowledge_base(db, 1)
+        kb = db.get(KnowledgeBase, 1)
+        kb_deletion.mark_deleting(db, kb)
+        client = _minio(0)
+        with patch.object(kb_deletion, "release_blob", side_effect=RuntimeError("minio down")):
+            self._run(db, client)
+        kb = db.get(KnowledgeBase, 1)
+        assert kb_deletion.deletion_failed(kb)
+        assert db.query(Document).count() == 0
+        assert "file_hashes" not in kb_deletion.public_progress(kb)
+
+        # Queued again: the rows are gone, the recorded hashes are not
+        kb_deletion.mark_deleting(db, kb)
+        assert kb.deletion_progress["stage"] == "queued"
+        self._run(db, client)
+        assert db.get(KnowledgeBase, 1) is None
+        client.remove_object.assert_any_call(kb_deletion.settings.MINIO_BUCKET_NAME, blob_object_name(HASH))
+
+    def test_running_ingestion_tasks_are_waited_for(self, db):
+        _knowledge_base(db, 1)
+        task = ProcessingTask(
+            knowledge_base_id=1, status="processing", locked_by="worker-a",
+            lease_expires_at=datetime.utcnow() + timedelta(minutes=1),
+        )
+        db.add(task)
+        db.commit()
+        kb_deletion.mark_deleting(db, db.get(KnowledgeBase, 1))
+
+        def sleep(seconds):
+            # The worker notices the deletion and gives up its task
+            assert db.query(ProcessingTask).count() == 2
+            task.status = "failed"
+            db.commit()
+
+        with patch.object(kb_deletion.time, "sleep", side_effect=sleep) as slept:
+            self._run(db, _minio(0))
+        assert slept.call_count == 1
+        assert db.get(KnowledgeBase, 1) is None
+
+    def test_ensure_active(self, db):
+        _knowledge_base(db, 1)
+        kb_deletion.ensure_active(db, 1)
+        kb_deletion.mark_deleting(db, db.get(KnowledgeBase, 1))
+        with pytest.raises(kb_deletion.KnowledgeBaseDeleted):
+            kb_deletion.ensure_active(db, 1)
+        with pytest.raises(kb_deletion.KnowledgeBaseDeleted):
+            kb_deletion.ensure_active(db, 2)
+
+    def test_delete_rows_stops_after_a_short_batch(self, db):
+        _knowledge_base(db, 1, chunks=5)
+        batches = list(kb_deletion.delete_rows(db, DocumentChunk, DocumentChunk.kb_id == 1, 1000))
+        assert batches == [5]
@@ -0,0 +1,104 @@
+"""Unit tests for the micro-batcher."""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.services.embedding.micro_batch import MicroBatcher
+
+
+class RecordingFn:
+    def __init__(self, gate=None):
+        self.batches = []
+        self.gate = gate
+
+    def __call__(self, items):
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.batches.append(list(items))
+        return [item * 2 for item in items]
+
+
+class TestMicroBatcher:
+    """Tests for MicroBatcher."""
+
+    def test_concurrent_requests_share_a_batch(self):
+        fn = RecordingFn()
+        batcher = MicroBatcher(fn, max_batch_size=8, max_wait=0.5)
+        try:
+            with ThreadPoolExecutor(4) as pool:
+                results = list(pool.map(lambda i: batcher.map([i, i + 10]), range(4)))
+        finally:
+            batcher.close()
+        assert results == [[i * 2, (i + 10) * 2] for i in range(4)]
+        assert len(fn.batches) == 1
+        assert sorted(fn.batches[0]) == sorted([0, 10, 1, 11, 2, 12, 3, 13])
+
+    def test_large_requests_are_split(self):
+        fn = RecordingFn()
+        batcher = MicroBatcher(fn, max_batch_size=3, max_wait=0)
+        try:
+            assert batcher.map(list(range(7))) == [i * 2 for i in range(7)]
+            assert batcher.map([]) == []
+        finally:
+            batcher.close()
+        assert all(len(batch) <= 3 for batch in fn.batches)
+
+    def test_requests_that_do_not_fit_wait_for_the_next_batch(self):
+        gate = threading.Event()
+        fn = RecordingFn(gate)
+        batcher = MicroBatcher(fn, max_batch_size=4, max_wait=0.05)
+        try:
+            blocked = batcher.submit([0])
+            futures = [batcher.submit([1, 2, 3]), batcher.submit([4, 5])]
+            gate.set()
+            assert blocked.result() == [0]
+            assert [f.result() for f in futures] == [[2, 4, 6], [8, 10]]
+        finally:
+            batcher.close()
+        assert all(len(batch) <= 4 for batch in fn.batches)
+
+    def test_errors_reach_every_request_of_the_batch(self):
+        def fail(items):
+            raise RuntimeError("model failed")
+
+        batcher = MicroBatcher(fail, max_batch_size=4, max_wait=0)
+        try:
+            with pytest.raises(RuntimeError, match="model failed"):
+                batcher.map([1, 2, 3, 4, 5])
+        finally:
+            batcher.close()
+
+    def test_result_count_must_match(self):
+        batcher = MicroBatcher(lambda items: items[:-1], max_batch_size=4, max_wait=0)
+        try:
+            with pytest.raises(ValueError, match="Expected 2 results"):
+                batcher.map([1, 2])
+        finally:
+            batcher.close()
+
+    def test_amap(self):
+        fn = RecordingFn()
+        batcher = MicroBatcher(fn, max_batch_size=8, max_wait=0.05)
+
+        async def run():
+            return await asyncio.gather(*(batcher.amap([i]) for i in range(3)))
+
+        try:
+            assert asyncio.run(run()) == [[0], [2], [4]]
+        finally:
+            batcher.close()
+
+    def test_stats_record_batch_fill(self):
+        batcher = MicroBatcher(RecordingFn(), max_batch_size=4, max_wait=0)
+        try:
+            batcher.map([1, 2, 3, 4])
+            batcher.map([5, 6])
+        finally:
+            batcher.close()
+        stats = batcher.stats.to_dict()
+        assert stats["batches"] == 2
+        assert stats["full_batches"] == 1
+        assert stats["avg_batch_size"] == 3
+        assert stats["avg_fill"] == 0.75
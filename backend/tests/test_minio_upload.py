@@ -0,0 +1,43 @@
+"""Unit tests for streamed MinIO uploads."""
+import hashlib
+import io
+from unittest.mock import patch
+
+from app.core.minio import put_object_streaming
+
+
+class PartReadingClient:
+    """Reads the data like the MinIO client does for unknown lengths: one part at a time."""
+
+    def __init__(self):
+        self.reads = []
+        self.received = b""
+
+    def put_object(self, bucket_name, object_name, data, length, part_size, content_type):
+        assert length == -1
+        while True:
+            part = data.read(part_size)
+            self.reads.append(len(part))
+            if not part:
+                break
+            self.received += part
+
+
+class TestPutObjectStreaming:
+    """Tests for put_object_streaming."""
+
+    @patch("app.core.minio.settings.MINIO_UPLOAD_PART_SIZE", 1024)
+    def test_hash_and_size_are_computed_while_streaming(self):
+        """The digest matches the content, which is read a part at a time."""
+        content = bytes(range(256)) * 20
+        client = PartReadingClient()
+        size, digest = put_object_streaming(client, "kb_1/temp/x/a.pdf", io.BytesIO(content))
+        assert size == len(content)
+        assert digest == hashlib.sha256(content).hexdigest()
+        assert client.received == content
+        assert max(client.reads) == 1024
+
+    def test_empty_file(self):
+        size, digest = put_object_streaming(PartReadingClient(), "kb_1/temp/x/empty.txt", io.BytesIO())
+        assert size == 0
+        assert digest == hashlib.sha256(b"").hexdigest()
@@ -0,0 +1,107 @@
+"""Unit tests for SimHash near-duplicate detection."""
+import pytest
+from langchain_core.documents import Document as LangchainDocument
+
+from app.models.knowledge import DocumentChunk
+from app.services.chunk_sync import sync_document_chunks
+from app.services.document_processor import store_chunk_batch
+from app.services.near_duplicate import (
+    NEAR_DUPLICATE_KEY,
+    NearDuplicateFilter,
+    SimHashIndex,
+    hamming_distance,
+    simhash,
+)
+
+DISCLAIMER = (
+    "This document is confidential and intended solely for the use of the individual "
+    "or entity to whom it is addressed. If you have received it in error please notify "
+    "the sender immediately and delete it from your system without copying or forwarding it."
+)
+
+
+class FakeVectorStore:
+    def __init__(self):
+        self.docs = {}
+
+    def add_documents(self, documents, ids=None):
+        for chunk_id, doc in zip(ids, documents):
+            self.docs[chunk_id] = doc.page_content
+
+    def delete(self, ids):
+        for chunk_id in ids:
+            self.docs.pop(chunk_id, None)
+
+    def delete_document(self, document_id):
+        self.docs.clear()
+
+
+def _chunks(texts):
+    return [LangchainDocument(page_content=text, metadata={}) for text in texts]
+
+
+class TestSimHash:
+    """Tests for signatures and the LSH index."""
+
+    def test_near_identical_text_has_close_signature(self):
+        edited = DISCLAIMER.replace("immediately", "at once")
+        unrelated = "Quarterly revenue grew by twelve percent driven by strong demand in the retail segment."
+        assert hamming_distance(simhash(DISCLAIMER), simhash(edited)) <= 12
+        assert hamming_distance(simhash(DISCLAIMER), simhash(unrelated)) > 12
+        assert simhash("...") is None
+
+    @pytest.mark.parametrize("max_distance", [0, 3, 7])
+    def test_index_finds_signatures_within_distance(self, max_distance):
+        index = SimHashIndex(max_distance)
+        stored = 0x0123456789ABCDEF
+        index.add(stored)
+        for bits in range(max_distance + 1):
+            flipped = stored ^ sum(1 << (bit * 9) for bit in range(bits))
+            assert index.find(flipped) == stored
+        too_far = stored ^ sum(1 << (bit * 7) for bit in range(max_distance + 1))
+        assert index.find(too_far) is None
+
+
+class TestNearDuplicateFilter:
+    """Tests for filtering chunks against a knowledge base."""
+
+    def test_drop_mode_discards_repeats_within_and_across_documents(self, db):
+        store_chunk_batch(db, list(NearDuplicateFilter(SimHashIndex(), "drop").filter(_chunks([DISCLAIMER]))), 1, "a.txt", 1)
+        assert db.query(DocumentChunk.simhash).scalar() == format(simhash(DISCLAIMER), "016x")
+
+        near_duplicates = NearDuplicateFilter.load(db, 1, exclude_document_id=2, mode="drop", max_distance=3)
+        kept = list(near_duplicates.filter(_chunks(["Unique introduction text for the second file.", DISCLAIMER])))
+        assert [chunk.page_content for chunk in kept] == ["Unique introduction text for the second file."]
+        assert near_duplicates.duplicates == 1
+
+        # Other knowledge bases and the document's own previous chunks do not count
+        assert len(NearDuplicateFilter.load(db, 2, None, "drop", 3).index) == 0
+        assert len(NearDuplicateFilter.load(db, 1, 1, "drop", 3).index) == 0
+
+    def test_merge_mode_stores_duplicates_without_embedding(self, db):
+        store = FakeVectorStore()
+        near_duplicates = NearDuplicateFilter(SimHashIndex(), "merge")
+        chunks = list(near_duplicates.filter(_chunks([DISCLAIMER, "Body text.", DISCLAIMER])))
+        assert [bool(chunk.metadata.get(NEAR_DUPLICATE_KEY)) for chunk in chunks] == [False, False, True]
+
+        sync_document_chunks(db, store, chunks, 1, "a.txt", 1, batch_size=10)
+        rows = db.query(DocumentChunk).order_by(DocumentChunk.chunk_index).all()
+        assert len(rows) == 3
+        assert rows[2].simhash is None
+        assert sorted(store.docs.values()) == sorted([DISCLAIMER, "Body text."])
+
+    def test_merged_duplicates_are_not_embedded_when_their_match_is_removed(self, db):
+        """Documents the limitation of merge mode: duplicates keep no link to their match."""
+        store = FakeVectorStore()
+        near_duplicates = NearDuplicateFilter(SimHashIndex(), "merge")
+        sync_document_chunks(db, store, list(near_duplicates.filter(_chunks([DISCLAIMER]))), 1, "a.txt", 1, batch_size=10)
+        near_duplicates = NearDuplicateFilter.load(db, 1, exclude_document_id=2, mode="merge", max_distance=3)
+        sync_document_chunks(db, store, list(near_duplicates.filter(_chunks([DISCLAIMER]))), 1, "b.txt", 2, batch_size=10)
+        assert list(store.docs.values()) == [DISCLAIMER]
+
+        # The first document is re-ingested without the disclaimer
+        sync_document_chunks(db, store, _chunks(["Body text."]), 1, "a.txt", 1, batch_size=10)
+        merged = db.query(DocumentChunk).filter(DocumentChunk.document_id == 2).one()
+        assert merged.chunk_metadata["page_content"] == DISCLAIMER
+        assert merged.id not in store.docs
+        assert list(store.docs.values()) == ["Body text."]
@@ -0,0 +1,76 @@
+"""Unit tests for the ONNX Runtime embeddings."""
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import Whitespace
+
+from app.services.embedding.onnx_embeddings import OnnxEmbeddings
+
+VOCAB = {"[PAD]": 0, "[UNK]": 1, "red": 2, "green": 3, "blue": 4}
+
+
+class FakeSession:
+    """Returns token embeddings that are one-hot vectors of the token ids"""
+
+    def __init__(self, inputs=("input_ids", "attention_mask", "token_type_ids")):
+        self.inputs = inputs
+        self.feeds = []
+
+    def get_inputs(self):
+        return [SimpleNamespace(name=name) for name in self.inputs]
+
+    def run(self, output_names, feeds):
+        self.feeds.append(feeds)
+        return [np.eye(len(VOCAB), dtype=np.float32)[feeds["input_ids"]]]
+
+
+def _embeddings(session, **kwargs):
+    tokenizer = Tokenizer(WordLevel(VOCAB, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = Whitespace()
+    return OnnxEmbeddings(session, tokenizer, **kwargs)
+
+
+class TestOnnxEmbeddings:
+    """Tests for OnnxEmbeddings."""
+
+    def test_mean_pools_non_padding_tokens_and_normalizes(self):
+        session = FakeSession()
+        embeddings = _embeddings(session, max_wait=0)
+        try:
+            red, red_blue = embeddings.embed_documents(["red", "red blue"])
+        finally:
+            embeddings.close()
+        assert red == pytest.approx([0, 0, 1, 0, 0])
+        # The padding of "red" does not count towards its average
+        assert red_blue == pytest.approx([0, 0, 2 ** -0.5, 0, 2 ** -0.5])
+        assert set(session.feeds[0]) == {"input_ids", "attention_mask", "token_type_ids"}
+        assert session.feeds[0]["input_ids"].dtype == np.int64
+
+    def test_only_model_inputs_are_fed(self):
+        session = FakeSession(inputs=("input_ids", "attention_mask"))
+        embeddings = _embeddings(session, max_wait=0)
+        try:
+            embeddings.embed_query("green")
+        finally:
+            embeddings.close()
+        assert set(session.feeds[0]) == {"input_ids", "attention_mask"}
+
+    def test_concurrent_queries_share_a_forward_pass(self):
+        session = FakeSession()
+        embeddings = _embeddings(session, max_batch_size=8, max_wait=0.5)
+
+        async def run():
+            return await asyncio.gather(*(embeddings.aembed_query(text) for text in ("red", "green", "blue")))
+
+        try:
+            vectors = asyncio.run(run())
+        finally:
+            embeddings.close()
+        assert [int(np.argmax(vector)) for vector in vectors] == [2, 3, 4]
+        assert len(session.feeds) == 1
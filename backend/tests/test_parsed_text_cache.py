@@ -0,0 +1,87 @@
+"""Unit tests for the parsed-text artifact cache."""
+import io
+
+from langchain_core.documents import Document as LangchainDocument
+from minio.error import S3Error
+
+from app.services.parsed_text_cache import (
+    artifact_object_name,
+    cache_pages,
+    iter_cached_pages,
+    load_cached_pages,
+    remove_artifacts,
+)
+
+HASH = "ab" * 32
+
+
+class Response(io.BytesIO):
+    def release_conn(self):
+        pass
+
+
+class Listed:
+    def __init__(self, object_name):
+        self.object_name = object_name
+
+
+class FakeMinio:
+    def __init__(self):
+        self.objects = {}
+
+    def get_object(self, bucket_name, object_name):
+        if object_name not in self.objects:
+            raise S3Error(None, "NoSuchKey", "missing", object_name, "", "")
+        return Response(self.objects[object_name])
+
+    def fput_object(self, bucket_name, object_name, file_path, content_type=None):
+        with open(file_path, "rb") as f:
+            self.objects[object_name] = f.read()
+
+    def list_objects(self, bucket_name, prefix, recursive=False):
+        return [Listed(name) for name in self.objects if name.startswith(prefix)]
+
+    def remove_object(self, bucket_name, object_name):
+        del self.objects[object_name]
+
+
+def _pages():
+    return [LangchainDocument(page_content=f"page {i} text", metadata={"page": i}) for i in range(3)]
+
+
+class TestParsedTextCache:
+    """Tests for caching parsed pages in object storage."""
+
+    def test_pages_round_trip(self):
+        client = FakeMinio()
+        assert iter_cached_pages(client, HASH, ".pdf") is None
+        passed = list(cache_pages(client, HASH, ".pdf", _pages()))
+        assert [p.page_content for p in passed] == [p.page_content for p in _pages()]
+        cached = load_cached_pages(client, HASH, ".pdf")
+        assert [(p.page_content, p.metadata) for p in cached] == [(p.page_content, p.metadata) for p in _pages()]
+
+    def test_key_includes_extension(self):
+        client = FakeMinio()
+        list(cache_pages(client, HASH, ".pdf", _pages()))
+        assert load_cached_pages(client, HASH, ".txt") is None
+        assert artifact_object_name(HASH, ".pdf") != artifact_object_name(HASH, ".txt")
+
+    def test_partially_consumed_pages_are_not_stored(self):
+        client = FakeMinio()
+        pages = cache_pages(client, HASH, ".pdf", _pages())
+        next(pages)
+        pages.close()
+        assert client.objects == {}
+
+    def test_artifacts_are_removed(self):
+        client = FakeMinio()
+        list(cache_pages(client, HASH, ".pdf", _pages()))
+        list(cache_pages(client, HASH, ".md", _pages()))
+        remove_artifacts(client, HASH)
+        assert client.objects == {}
+
+    def test_disabled(self, monkeypatch):
+        monkeypatch.setattr("app.services.parsed_text_cache.settings.PARSED_TEXT_CACHE_ENABLED", False)
+        client = FakeMinio()
+        assert len(list(cache_pages(client, HASH, ".pdf", _pages()))) == 3
+        assert client.objects == {}
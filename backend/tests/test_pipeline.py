@@ -0,0 +1,67 @@
+"""Unit tests for the threaded prefetch pipeline stage."""
+import threading
+import time
+
+import pytest
+
+from app.core.pipeline import prefetch
+
+
+class TestPrefetch:
+    """Tests for prefetch."""
+
+    def test_items_arrive_in_order(self):
+        assert list(prefetch(range(100), maxsize=3)) == list(range(100))
+
+    def test_stages_run_on_other_threads(self):
+        threads = set()
+
+        def stage(items):
+            for item in items:
+                threads.add(threading.current_thread().name)
+                yield item
+
+        assert list(prefetch(stage(prefetch(stage(range(5)), 2, name="one")), 2, name="two")) == list(range(5))
+        assert threads == {"one", "two"}
+
+    def test_errors_are_raised_in_the_consumer(self):
+        def failing():
+            yield 1
+            raise ValueError("parse failed")
+
+        stage = prefetch(failing(), maxsize=2)
+        assert next(stage) == 1
+        with pytest.raises(ValueError, match="parse failed"):
+            next(stage)
+
+    def test_producer_stays_at_most_maxsize_ahead(self):
+        produced = []
+
+        def source():
+            for i in range(100):
+                produced.append(i)
+                yield i
+
+        stage = prefetch(source(), maxsize=2)
+        assert next(stage) == 0
+        time.sleep(0.2)
+        # One item consumed, two queued and one waiting to be queued
+        assert len(produced) <= 4
+        stage.close()
+
+    def test_closing_the_last_stage_stops_the_whole_chain(self):
+        closed = threading.Event()
+
+        def endless():
+            try:
+                i = 0
+                while True:
+                    yield i
+                    i += 1
+            finally:
+                closed.set()
+
+        stage = prefetch(prefetch(endless(), 2), 2)
+        assert next(stage) == 0
+        stage.close()
+        assert closed.wait(2)
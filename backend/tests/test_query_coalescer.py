@@ -0,0 +1,165 @@
+"""Unit tests for coalescing concurrent query embeddings."""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+from langchain_community.embeddings import DashScopeEmbeddings
+from langchain_core.embeddings import Embeddings
+
+from app.api.api_v1 import knowledge_base
+from app.core.config import settings
+from app.models.knowledge import KnowledgeBase
+from app.services.embedding.coalescer import CoalescedQueryEmbeddings
+from app.services.embedding.embedding_factory import EmbeddingsFactory
+
+
+class RemoteEmbeddings(Embeddings):
+    """Records the batches a remote provider would receive."""
+
+    def __init__(self):
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        time.sleep(0.01)
+        with self._lock:
+            self.requests.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+@pytest.fixture(autouse=True)
+def registry():
+    EmbeddingsFactory.clear()
+    yield
+    EmbeddingsFactory.clear()
+
+
+class TestCoalescedQueryEmbeddings:
+    """Tests for CoalescedQueryEmbeddings."""
+
+    def test_concurrent_queries_are_sent_as_one_batch(self):
+        remote = RemoteEmbeddings()
+        embeddings = CoalescedQueryEmbeddings(remote, max_batch_size=16, max_wait=0.5)
+        queries = ["a", "bb", "ccc", "dddd"]
+        try:
+            with ThreadPoolExecutor(len(queries)) as pool:
+                vectors = list(pool.map(embeddings.embed_query, queries))
+            stats = embeddings.stats()
+        finally:
+            embeddings.close()
+        assert vectors == [[1.0], [2.0], [3.0], [4.0]]
+        assert len(remote.requests) == 1
+        assert stats["batches"] == 1 and stats["items"] == 4
+        assert stats["avg_fill"] == 0.25
+        assert stats["max_wait_ms"] <= 1000
+
+    def test_async_queries_are_coalesced(self):
+        remote = RemoteEmbeddings()
+        embeddings = CoalescedQueryEmbeddings(remote, max_batch_size=2, max_wait=0.5, max_concurrency=2)
+
+        async def run():
+            return await asyncio.gather(*(embeddings.aembed_query("x" * n) for n in range(1, 6)))
+
+        try:
+            vectors = asyncio.run(run())
+        finally:
+            embeddings.close()
+        assert vectors == [[float(n)] for n in range(1, 6)]
+        assert sorted(len(request) for request in remote.requests) == [1, 2, 2]
+
+    def test_documents_pass_through(self):
+        remote = RemoteEmbeddings()
+        embeddings = CoalescedQueryEmbeddings(remote, max_batch_size=2, max_wait=0)
+        try:
+            assert embeddings.embed_documents(["a", "bb", "ccc"]) == [[1.0], [2.0], [3.0]]
+        finally:
+            embeddings.close()
+        assert remote.requests == [["a", "bb", "ccc"]]
+
+    def test_dashscope_queries_keep_the_query_text_type(self):
+        dashscope = DashScopeEmbeddings(model="text-embedding-v1", dashscope_api_key="test-key")
+        calls = []
+
+        def embed_with_retry(embeddings, **kwargs):
+            calls.append(kwargs)
+            return [{"embedding": [float(i)]} for i, _ in enumerate(kwargs["input"])]
+
+        with patch("app.services.embedding.coalescer.embed_with_retry", embed_with_retry):
+            embeddings = CoalescedQueryEmbeddings(dashscope, max_batch_size=10, max_wait=0)
+            try:
+                assert embeddings.embed_query("q") == [0.0]
+            finally:
+                embeddings.close()
+        assert calls == [{"input": ["q"], "text_type": "query", "model": "text-embedding-v1"}]
+
+
+class TestFactoryCoalescing:
+    """Tests for the coalescer set up by EmbeddingsFactory.create_for_queries."""
+
+    def test_remote_providers_share_one_coalescer(self):
+        remote = RemoteEmbeddings()
+        with patch.object(settings, "EMBEDDINGS_PROVIDER", "dashscope"), \
+                patch.object(settings, "QUERY_EMBEDDING_CACHE_SIZE", 0), \
+                patch.object(EmbeddingsFactory, "build", staticmethod(lambda: remote)):
+            embeddings = EmbeddingsFactory.create_for_queries()
+            assert isinstance(embeddings, CoalescedQueryEmbeddings)
+            assert EmbeddingsFactory.create_for_queries() is embeddings
+            # DashScope accepts at most 10 texts per request
+            assert embeddings.batcher.max_batch_size == 10
+            embeddings.embed_query("q")
+            assert EmbeddingsFactory.coalescer_stats()["requests"] == 1
+
+    def test_coalescing_can_be_disabled(self):
+        remote = RemoteEmbeddings()
+        with patch.object(settings, "EMBEDDINGS_PROVIDER", "openai"), \
+                patch.object(settings, "QUERY_EMBEDDING_CACHE_SIZE", 0), \
+                patch.object(settings, "QUERY_EMBEDDING_COALESCE_WAIT_MS", 0), \
+                patch.object(EmbeddingsFactory, "build", staticmethod(lambda: remote)):
+            assert EmbeddingsFactory.create_for_queries() is remote
+            assert EmbeddingsFactory.coalescer_stats() is None
+
+
+class QueryingVectorStore:
+    """Embeds the query like a vector store search does, returning no hits."""
+
+    def __init__(self, embedding_function):
+        self.embedding_function = embedding_function
+
+    def similarity_search_with_score(self, query, k):
+        self.embedding_function.embed_query(query)
+        return []
+
+
+class TestRetrievalCoalescing:
+    """Tests for coalescing the queries of concurrent retrieval requests."""
+
+    def test_concurrent_retrievals_share_one_embedding_call(self, db):
+        db.add(KnowledgeBase(id=1, name="kb", user_id=1))
+        db.commit()
+        remote = RemoteEmbeddings()
+        user = SimpleNamespace(id=1)
+
+        async def run():
+            return await asyncio.gather(*(
+                knowledge_base.test_retrieval(
+                    knowledge_base.TestRetrievalRequest(query=query, kb_id=1, top_k=3), MagicMock(), db, user
+                )
+                for query in ("a", "bb")
+            ))
+
+        with patch.object(settings, "EMBEDDINGS_PROVIDER", "openai"), \
+                patch.object(settings, "QUERY_EMBEDDING_CACHE_SIZE", 0), \
+                patch.object(settings, "QUERY_EMBEDDING_COALESCE_WAIT_MS", 500), \
+                patch.object(EmbeddingsFactory, "build", staticmethod(lambda: remote)), \
+                patch.object(knowledge_base.VectorStoreFactory, "create",
+                             side_effect=lambda **kwargs: QueryingVectorStore(kwargs["embedding_function"])):
+            results = asyncio.run(run())
+        assert results == [{"results": []}, {"results": []}]
+        assert [sorted(request) for request in remote.requests] == [["a", "bb"]]
@@ -0,0 +1,82 @@
+"""Unit tests for the query embedding cache."""
+import asyncio
+from unittest.mock import patch
+
+from langchain_core.embeddings import Embeddings
+
+from app.core.cache import LRUCache
+from app.services.embedding.query_cache import (
+    CachedQueryEmbeddings,
+    QueryEmbeddingCache,
+    SQLiteQueryEmbeddingCache,
+)
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.queries = []
+
+    def embed_documents(self, texts):
+        return [[float(len(text))] for text in texts]
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return [float(len(text)), 0.5]
+
+    async def aembed_query(self, text):
+        return self.embed_query(text)
+
+
+def _embeddings(cache, model="m"):
+    inner = CountingEmbeddings()
+    return inner, CachedQueryEmbeddings(inner, cache, provider="openai", model=model)
+
+
+class TestCachedQueryEmbeddings:
+    """Tests for CachedQueryEmbeddings."""
+
+    def test_repeated_queries_are_embedded_once(self):
+        inner, embeddings = _embeddings(QueryEmbeddingCache(LRUCache(10, ttl=60)))
+        first = embeddings.embed_query("what is rag?")
+        assert embeddings.embed_query("  what  is rag?\n") == first
+        assert asyncio.run(embeddings.aembed_query("what is rag?")) == first
+        assert inner.queries == ["what is rag?"]
+
+    def test_models_do_not_share_entries(self):
+        cache = QueryEmbeddingCache(LRUCache(10, ttl=60))
+        first, embeddings = _embeddings(cache, model="a")
+        second, other = _embeddings(cache, model="b")
+        embeddings.embed_query("q")
+        other.embed_query("q")
+        assert first.queries == ["q"] and second.queries == ["q"]
+
+    def test_disk_tier_is_shared_between_processes(self, tmp_path):
+        path = str(tmp_path / "queries.sqlite3")
+        first, embeddings = _embeddings(QueryEmbeddingCache(LRUCache(10), SQLiteQueryEmbeddingCache(path, 100, ttl=60)))
+        second, other = _embeddings(QueryEmbeddingCache(LRUCache(10), SQLiteQueryEmbeddingCache(path, 100, ttl=60)))
+        vector = embeddings.embed_query("q")
+        assert other.embed_query("q") == vector
+        assert first.queries == ["q"]
+        assert second.queries == []
+
+
+class TestSQLiteQueryEmbeddingCache:
+    """Tests for the SQLite tier."""
+
+    def test_entries_expire(self, tmp_path):
+        cache = SQLiteQueryEmbeddingCache(str(tmp_path / "queries.sqlite3"), 100, ttl=60)
+        with patch("app.services.embedding.query_cache.time.time", return_value=1000.0):
+            cache.set("k", [1.0, 2.0])
+        with patch("app.services.embedding.query_cache.time.time", return_value=1059.0):
+            assert cache.get("k") == [1.0, 2.0]
+        with patch("app.services.embedding.query_cache.time.time", return_value=1060.0):
+            assert cache.get("k") is None
+
+    def test_oldest_entries_are_evicted_beyond_max_entries(self, tmp_path):
+        cache = SQLiteQueryEmbeddingCache(str(tmp_path / "queries.sqlite3"), 5, ttl=60)
+        cache.EVICT_EVERY = 1
+        for i in range(8):
+            with patch("app.services.embedding.query_cache.time.time", return_value=1000.0 + i):
+                cache.set(str(i), [float(i)])
+        with patch("app.services.embedding.query_cache.time.time", return_value=1010.0):
+            assert [cache.get(str(i)) is not None for i in range(8)] == [False] * 3 + [True] * 5
@@ -0,0 +1,171 @@
+"""Unit tests for the reaper of expired uploads and abandoned temp files."""
+import hashlib
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from langchain_core.documents import Document as LangchainDocument
+
+from app.core.tempfiles import TEMP_FILE_PREFIX, sweep_temp_files
+from app.models.knowledge import Document, DocumentUpload, KnowledgeBase, ProcessingTask
+from app.services import document_processor
+from app.services.blob_store import blob_object_name
+from app.services.reaper import reap_expired_uploads, reap_orphaned_objects
+
+HASH = hashlib.sha256(b"content").hexdigest()
+NOW = datetime.utcnow()
+EXPIRED = NOW - timedelta(days=2)
+
+
+def _upload(db, temp_path, created_at=EXPIRED, file_hash=HASH, status="pending"):
+    upload = DocumentUpload(
+        knowledge_base_id=1, file_name="a.pdf", file_hash=file_hash, file_size=7,
+        content_type="application/pdf", temp_path=temp_path, created_at=created_at, status=status,
+    )
+    db.add(upload)
+    db.commit()
+    return upload
+
+
+def _removed(client):
+    return [obj.name for call in client.remove_objects.call_args_list for obj in call.args[1]]
+
+
+class TestReapExpiredUploads:
+    """Tests for the expired upload pass."""
+
+    def test_expired_uploads_are_deleted_in_pages(self, db):
+        for i in range(5):
+            _upload(db, f"kb_1/temp/{i}", file_hash=str(i))
+        fresh = _upload(db, "kb_1/temp/fresh", created_at=NOW)
+        client = MagicMock()
+
+        assert reap_expired_uploads(db, client, NOW - timedelta(days=1), batch_size=2) == 5
+        assert [u.id for u in db.query(DocumentUpload)] == [fresh.id]
+        assert _removed(client) == [f"kb_1/temp/{i}" for i in range(5)]
+        assert client.remove_objects.call_count == 3
+
+    def test_uploads_of_unfinished_tasks_are_kept(self, db):
+        queued = _upload(db, "kb_1/temp/queued")
+        done = _upload(db, "kb_1/temp/done")
+        db.add_all([
+            ProcessingTask(knowledge_base_id=1, document_upload_id=queued.id, status="pending"),
+            ProcessingTask(knowledge_base_id=1, document_upload_id=done.id, status="completed"),
+        ])
+        db.commit()
+
+        assert reap_expired_uploads(db, MagicMock(), NOW, batch_size=10) == 1
+        assert [u.id for u in db.query(DocumentUpload)] == [queued.id]
+        assert {t.document_upload_id for t in db.query(ProcessingTask)} == {queued.id, None}
+
+    def test_resumable_uploads_expire_by_last_activity(self, db):
+        active = _upload(db, "uploads/active", status="uploading")
+        active.multipart_upload_id, active.updated_at = "mpu-1", NOW
+        verifying = _upload(db, "uploads/verifying", status="verifying")
+        verifying.updated_at = NOW
+        abandoned = _upload(db, "uploads/abandoned", status="uploading")
+        abandoned.multipart_upload_id, abandoned.updated_at = "mpu-2", EXPIRED
+        db.commit()
+        client = MagicMock()
+
+        assert reap_expired_uploads(db, client, NOW - timedelta(days=1), batch_size=10) == 1
+        assert {u.id for u in db.query(DocumentUpload)} == {active.id, verifying.id}
+        client._abort_multipart_upload.assert_called_once()
+        assert _removed(client) == []
+
+    def test_referenced_blobs_are_kept(self, db):
+        db.add(Document(
+            file_name="a.pdf", file_path=blob_object_name(HASH), file_hash=HASH, file_size=7,
+            content_type="application/pdf", knowledge_base_id=2,
+        ))
+        _upload(db, blob_object_name(HASH))
+        unreferenced = hashlib.sha256(b"other").hexdigest()
+        _upload(db, blob_object_name(unreferenced), file_hash=unreferenced)
+        client = MagicMock()
+
+        assert reap_expired_uploads(db, client, NOW, batch_size=10) == 2
+        removed = [call.args[1] for call in client.remove_object.call_args_list]
+        assert blob_object_name(unreferenced) in removed
+        assert blob_object_name(HASH) not in removed
+        assert _removed(client) == []
+
+
+class TestReapOrphanedObjects:
+    """Tests for the orphaned staging object pass."""
+
+    def test_only_old_unreferenced_staging_objects_are_removed(self, db):
+        old = datetime.now(timezone.utc) - timedelta(days=2)
+        new = datetime.now(timezone.utc)
+        _upload(db, "uploads/referenced", created_at=NOW)
+        listings = {
+            "kb_": [SimpleNamespace(object_name="kb_1/", is_dir=True)],
+            "uploads/": [
+                SimpleNamespace(object_name="uploads/referenced", last_modified=old),
+                SimpleNamespace(object_name="uploads/orphan", last_modified=old),
+                SimpleNamespace(object_name="uploads/recent", last_modified=new),
+            ],
+            "kb_1/temp/": [SimpleNamespace(object_name="kb_1/temp/orphan", last_modified=old)],
+        }
+        client = MagicMock()
+        client.list_objects.side_effect = lambda bucket, prefix, recursive=False: iter(listings[prefix])
+
+        assert reap_orphaned_objects(db, client, NOW - timedelta(days=1), batch_size=10) == 2
+        assert _removed(client) == ["uploads/orphan", "kb_1/temp/orphan"]
+
+
+class TestSweepTempFiles:
+    """Tests for the local temp file sweep."""
+
+    def test_only_old_files_of_this_application_are_removed(self, tmp_path):
+        stale = tmp_path / f"{TEMP_FILE_PREFIX}stale.pdf"
+        fresh = tmp_path / f"{TEMP_FILE_PREFIX}fresh.pdf"
+        foreign = tmp_path / "other.pdf"
+        for path in (stale, fresh, foreign):
+            path.write_bytes(b"x")
+        old = time.time() - 7200
+        os.utime(stale, (old, old))
+        os.utime(foreign, (old, old))
+
+        assert sweep_temp_files(3600, directory=str(tmp_path)) == 1
+        assert sorted(p.name for p in tmp_path.iterdir()) == sorted([fresh.name, foreign.name])
+
+    def test_stale_task_download_is_removed(self, db, tmp_path):
+        """A file an ingestion task downloaded and never cleaned up is swept."""
+        db.add(KnowledgeBase(id=1, name="kb", user_id=1))
+        upload = _upload(db, blob_object_name(HASH), created_at=NOW)
+        task = ProcessingTask(knowledge_base_id=1, document_upload_id=upload.id, status="pending")
+        db.add(task)
+        db.commit()
+
+        downloads = []
+
+        def fget_object(bucket_name, object_name, file_path):
+            downloads.append(file_path)
+            with open(file_path, "w") as f:
+                f.write("content")
+
+        client = MagicMock()
+        client.fget_object.side_effect = fget_object
+        page = LangchainDocument(page_content="content", metadata={})
+        store = MagicMock()
+        # The worker dies before removing its download
+        with patch.object(tempfile, "tempdir", str(tmp_path)), \
+                patch.object(document_processor, "get_minio_client", return_value=client), \
+                patch.object(document_processor, "LeaseHeartbeat", MagicMock()), \
+                patch.object(document_processor, "iter_cached_pages", return_value=None), \
+                patch.object(document_processor, "cache_pages", side_effect=lambda *args: args[3]), \
+                patch.object(document_processor, "iter_document_pages", return_value=iter([page])), \
+                patch.object(document_processor.EmbeddingsFactory, "create_for_ingestion", MagicMock()), \
+                patch.object(document_processor.VectorStoreFactory, "create", return_value=store), \
+                patch.object(document_processor.os, "remove"):
+            document_processor.process_document_background(upload.temp_path, "a/b.pdf", 1, task.id, db=db)
+
+        assert len(downloads) == 1
+        assert os.path.dirname(downloads[0]) == str(tmp_path)
+        old = time.time() - 7200
+        os.utime(downloads[0], (old, old))
+        assert sweep_temp_files(3600, directory=str(tmp_path)) == 1
+        assert not os.path.exists(downloads[0])
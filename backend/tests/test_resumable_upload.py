@@ -0,0 +1,139 @@
+"""Unit tests for resumable multipart uploads."""
+import hashlib
+import io
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.models.knowledge import Document, DocumentUpload
+from app.services import resumable_upload
+from app.services.blob_store import blob_object_name
+
+MiB = 1024 * 1024
+CONTENT = b"x" * 1000
+HASH = hashlib.sha256(CONTENT).hexdigest()
+
+
+def _upload(db, status="uploading", file_size=len(CONTENT), part_size=400, total_parts=3):
+    upload = DocumentUpload(
+        knowledge_base_id=1, file_name="big.pdf", file_hash="", file_size=file_size,
+        content_type="application/pdf", temp_path="uploads/abc", status=status,
+        multipart_upload_id="mpu-1", part_size=part_size, total_parts=total_parts,
+        created_at=datetime.utcnow(),
+    )
+    db.add(upload)
+    db.commit()
+    return upload
+
+
+def _parts(*numbers):
+    return [SimpleNamespace(part_number=n, size=400) for n in numbers]
+
+
+class TestPartPlanning:
+    """Tests for part sizes and per-part validation."""
+
+    def test_part_size_comes_from_settings(self):
+        with patch.object(resumable_upload.settings, "RESUMABLE_UPLOAD_PART_SIZE", 16 * MiB):
+            assert resumable_upload.plan_parts(40 * MiB) == (16 * MiB, 3)
+            assert resumable_upload.plan_parts(1) == (16 * MiB, 1)
+
+    def test_part_size_grows_to_stay_within_part_limit(self):
+        with patch.object(resumable_upload.settings, "RESUMABLE_UPLOAD_PART_SIZE", 5 * MiB):
+            part_size, total_parts = resumable_upload.plan_parts(100 * 1024 * MiB)
+        assert total_parts <= resumable_upload.MAX_PARTS
+        assert part_size * total_parts >= 100 * 1024 * MiB
+
+    def test_only_the_last_part_may_be_short(self, db):
+        upload = _upload(db)
+        resumable_upload.check_part(upload, 1, 400)
+        resumable_upload.check_part(upload, 3, 200)
+        with pytest.raises(resumable_upload.UploadError):
+            resumable_upload.check_part(upload, 2, 200)
+        with pytest.raises(resumable_upload.UploadError):
+            resumable_upload.check_part(upload, 4, 400)
+
+    def test_parts_are_rejected_once_completed(self, db):
+        upload = _upload(db, status="verifying")
+        with pytest.raises(resumable_upload.UploadError):
+            resumable_upload.check_part(upload, 1, 400)
+
+
+class TestCompleteUpload:
+    """Tests for assembling the parts."""
+
+    def test_missing_parts_are_reported(self, db):
+        upload = _upload(db)
+        client = MagicMock()
+        with patch.object(resumable_upload, "list_uploaded_parts", return_value=_parts(1, 3)), \
+                patch.object(resumable_upload, "complete_multipart_upload") as complete:
+            status = resumable_upload.upload_status(client, upload)
+            with pytest.raises(resumable_upload.UploadError, match=r"\[2\]"):
+                resumable_upload.complete_upload(db, client, upload)
+        assert status["missing_parts"] == [2]
+        assert status["bytes_uploaded"] == 800
+        complete.assert_not_called()
+        assert upload.status == "uploading"
+
+    def test_complete_is_idempotent(self, db):
+        upload = _upload(db)
+        client = MagicMock()
+        with patch.object(resumable_upload, "list_uploaded_parts", return_value=_parts(1, 2, 3)), \
+                patch.object(resumable_upload, "complete_multipart_upload") as complete:
+            resumable_upload.complete_upload(db, client, upload)
+            resumable_upload.complete_upload(db, client, upload)
+        complete.assert_called_once()
+        assert upload.status == "verifying"
+        # Verification counts as activity for the reaper
+        assert upload.updated_at is not None
+
+
+class TestFinalizeUpload:
+    """Tests for server-side verification of the assembled file."""
+
+    def _client(self, content):
+        client = MagicMock()
+        client.get_object.return_value = MagicMock(read=io.BytesIO(content).read)
+        return client
+
+    def test_hash_is_computed_and_file_moved_to_its_blob(self, db):
+        upload = _upload(db, status="verifying")
+        client = self._client(CONTENT)
+        with patch.object(resumable_upload, "get_minio_client", return_value=client), \
+                patch.object(resumable_upload, "blob_exists", return_value=False):
+            resumable_upload.finalize_upload(upload.id, db=db)
+
+        assert upload.status == "pending"
+        assert upload.file_hash == HASH
+        assert upload.temp_path == blob_object_name(HASH)
+        assert client.copy_object.call_args.args[1] == blob_object_name(HASH)
+        client.remove_object.assert_called_once_with(resumable_upload.settings.MINIO_BUCKET_NAME, "uploads/abc")
+
+    def test_existing_blob_is_not_copied_and_duplicates_are_flagged(self, db):
+        db.add(Document(
+            file_name="big.pdf", file_path=blob_object_name(HASH), file_hash=HASH,
+            file_size=len(CONTENT), content_type="application/pdf", knowledge_base_id=1,
+        ))
+        upload = _upload(db, status="verifying")
+        client = self._client(CONTENT)
+        with patch.object(resumable_upload, "get_minio_client", return_value=client), \
+                patch.object(resumable_upload, "blob_exists", return_value=True):
+            resumable_upload.finalize_upload(upload.id, db=db)
+
+        assert upload.status == "exists"
+        client.copy_object.assert_not_called()
+
+    def test_size_mismatch_fails_the_upload(self, db):
+        upload = _upload(db, status="verifying")
+        client = self._client(CONTENT[:-1])
+        with patch.object(resumable_upload, "get_minio_client", return_value=client), \
+                patch.object(resumable_upload, "blob_exists", return_value=False):
+            resumable_upload.finalize_upload(upload.id, db=db)
+
+        assert upload.status == "failed"
+        assert "999 bytes" in upload.error_message
+        assert upload.temp_path == "uploads/abc"
+        client.copy_object.assert_not_called()
+        client.remove_object.assert_not_called()
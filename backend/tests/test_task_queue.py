@@ -0,0 +1,121 @@
+"""Unit tests for the processing_tasks work queue."""
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.models.knowledge import ProcessingTask
+from app.services import task_queue
+
+
+def _add_task(db, **kwargs):
+    task = ProcessingTask(knowledge_base_id=1, status="pending", **kwargs)
+    db.add(task)
+    db.commit()
+    return task
+
+
+class TestTaskQueue:
+    """Tests for claiming, heartbeats and retries."""
+
+    def test_claim_is_exclusive(self, db):
+        """Only one worker can claim a pending task."""
+        task = _add_task(db)
+        assert task_queue.claim_task(db, task.id, "worker-a")
+        assert not task_queue.claim_task(db, task.id, "worker-b")
+        db.refresh(task)
+        assert task.status == "processing"
+        assert task.locked_by == "worker-a"
+        assert task.attempts == 1
+
+    def test_expired_lease_is_reclaimable(self, db):
+        """A task whose worker died can be claimed again."""
+        task = _add_task(
+            db,
+            attempts=1,
+            locked_by="dead-worker",
+            lease_expires_at=datetime.utcnow() - timedelta(seconds=1),
+        )
+        task.status = "processing"
+        db.commit()
+        assert task_queue.find_claimable_tasks(db, 10) == [task.id]
+        assert task_queue.claim_task(db, task.id, "worker-b")
+        db.refresh(task)
+        assert task.locked_by == "worker-b"
+        assert task.attempts == 2
+
+    def test_processing_task_without_lease_is_reclaimable(self, db):
+        """Tasks left in processing without a lease, e.g. by the old runner, are recovered."""
+        task = _add_task(db)
+        task.status = "processing"
+        db.commit()
+        assert task.lease_expires_at is None
+        assert task_queue.find_claimable_tasks(db, 10) == [task.id]
+        assert task_queue.claim_task(db, task.id, "worker-a")
+        db.refresh(task)
+        assert task.locked_by == "worker-a"
+        assert task.lease_expires_at is not None
+
+    def test_heartbeat_only_for_lease_holder(self, db):
+        """Only the worker holding the lease can extend it."""
+        task = _add_task(db)
+        task_queue.claim_task(db, task.id, "worker-a")
+        assert task_queue.heartbeat(db, task.id, "worker-a")
+        assert not task_queue.heartbeat(db, task.id, "worker-b")
+
+    def test_lost_lease_is_reported_to_the_run(self):
+        """The heartbeat flags a lease it could not renew."""
+        with patch.object(task_queue, "SessionLocal", MagicMock()), \
+                patch.object(task_queue, "heartbeat", return_value=False):
+            beat = task_queue.LeaseHeartbeat(1, "worker-a", interval=0.01).start()
+            beat._thread.join(timeout=5)
+        assert beat.lost.is_set()
+        with pytest.raises(task_queue.LeaseLost):
+            beat.ensure_held()
+
+    def test_fail_task_reschedules_with_backoff(self, db):
+        """Failed attempts are retried after a backoff until attempts run out."""
+        task = _add_task(db)
+        task_queue.claim_task(db, task.id, "worker-a")
+        db.refresh(task)
+        assert task_queue.fail_task(task, "boom")
+        db.commit()
+        assert task.status == "pending"
+        assert task.next_attempt_at > datetime.utcnow()
+        # Not due yet
+        assert task_queue.find_claimable_tasks(db, 10) == []
+
+        task.attempts = task_queue.settings.INGESTION_MAX_ATTEMPTS
+        assert not task_queue.fail_task(task, "boom")
+        assert task.status == "failed"
+
+    def test_failure_that_is_not_the_tasks_fault_keeps_its_attempts(self, db):
+        """A failure with count_attempt=False gives the attempt back."""
+        task = _add_task(db)
+        task_queue.claim_task(db, task.id, "worker-a")
+        db.refresh(task)
+        with patch.object(task_queue.settings, "INGESTION_MAX_ATTEMPTS", 1):
+            assert task_queue.fail_task(task, "pool reset", count_attempt=False)
+        assert task.status == "pending"
+        assert task.attempts == 0
+        assert task.next_attempt_at <= datetime.utcnow()
+
+    def test_fail_exhausted_tasks(self, db):
+        """Expired leases without attempts left are failed permanently."""
+        task = _add_task(
+            db,
+            attempts=task_queue.settings.INGESTION_MAX_ATTEMPTS,
+            lease_expires_at=datetime.utcnow() - timedelta(seconds=1),
+        )
+        task.status = "processing"
+        db.commit()
+        assert task_queue.fail_exhausted_tasks(db) == 1
+        db.refresh(task)
+        assert task.status == "failed"
+
+    def test_backoff_is_exponential_and_capped(self):
+        """Backoff doubles per attempt up to the configured maximum."""
+        base = task_queue.settings.INGESTION_RETRY_BACKOFF_SECONDS
+        assert task_queue.backoff_seconds(1) == base
+        assert task_queue.backoff_seconds(2) == base * 2
+        assert task_queue.backoff_seconds(50) == task_queue.settings.INGESTION_RETRY_BACKOFF_MAX_SECONDS
@@ -0,0 +1,67 @@
+"""Unit tests for the offset-based text splitter."""
+import random
+from unittest.mock import patch
+
+import pytest
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document as LangchainDocument
+
+from app.services.text_splitter import TextSplitter, create_text_splitter
+
+PIECES = ["a", "bb", "word", " ", "  ", "\t", "\n", "\n\n", "\n\n\n", "xyz" * 20]
+
+
+def random_text(rng: random.Random) -> str:
+    return "".join(rng.choice(PIECES) for _ in range(rng.randint(0, 400)))
+
+
+def quarter_length(text: str) -> int:
+    """Token-like length: zero for empty text, at least one otherwise"""
+    return (len(text) + 3) // 4
+
+
+class TestTextSplitter:
+    """Tests for TextSplitter against RecursiveCharacterTextSplitter."""
+
+    @pytest.mark.parametrize("length_function", [None, quarter_length])
+    def test_matches_langchain_on_random_text(self, length_function):
+        rng = random.Random(0)
+        kwargs = {"length_function": length_function} if length_function else {}
+        for _ in range(500):
+            text = random_text(rng)
+            chunk_size = rng.randint(1, 120)
+            chunk_overlap = rng.randint(0, chunk_size)
+            expected = RecursiveCharacterTextSplitter(
+                chunk_size=chunk_size, chunk_overlap=chunk_overlap, **kwargs
+            ).split_text(text)
+            actual = TextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, **kwargs).split_text(text)
+            assert actual == expected, (text, chunk_size, chunk_overlap)
+
+    def test_custom_separators_match_langchain(self):
+        """Oversized pieces are kept whole once no separators remain."""
+        text = "alpha. beta gamma. " + "x" * 50 + ". delta"
+        expected = RecursiveCharacterTextSplitter(
+            chunk_size=20, chunk_overlap=5, separators=[". "]
+        ).split_text(text)
+        assert TextSplitter(chunk_size=20, chunk_overlap=5, separators=[". "]).split_text(text) == expected
+
+    def test_split_documents_copies_metadata(self):
+        page = LangchainDocument(page_content="one two three four five six", metadata={"page": 1})
+        chunks = TextSplitter(chunk_size=10, chunk_overlap=0).split_documents([page])
+        expected = RecursiveCharacterTextSplitter(chunk_size=10, chunk_overlap=0).split_documents([page])
+        assert chunks == expected
+        chunks[0].metadata["page"] = 2
+        assert chunks[1].metadata == {"page": 1}
+        assert page.metadata == {"page": 1}
+
+    def test_rejects_overlap_larger_than_chunk(self):
+        with pytest.raises(ValueError):
+            TextSplitter(chunk_size=10, chunk_overlap=20)
+
+    def test_token_encoding_setting_selects_token_length(self):
+        with patch("app.services.text_splitter.settings") as mock_settings, \
+                patch("app.services.text_splitter.token_length_function", return_value=quarter_length) as mock_length:
+            mock_settings.CHUNK_TOKEN_ENCODING = "cl100k_base"
+            splitter = create_text_splitter(100, 10)
+        mock_length.assert_called_once_with("cl100k_base")
+        assert splitter.length_function is quarter_length